@@ -66,13 +66,83 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 # 5. Datenbank (Immer SQLite für den Physiktrainer im PT-Ordner)
+# PHYSIK_SQLITE_PROFIL (.env): produktion (Standard) | standard
+#   produktion: WAL (Leser und ein Schreiber parallel), synchronous=NORMAL,
+#               Wartezeit bei Sperren, mmap/Cache, BEGIN IMMEDIATE, Verbindungen halten
+#   standard:   SQLite-Voreinstellungen (Rollback-Journal), z.B. zum Vergleich
+# Die PRAGMAs setzt physik.datenbank.setze_pragmas bei jeder neuen Verbindung.
+PHYSIK_SQLITE_PROFIL = os.getenv("PHYSIK_SQLITE_PROFIL", "produktion")
+
+SQLITE_PROFILE = {
+    "standard": {
+        "PRAGMAS": {"journal_mode": "DELETE", "synchronous": "FULL"},
+        "OPTIONS": {},
+        "CONN_MAX_AGE": 0,
+    },
+    "produktion": {
+        "PRAGMAS": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 20000,        # ms
+            "mmap_size": 256 * 1024 ** 2,  # Bytes
+            "cache_size": -64000,          # negativ = KiB
+            "temp_store": "MEMORY",
+        },
+        # Schreib-Transaktionen holen den Lock sofort, statt beim Upgrade abzubrechen
+        "OPTIONS": {"timeout": 20, "transaction_mode": "IMMEDIATE"},
+        "CONN_MAX_AGE": int(os.getenv("CONN_MAX_AGE", "60")),
+    },
+}
+_sqlite = SQLITE_PROFILE[PHYSIK_SQLITE_PROFIL]
+PHYSIK_SQLITE_PRAGMAS = _sqlite["PRAGMAS"]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': dict(_sqlite["OPTIONS"]),
+        'CONN_MAX_AGE': _sqlite["CONN_MAX_AGE"],
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# 5b. Sessions (gilt für die ganze Site inkl. Admin). Der Quiz-Stand liegt im signierten
+# Cookie (seriestand.py), Sessions ändern sich also nur bei Login/Logout.
+#   cached_db (Standard): gelesen wird aus dem Cache, geschrieben zusätzlich in die
+#     Datenbank - ein INSERT pro Login. Verdrängt der Cache einen Eintrag, wird er aus
+#     der Datenbank nachgeladen; niemand wird abgemeldet.
+#   cache: spart auch dieses INSERT, aber jede verdrängte Session ist ein Logout.
+#     Nur mit einem Cache ohne Verdrängung (MAX_ENTRIES weit über der Zahl der Sessions).
+# PHYSIK_SESSIONS (.env): cached_db (Standard) | cache | file | db
+PHYSIK_SESSIONS = os.getenv("PHYSIK_SESSIONS", "cached_db")
+
+SESSION_ENGINE = {
+    "cache": "django.contrib.sessions.backends.cache",
+    "file": "django.contrib.sessions.backends.file",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "db": "django.contrib.sessions.backends.db",
+}[PHYSIK_SESSIONS]
+SESSION_CACHE_ALIAS = "sessions"
+SESSION_FILE_PATH = BASE_DIR / "tmp" / "sessions"
+if PHYSIK_SESSIONS == "file":
+    SESSION_FILE_PATH.mkdir(parents=True, exist_ok=True)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Dateibasiert, damit alle Worker-Prozesse dieselben Sessions, Antwortschlüssel-Generation
+    # und Startseiten-Zahlen sehen. Ab MAX_ENTRIES Dateien löscht ein Schreibzugriff zufällig
+    # 1/CULL_FREQUENCY davon (hier ein Viertel) - mit cached_db und für die übrigen Einträge
+    # kostet das nur ein Nachladen aus der Datenbank. Tests ersetzen ihn (tests.py, setUpModule).
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "tmp" / "session_cache",
+        "TIMEOUT": 60 * 60 * 24 * 14,  # wie SESSION_COOKIE_AGE
+        "OPTIONS": {"MAX_ENTRIES": 20000, "CULL_FREQUENCY": 4},
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -122,5 +192,20 @@ EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = 'info@physiktrainer.app'
 SERVER_EMAIL = 'info@physiktrainer.app'
 
+# Info-Mails über geänderte Aufgaben werden gesammelt (Outbox-Tabelle)
+# und per "manage.py benachrichtigungen_senden --schleife" verschickt
+PHYSIK_INFO_EMPFAENGER = ['info@physiktrainer.app']
+PHYSIK_DIGEST_MINUTEN = 10
+
+# Wiederholungsplan: Intervalle je Fach zusätzlich mit SM-2-Leichtigkeit strecken
+PHYSIK_PLANER_SM2 = os.getenv("PHYSIK_PLANER_SM2", "1") == "1"
+
+# FehlerLog-Einträge älter als so viele Tage verdichtet "manage.py fehler_verdichten" zu FehlerSumme
+PHYSIK_FEHLER_AUFBEWAHRUNG_TAGE = int(os.getenv("PHYSIK_FEHLER_AUFBEWAHRUNG_TAGE", "90"))
+
+# Vorgemerkte Antworten bis zum gebündelten Schreiben (lernfortschritt.py): eine Datei
+# pro Antwort, nichts wird verdrängt. Liegengebliebene schreibt "manage.py lernfortschritt_schreiben"
+PHYSIK_LERNFORTSCHRITT_PUFFER = Path(os.getenv("PHYSIK_LERNFORTSCHRITT_PUFFER", BASE_DIR / "tmp" / "lernfortschritt"))
+
 print(f"DEBUG-MAIL-USER: '{EMAIL_HOST_USER}'")
 print(f"DEBUG-MAIL-PW: '{EMAIL_HOST_PASSWORD}'")
\ No newline at end of file
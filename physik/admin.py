@@ -6,8 +6,9 @@ from django import forms
 from django.core.exceptions import ValidationError
 
 from .models import ThemenBereich, Kapitel, Aufgabe, AufgabeOption, AufgabeBild
-from .models import FehlerLog, Protokoll
+from .models import FehlerLog, FehlerSumme, Protokoll
 from .models import Profil
+from .bearbeitung import wende_optionen_an
 
 # 1. Das Profil als 'Inline' definieren (damit es UNTEN auf der User-Seite erscheint)
 class ProfilInline(admin.StackedInline):
@@ -58,16 +59,7 @@ class AufgabeOptionInline(admin.TabularInline):
     model = AufgabeOption
     readonly_fields = ('position',) # Jetzt schreibgeschützt
     extra = 1
-
-    def save_model(self, request, obj, form, change):
-        if not obj.pk: 
-            # Wir filtern nach 'position'
-            last_opt = AufgabeOption.objects.filter(aufgabe=obj.aufgabe).order_by('-position').first()
-            if last_opt:
-                obj.position = last_opt.position + 1
-            else:
-                obj.position = 2 
-        super().save_model(request, obj, form, change)
+    # Neue Optionen bekommen ihre Position in bearbeitung.wende_optionen_an (AufgabeAdmin.save_formset)
 
 class AufgabeAdminForm(forms.ModelForm):
     class Meta:
@@ -162,6 +154,17 @@ class AufgabeAdmin(admin.ModelAdmin):
             obj.von = request.user
         super().save_model(request, obj, form, change)
 
+    def save_formset(self, request, form, formset, change):
+        # Optionen gebündelt über bearbeitung.py statt einzeln (je ein Signal pro Option)
+        if formset.model is not AufgabeOption:
+            return super().save_formset(request, form, formset, change)
+        formset.save(commit=False)
+        wende_optionen_an(
+            neu=formset.new_objects,
+            geaendert=[obj for obj, _ in formset.changed_objects],
+            geloescht=formset.deleted_objects,
+        )
+
 @admin.register(Protokoll)
 class ProtokollAdmin(admin.ModelAdmin):
     # Diese Spalten werden in der Übersicht angezeigt
@@ -179,3 +182,8 @@ class FehlerLogAdmin(admin.ModelAdmin):
     list_filter = ('aufgabe__thema', 'zeitpunkt')
     search_fields = ('eingegebene_antwort', 'aufgabe__lfd_nr')
 
+@admin.register(FehlerSumme)
+class FehlerSummeAdmin(admin.ModelAdmin):
+    list_display = ('aufgabe', 'antwort', 'anzahl', 'erster', 'letzter')
+    list_filter = ('aufgabe__thema',)
+    search_fields = ('antwort', 'aufgabe__lfd_nr')
@@ -0,0 +1,78 @@
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+# ===========================================================
+# ÄHNLICHKEIT (Fuzzy-Vergleich)
+# Entscheidet exakt wie SequenceMatcher(None, a, b).ratio() >= schwelle,
+# schließt aber die meisten Paare vorher billig aus:
+#   1. Länge:  ratio <= 2 * min(la, lb) / (la + lb)
+#   2. LCS:    ratio <= 2 * LCS(a, b) / (la + lb)
+#      (die Treffer des SequenceMatcher sind eine gemeinsame Teilfolge)
+# Die LCS wird bitparallel berechnet und bricht ab, sobald die Schwelle
+# nicht mehr erreichbar ist. Nur die knappen Fälle gehen an difflib.
+# ===========================================================
+
+@lru_cache(maxsize=4096)
+def _masken(a):
+    # Pro Zeichen ein Bitmuster der Positionen in a
+    masken = {}
+    for i, c in enumerate(a):
+        masken[c] = masken.get(c, 0) | (1 << i)
+    return masken
+
+
+def _lcs_erreicht(a, b, mindestens):
+    """True, wenn die längste gemeinsame Teilfolge mindestens so lang ist (Hyyrö)."""
+    if mindestens <= 0:
+        return True
+    masken = _masken(a)
+    alle = (1 << len(a)) - 1
+    v = alle
+    rest = len(b)
+    for c in b:
+        u = v & masken.get(c, 0)
+        v = ((v + u) | (v - u)) & alle
+        rest -= 1
+        # Bisherige LCS = Anzahl Nullen in v; mehr als 'rest' kommt nicht mehr dazu
+        if len(a) - v.bit_count() + rest < mindestens:
+            return False
+    return len(a) - v.bit_count() >= mindestens
+
+
+def _ratio(treffer, gesamt):
+    # Dieselbe Rechnung wie difflib (_calculate_ratio), damit Grenzfälle gleich ausgehen
+    return 2.0 * treffer / gesamt if gesamt else 1.0
+
+
+@lru_cache(maxsize=1024)
+def mindest_treffer(gesamt, schwelle):
+    """Kleinste Trefferzahl, mit der ratio >= schwelle bei Gesamtlänge gesamt erreicht wird."""
+    mindestens = int(schwelle * gesamt / 2)
+    while mindestens > 0 and _ratio(mindestens - 1, gesamt) >= schwelle:
+        mindestens -= 1
+    while _ratio(mindestens, gesamt) < schwelle:
+        mindestens += 1
+    return mindestens
+
+
+def ist_aehnlich(a, b, schwelle):
+    """SequenceMatcher(None, a, b).ratio() >= schwelle, nur schneller."""
+    la, lb = len(a), len(b)
+    gesamt = la + lb
+    if a == b:
+        return 1.0 >= schwelle
+    if _ratio(min(la, lb), gesamt) < schwelle:
+        return False
+
+    if not _lcs_erreicht(a, b, mindest_treffer(gesamt, schwelle)):
+        return False
+
+    return SequenceMatcher(None, a, b).ratio() >= schwelle
+
+
+def findet_aehnliches(soll, woerter, schwelle):
+    """Erstes Wort, das zu soll ähnlich genug ist (Reihenfolge wie SequenceMatcher(None, soll, wort))."""
+    for wort in dict.fromkeys(woerter):
+        if ist_aehnlich(soll, wort, schwelle):
+            return wort
+    return None
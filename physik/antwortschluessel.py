@@ -0,0 +1,435 @@
+import re
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .aehnlichkeit import ist_aehnlich, mindest_treffer
+
+# ===========================================================
+# ANTWORTSCHLÜSSEL
+# Vorkompilierte Fassung einer Aufgabe für die Bewertung:
+# Typ-Flags, geparster Ausdruck und normalisierte Texte.
+# Wird pro Prozess gecacht (höchstens CACHE_GROESSE, die am längsten
+# unbenutzten fallen heraus) und über Signale (models.py) verworfen.
+# Die anderen Worker erfahren davon über eine Generations-Marke im
+# gemeinsamen Cache: verwerfe_schluessel setzt eine neue, jeder Prozess
+# vergleicht höchstens alle PRUEF_INTERVALL Sekunden und leert bei
+# Abweichung seinen ganzen Cache. Eine Änderung gilt in fremden Workern
+# also mit bis zu PRUEF_INTERVALL Sekunden Verzögerung.
+# ===========================================================
+
+CACHE_GROESSE = 2000
+PRUEF_INTERVALL = 2.0
+GENERATION_KEY = "physik:antwortschluessel:generation"
+
+_CACHE = OrderedDict()
+_SPERRE = threading.Lock()
+_stand = {"generation": None, "geprueft": float("-inf")}
+
+
+# ===========================================================
+# PARSER (o = oder, u = und, Klammern, Bereiche wie 2o9)
+# ===========================================================
+
+def _tokenisiere(typ):
+    tokens = []
+    i = 0
+    while i < len(typ):
+        if typ[i].isdigit():
+            j = i
+            while j < len(typ) and typ[j].isdigit():
+                j += 1
+            tokens.append(("NUM", int(typ[i:j])))
+            i = j
+        elif typ[i] in "ou()":
+            tokens.append((typ[i], typ[i]))
+            i += 1
+        else:
+            i += 1
+    return tokens
+
+
+@lru_cache(maxsize=1024)
+def parse_ausdruck(typ):
+    """
+    Übersetzt einen Typ-String in einen Baum aus Tupeln:
+    ("oder", (..)), ("und", (..)), ("num", n), ("bereich", von, bis), ("leer",)
+    Die Grammatik entspricht exakt dem bisherigen Parser in bewertung.py.
+    """
+    tokens = _tokenisiere(typ or "")
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def eat(k):
+        nonlocal pos
+        if peek() and peek()[0] == k:
+            pos += 1
+            return True
+        return False
+
+    def expr():
+        teile = [term()]
+        while peek() and peek()[0] == "o":
+            eat("o")
+            teile.append(term())
+        return teile[0] if len(teile) == 1 else ("oder", tuple(teile))
+
+    def term():
+        teile = [factor()]
+        while peek() and peek()[0] == "u":
+            eat("u")
+            teile.append(factor())
+        return teile[0] if len(teile) == 1 else ("und", tuple(teile))
+
+    def factor():
+        tok = peek()
+        if not tok:
+            return ("leer",)
+
+        if tok[0] == "(":
+            eat("(")
+            res = expr()
+            eat(")")
+            return res
+
+        if tok[0] == "NUM":
+            num1 = tok[1]
+            eat("NUM")
+            # Folgt ein 'o' und eine weitere NUM? -> Bereich
+            if peek() and peek()[0] == "o":
+                if pos + 1 < len(tokens) and tokens[pos + 1][0] == "NUM":
+                    eat("o")
+                    num2 = tokens[pos][1]
+                    eat("NUM")
+                    return ("bereich", num1, num2)
+            return ("num", num1)
+
+        return ("leer",)
+
+    return expr()
+
+
+def werte_aus(knoten, vergleich):
+    """
+    Wertet einen geparsten Ausdruck aus. vergleich(index) -> (ok, hinweis).
+    Die Hinweis-Regeln entsprechen dem alten Parser.
+    """
+    art = knoten[0]
+
+    if art == "num":
+        return vergleich(knoten[1])
+
+    if art == "bereich":
+        for n in range(knoten[1], knoten[2] + 1):
+            ok, hinw = vergleich(n)
+            if ok:
+                return True, hinw
+        return False, None
+
+    if art == "oder":
+        res_ok, res_hinweis = werte_aus(knoten[1][0], vergleich)
+        for teil in knoten[1][1:]:
+            ok2, hinw2 = werte_aus(teil, vergleich)
+            res_ok = res_ok or ok2
+            if ok2 and not res_hinweis:
+                res_hinweis = hinw2
+        return res_ok, res_hinweis
+
+    if art == "und":
+        res_ok, res_hinweis = werte_aus(knoten[1][0], vergleich)
+        for teil in knoten[1][1:]:
+            ok2, hinw2 = werte_aus(teil, vergleich)
+            res_ok = res_ok and ok2
+            if not ok2:
+                res_hinweis = hinw2
+        return res_ok, res_hinweis
+
+    return False, None
+
+
+def indizes(typ):
+    # Alle Zahlen eines Ausdrucks in Reihenfolge (z.B. für verbotene Begriffe)
+    return [wert for art, wert in _tokenisiere(typ or "") if art == "NUM"]
+
+
+# ===========================================================
+# TRIGRAMM-INDEX
+# Findet für eine Antwort die Texte, die beim Fuzzy-Vergleich überhaupt
+# treffen können, ohne alle Alternativen einzeln durchzugehen.
+# Verlustfrei: Jede von n Einfüge-/Löschoperationen zerstört höchstens
+# 3 Trigramme, also teilen zwei Wörter mit ratio >= schwelle mindestens
+#   max(la, lb) - 2 - 3 * (la + lb - 2 * mindest_treffer)
+# Trigramme. Die Kandidaten werden danach exakt geprüft.
+# Bei kurzen, ähnlich langen Wörtern greift die Schranke nicht; dafür wird
+# das Ergebnis je Antwort-Wort gemerkt (die Wortschätze einer Klasse
+# wiederholen sich stark).
+# ===========================================================
+
+WORT_CACHE_GROESSE = 5000
+
+
+def trigramme(text):
+    return Counter(text[i:i + 3] for i in range(len(text) - 2))
+
+
+class TrigrammIndex:
+
+    def __init__(self, texte):
+        # texte: {index: gefalteter Text}
+        self.texte = texte
+        self.anzahl = {}
+        self.index = defaultdict(list)
+        self.laengen = defaultdict(list)
+        self.wort_cache = {}
+        for idx, text in texte.items():
+            zaehler = trigramme(text)
+            self.anzahl[idx] = sum(zaehler.values())
+            for tri, n in zaehler.items():
+                self.index[tri].append((idx, n))
+            self.laengen[len(text)].append(idx)
+
+    def gemeinsam(self, zaehler):
+        # Gemeinsame Trigramme (mit Vielfachheit) je Text
+        treffer = defaultdict(int)
+        for tri, n in zaehler.items():
+            for idx, m in self.index.get(tri, ()):
+                treffer[idx] += min(n, m)
+        return treffer
+
+    def enthalten(self, satz):
+        """Indizes, deren Text als Teilstring im Satz steht."""
+        gemeinsam = self.gemeinsam(trigramme(satz))
+        kandidaten = [idx for idx, n in gemeinsam.items() if n == self.anzahl[idx]]
+        # Texte unter 3 Zeichen haben keine Trigramme
+        kandidaten += [idx for laenge in (0, 1, 2) for idx in self.laengen.get(laenge, ())]
+        return {idx for idx in kandidaten if self.texte[idx] in satz}
+
+    def aehnlich(self, woerter, schwelle, ausser=()):
+        """Indizes, zu denen mindestens ein Wort ähnlich genug ist (wie ist_aehnlich)."""
+        treffer = set()
+        for wort in dict.fromkeys(woerter):
+            treffer |= self.aehnlich_zu(wort, schwelle)
+        return treffer - set(ausser)
+
+    def aehnlich_zu(self, wort, schwelle):
+        # Schüler verwenden immer wieder dieselben Wörter -> Ergebnis je Wort merken
+        schluessel = (wort, schwelle)
+        treffer = self.wort_cache.get(schluessel)
+        if treffer is None:
+            if len(self.wort_cache) >= WORT_CACHE_GROESSE:
+                self.wort_cache.clear()
+            treffer = self.wort_cache[schluessel] = self._aehnlich_zu(wort, schwelle)
+        return treffer
+
+    def _aehnlich_zu(self, wort, schwelle):
+        lw = len(wort)
+        kandidaten = set()
+        noetig_je_laenge = {}
+        for la, idxs in self.laengen.items():
+            gesamt = la + lw
+            if 2.0 * min(la, lw) / gesamt < schwelle:
+                continue
+            noetig = max(la, lw) - 2 - 3 * (gesamt - 2 * mindest_treffer(gesamt, schwelle))
+            if noetig > 0:
+                noetig_je_laenge[la] = noetig
+            else:
+                # Schranke greift nicht (kurze Wörter): alle dieser Länge prüfen
+                kandidaten.update(idxs)
+        if noetig_je_laenge:
+            for i, n in self.gemeinsam(trigramme(wort)).items():
+                if n >= noetig_je_laenge.get(len(self.texte[i]), n + 1):
+                    kandidaten.add(i)
+        return frozenset(i for i in kandidaten if ist_aehnlich(self.texte[i], wort, schwelle))
+
+
+# ===========================================================
+# SCHLÜSSEL
+# ===========================================================
+
+class Antwortschluessel:
+    """
+    Unveränderliche, DB-freie Sicht auf eine Aufgabe für die Bewertung.
+    texte[0] bleibt leer, texte[1] = loesung, ab texte[2] = Optionen nach Position.
+    """
+
+    def __init__(self, aufgabe_id, typ, loesung, erklaerung, optionen, richtiges_bild=None):
+        self.aufgabe_id = aufgabe_id
+        self.typ_roh = (typ or "").strip()
+        self.loesung = loesung or ""
+        self.erklaerung = erklaerung or ""
+        self.optionen = tuple(optionen)
+        # Bildauswahl (Typ p): ID des ersten Bildes
+        self.richtiges_bild = richtiges_bild
+
+        # Flags bereinigen
+        self.typ = self.typ_roh.replace("X", "").replace("Y", "").replace("Z", "").strip()
+
+        self.ist_logisch = "o" in self.typ or "u" in self.typ
+        self.is_pure_number = self.typ.isdigit()
+
+        # X-Flag: Bei reinen Zahlen ist case-sensitiv Standard, bei Texten umgekehrt
+        if self.is_pure_number:
+            self.case_sensitiv = "X" not in self.typ_roh
+        else:
+            self.case_sensitiv = "X" in self.typ_roh
+
+        # Fuzzy-Aktivierung (Y, Z oder automatisch bei o/u)
+        self.fuzzy_aktiv = False
+        self.ratio = 0.8
+        if "Y" in self.typ_roh:
+            self.fuzzy_aktiv = True
+        elif "Z" in self.typ_roh:
+            self.fuzzy_aktiv = True
+            self.ratio = 0.65
+        elif self.ist_logisch:
+            self.fuzzy_aktiv = True
+
+        # f = verbotene Begriffe (alles hinter dem 'f')
+        self.hat_verbot = "f" in self.typ_roh
+        self.verbot = self.typ_roh.split("f", 1)[1] if self.hat_verbot else ""
+
+        # Texte: Index 1 = Lösung, ab 2 = Optionen
+        self.texte = ("", self.loesung) + self.optionen
+        self.texte_gestrippt = tuple(t.strip() for t in self.texte)
+        self.texte_gefaltet = tuple(t.casefold().strip() for t in self.texte)
+
+        # Lückentext (l): pro Option die erlaubten Alternativen ("Reihe; Reihenschaltung")
+        luecken = []
+        for t in self.optionen:
+            erlaubte = tuple(e.strip() for e in str(t).split(";") if e.strip())
+            luecken.append((erlaubte, tuple(e.lower() for e in erlaubte)))
+        self.luecken = tuple(luecken)
+
+        # Vorgeparste Ausdrücke
+        self.ausdruck = parse_ausdruck(self.typ)
+        self.verbot_ausdruck = parse_ausdruck(self.verbot) if self.verbot else None
+        self.verbot_indizes = tuple(indizes(self.verbot))
+
+        # Erst beim ersten Fuzzy-Vergleich aufgebaut
+        self._trigramm_index = None
+
+    def text(self, index):
+        if 1 <= index < len(self.texte):
+            return self.texte[index]
+        return ""
+
+    @property
+    def trigramm_index(self):
+        if self._trigramm_index is None:
+            self._trigramm_index = TrigrammIndex({
+                i: self.texte_gefaltet[i] for i in range(1, len(self.texte)) if self.texte[i]
+            })
+        return self._trigramm_index
+
+    def fuzzy_treffer(self, antwort_original, ratio):
+        """
+        Ergebnis von vergleich_fuzzy für alle Texte auf einmal: {index: (ok, hinweis)}.
+        Fehlende Indizes haben nicht getroffen.
+        """
+        if not antwort_original:
+            return {}
+        satz = antwort_original.casefold().strip()
+        index = self.trigramm_index
+        enthalten = index.enthalten(satz)
+        aehnlich = index.aehnlich(re.findall(r"\w+", satz), ratio, ausser=enthalten)
+
+        treffer = {i: (True, None) for i in enthalten}
+        for i in aehnlich:
+            treffer[i] = (True, f"Fast richtig – gemeint war: {self.texte[i]}")
+        return treffer
+
+    @classmethod
+    def aus_aufgabe(cls, aufgabe):
+        if isinstance(aufgabe.optionen, tuple):
+            # AufgabenDaten: Optionen liegen bereits sortiert im Speicher
+            optionen = aufgabe.optionen
+        else:
+            # .all() nutzt vorhandene prefetch_related-Daten, sonst genau eine Abfrage
+            optionen = sorted(
+                aufgabe.optionen.all() if aufgabe.pk else [],
+                key=lambda o: (o.position is not None, o.position or 0, o.id or 0),
+            )
+        richtiges_bild = None
+        if aufgabe.typ == "p":
+            if isinstance(aufgabe.bilder, tuple):
+                bilder = aufgabe.bilder
+            else:
+                bilder = sorted(
+                    aufgabe.bilder.all() if aufgabe.pk else [],
+                    key=lambda b: (b.position is not None, b.position or 0, b.id or 0),
+                )
+            richtiges_bild = bilder[0].id if bilder else None
+        return cls(
+            aufgabe_id=aufgabe.pk,
+            typ=aufgabe.typ,
+            loesung=aufgabe.loesung,
+            erklaerung=getattr(aufgabe, "erklaerung", ""),
+            optionen=[o.text for o in optionen],
+            richtiges_bild=richtiges_bild,
+        )
+
+
+def hole_schluessel(aufgabe):
+    """Liefert den (gecachten) Antwortschlüssel zu einer Aufgabe (oder den Schlüssel selbst)."""
+    if isinstance(aufgabe, Antwortschluessel):
+        return aufgabe
+    if aufgabe.pk is None:
+        return Antwortschluessel.aus_aufgabe(aufgabe)
+
+    schluessel = gecachter_schluessel(aufgabe.pk)
+    if schluessel is None:
+        schluessel = Antwortschluessel.aus_aufgabe(aufgabe)
+        with _SPERRE:
+            _CACHE[aufgabe.pk] = schluessel
+            if len(_CACHE) > CACHE_GROESSE:
+                _CACHE.popitem(last=False)
+    return schluessel
+
+
+def gecachter_schluessel(aufgabe_id):
+    """Schlüssel aus dem Cache ohne Datenbankzugriff, sonst None."""
+    _pruefe_generation()
+    with _SPERRE:
+        schluessel = _CACHE.get(aufgabe_id)
+        if schluessel is not None:
+            _CACHE.move_to_end(aufgabe_id)
+    return schluessel
+
+
+def verwerfe_schluessel(aufgabe_id=None):
+    """Entfernt einen Schlüssel aus dem Cache (ohne ID: alle) - hier sofort, in den anderen Workern per Generation."""
+    with _SPERRE:
+        if aufgabe_id is None:
+            _CACHE.clear()
+        else:
+            _CACHE.pop(aufgabe_id, None)
+    _gemeinsamer_cache().set(GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def _gemeinsamer_cache():
+    # Derselbe prozessübergreifende Cache wie die Sessions
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def _pruefe_generation():
+    jetzt = time.monotonic()
+    if jetzt - _stand["geprueft"] < PRUEF_INTERVALL:
+        return
+    _stand["geprueft"] = jetzt
+    cache = _gemeinsamer_cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Noch nie gesetzt oder verdrängt: eine neue Marke gilt als Änderung
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    if generation != _stand["generation"]:
+        with _SPERRE:
+            _CACHE.clear()
+        _stand["generation"] = generation
@@ -0,0 +1,164 @@
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, Http404
+from django.views.decorators.http import require_GET, require_POST
+
+from .antwortschluessel import hole_schluessel, gecachter_schluessel
+from .aufgabendaten import lade_aufgabe, lade_aufgaben
+from .models import Aufgabe, ThemenBereich
+from . import lernfortschritt
+from .quiz import (
+    serie_aus_parametern, bereite_anzeige, verarbeite_antwort, verbuche, melde, anzeige_als_json, stand_als_json,
+)
+from .seriestand import SerienStand
+
+# ===========================================================
+# JSON-SCHNITTSTELLE FÜR DIE SERIE
+# Eine Antwort = ein Request: Bewertung und nächste Aufgabe kommen
+# in derselben Antwort zurück. Aktuelle und nächste Aufgabe werden
+# gemeinsam geladen (dieselben drei Abfragen wie für eine Aufgabe).
+# Der Stand bleibt im signierten Serien-Cookie, die Lösung prüft der Server.
+#
+# Alternativ liefert serie_start die ganze Serie auf einmal; danach
+# schickt der Client nur noch Antworten mit "vorab" und der Server
+# bewertet aus dem vorgewärmten Antwortschlüssel ohne Datenbank.
+# ===========================================================
+
+def _antwort_daten(request):
+    # Formular (FormData aus aufgabe.html) oder JSON-Body
+    if request.content_type == "application/json":
+        try:
+            daten = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return daten if isinstance(daten, dict) else None
+    return request.POST
+
+
+def _lade(stand, mit_naechster=False):
+    ids = [stand.aktuelle_id]
+    if mit_naechster and stand.index + 1 < len(stand.aufgaben_ids):
+        ids.append(stand.aufgaben_ids[stand.index + 1])
+    nach_id = {a.id: a for a in lade_aufgaben(ids)}
+    if stand.aktuelle_id not in nach_id:
+        raise Http404("Aufgabe nicht gefunden.")
+    return nach_id
+
+
+def _variante(wert, schluessel):
+    # Vom Client: auf die vorhandenen Lösungs-Varianten begrenzen (passt dann auch ins Cookie)
+    try:
+        wert = int(wert)
+    except (TypeError, ValueError):
+        return None
+    anzahl = len(schluessel.loesung.split(";"))
+    return min(max(wert, 0), anzahl - 1)
+
+
+def _schluessel(aufgabe_id):
+    schluessel = gecachter_schluessel(aufgabe_id)
+    if schluessel is None:
+        try:
+            schluessel = lade_aufgabe(aufgabe_id)
+        except Aufgabe.DoesNotExist:
+            raise Http404("Aufgabe nicht gefunden.")
+    return schluessel
+
+
+@login_required
+@require_GET
+def serie_start(request):
+    """Startet eine Serie und liefert alle Aufgaben mit Optionen & Medien (drei Abfragen)."""
+    lernfortschritt.schreibe(request.user.pk)
+    try:
+        ids = serie_aus_parametern(request.user, request.GET)
+    except (ThemenBereich.DoesNotExist, ValueError):
+        return JsonResponse({"fehler": "Unbekannter Themenbereich oder ungültige Parameter."}, status=400)
+    stand = SerienStand(ids)
+
+    aufgaben = []
+    for aufgabe in lade_aufgaben(ids):
+        # Schlüssel vorwärmen: die Antworten der Serie brauchen keine Aufgabe mehr
+        hole_schluessel(aufgabe)
+        aufgaben.append(anzeige_als_json(bereite_anzeige(aufgabe)))
+
+    if not aufgaben:
+        return SerienStand.loesche(JsonResponse({"serie": None, "aufgaben": []}))
+    return stand.speichere(request, JsonResponse({"serie": stand_als_json(stand), "aufgaben": aufgaben}))
+
+
+@login_required
+@require_GET
+def serie_aufgabe(request):
+    """Aktuelle Aufgabe der laufenden Serie."""
+    stand = SerienStand.aus_request(request)
+    if stand.beendet:
+        return SerienStand.loesche(JsonResponse({"serie": stand_als_json(stand), "aufgabe": None}))
+
+    anzeige = bereite_anzeige(_lade(stand)[stand.aktuelle_id], stand.aktiver_index)
+    stand.aktiver_index = anzeige.variante
+    return stand.speichere(request, JsonResponse({
+        "serie": stand_als_json(stand),
+        "aufgabe": anzeige_als_json(anzeige),
+    }))
+
+
+@login_required
+@require_POST
+def serie_antwort(request):
+    """Bewertet eine Eingabe; bei richtig/übersprungen kommt die nächste Aufgabe gleich mit."""
+    daten = _antwort_daten(request)
+    if daten is None:
+        return JsonResponse({"fehler": "Ungültiges JSON."}, status=400)
+
+    stand = SerienStand.aus_request(request)
+    if stand.beendet:
+        return SerienStand.loesche(JsonResponse({"fehler": "Keine laufende Serie."}, status=409))
+
+    antwort = str(daten.get("user_antwort") or daten.get("antwort") or "")
+    bild_antwort = daten.get("bild_antwort") or None
+
+    aufgabe_id = stand.aktuelle_id
+    if daten.get("vorab"):
+        # Der Client hat die Serie (serie_start): Variante kommt aus dessen Daten,
+        # die nächste Aufgabe muss nicht mitgeschickt werden
+        schluessel = _schluessel(stand.aktuelle_id)
+        if stand.aktiver_index is None:
+            stand.aktiver_index = _variante(daten.get("variante"), schluessel)
+        ergebnis = verarbeite_antwort(stand, schluessel, antwort, bild_antwort)
+        nach_id = {}
+    else:
+        nach_id = _lade(stand, mit_naechster=True)
+        anzeige = bereite_anzeige(nach_id[stand.aktuelle_id], stand.aktiver_index)
+        stand.aktiver_index = anzeige.variante
+        ergebnis = verarbeite_antwort(stand, anzeige.aufgabe, antwort, bild_antwort)
+
+    verbuche(request.user, aufgabe_id, ergebnis, antwort or bild_antwort, stand)
+
+    naechste = None
+    if ergebnis.weiter and not stand.beendet and stand.aktuelle_id in nach_id:
+        anzeige = bereite_anzeige(nach_id[stand.aktuelle_id])
+        stand.aktiver_index = anzeige.variante
+        naechste = anzeige_als_json(anzeige)
+
+    # Kann der Browser die nächste Aufgabe nicht selbst zeichnen (Ende, Medien,
+    # Auswahl), lädt er die Seite neu; die Rückmeldung erscheint dann dort.
+    seite = ergebnis.weiter and not daten.get("vorab") and (naechste is None or naechste["nur_seite"])
+    if seite:
+        melde(request, ergebnis)
+
+    response = JsonResponse({
+        "ergebnis": {
+            "art": ergebnis.art,
+            "richtig": ergebnis.art == "richtig",
+            "ungueltig": ergebnis.art == "ungueltig",
+            "hinweis": ergebnis.hinweis,
+        },
+        "serie": stand_als_json(stand),
+        "aufgabe": naechste,
+        "seite": seite,
+    })
+    if stand.beendet:
+        return SerienStand.loesche(response)
+    return stand.speichere(request, response)
@@ -0,0 +1,98 @@
+from typing import NamedTuple
+
+from django.db.models import Prefetch
+
+from .models import Aufgabe, AufgabeOption, AufgabeBild
+
+# ===========================================================
+# AUFGABEN-DATEN
+# Unveränderliche Momentaufnahme einer Aufgabe mit Optionen und Medien.
+# Wird einmal geladen (konstante Anzahl Abfragen) und dann von View,
+# Template und Bewertung gemeinsam benutzt.
+# ===========================================================
+
+class OptionDaten(NamedTuple):
+    id: int
+    position: int
+    text: str
+
+
+class MedienDaten(NamedTuple):
+    id: int
+    position: int
+    bild_url: str
+    video_url: str
+
+
+class AufgabenDaten(NamedTuple):
+    id: int
+    lfd_nr: str
+    thema_id: int
+    kapitel_id: int
+    kapitel: str
+    schwierigkeit: int
+    typ: str
+    zeichen: str
+    frage: str
+    einheit: str
+    loesung: str
+    anmerkung: str
+    erklaerung: str
+    hilfe: str
+    optionen: tuple
+    bilder: tuple
+
+    @property
+    def pk(self):
+        return self.id
+
+    @classmethod
+    def aus_aufgabe(cls, aufgabe):
+        # Erwartet select_related("kapitel__thema") und prefetch von optionen/bilder
+        return cls(
+            id=aufgabe.id,
+            lfd_nr=aufgabe.lfd_nr,
+            thema_id=aufgabe.thema_id,
+            kapitel_id=aufgabe.kapitel_id,
+            kapitel=str(aufgabe.kapitel),
+            schwierigkeit=aufgabe.schwierigkeit,
+            typ=aufgabe.typ or "",
+            zeichen=aufgabe.zeichen,
+            frage=aufgabe.frage,
+            einheit=aufgabe.einheit,
+            loesung=aufgabe.loesung,
+            anmerkung=aufgabe.anmerkung,
+            erklaerung=aufgabe.erklaerung,
+            hilfe=aufgabe.hilfe,
+            optionen=tuple(
+                OptionDaten(o.id, o.position, o.text) for o in aufgabe.optionen.all()
+            ),
+            bilder=tuple(
+                MedienDaten(
+                    b.id,
+                    b.position,
+                    b.bild.url if b.bild else "",
+                    b.video.url if b.video else "",
+                )
+                for b in aufgabe.bilder.all()
+            ),
+        )
+
+
+def aufgaben_mit_allem():
+    """Queryset, das Kapitel/Thema mitlädt und Optionen/Medien sortiert vorab holt."""
+    return Aufgabe.objects.select_related("kapitel__thema").prefetch_related(
+        Prefetch("optionen", queryset=AufgabeOption.objects.order_by("position", "id")),
+        Prefetch("bilder", queryset=AufgabeBild.objects.order_by("position", "id")),
+    )
+
+
+def lade_aufgabe(aufgabe_id):
+    """Eine Aufgabe in drei Abfragen (Aufgabe+Kapitel+Thema, Optionen, Medien)."""
+    return AufgabenDaten.aus_aufgabe(aufgaben_mit_allem().get(id=aufgabe_id))
+
+
+def lade_aufgaben(aufgabe_ids):
+    """Mehrere Aufgaben in derselben konstanten Anzahl Abfragen, Reihenfolge wie ids."""
+    nach_id = {a.id: a for a in aufgaben_mit_allem().filter(id__in=aufgabe_ids)}
+    return [AufgabenDaten.aus_aufgabe(nach_id[i]) for i in aufgabe_ids if i in nach_id]
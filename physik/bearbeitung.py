@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models import Max
+
+from .antwortschluessel import verwerfe_schluessel
+from .models import Aufgabe, AufgabeOption, Benachrichtigung
+
+# ===========================================================
+# AUFGABEN BEARBEITEN (gemeinsamer Schreibweg für fehler_edit, Admin und Import)
+# Ein Options-Diff wird mit je einer Anweisung angewendet (bulk_update,
+# bulk_create, ein DELETE) - in einer Transaktion. bulk_* löst keine Signale
+# aus, darum passiert das, was sonst die Signale pro Option erledigen
+# (Antwortschlüssel verwerfen, Import-Prüfsumme leeren), hier einmal pro Aufgabe.
+# ===========================================================
+
+# Position 1 ist die offizielle Antwort, Optionen beginnen bei 2
+ERSTE_POSITION = 2
+
+
+def wende_optionen_an(neu=(), geaendert=(), geloescht=(), pruefsumme=True):
+    """
+    neu: ungespeicherte, geaendert: geladene und veränderte (text/position),
+    geloescht: zu löschende AufgabeOptionen. Mehrere Aufgaben erlaubt.
+    pruefsumme=False: Import-Prüfsumme nicht leeren (der Import setzt sie selbst).
+    Liefert die IDs der betroffenen Aufgaben.
+    """
+    neu, geaendert, geloescht = list(neu), list(geaendert), list(geloescht)
+    betroffen = {o.aufgabe_id for o in neu + geaendert + geloescht}
+    with transaction.atomic():
+        if geloescht:
+            AufgabeOption.objects.filter(id__in=[o.id for o in geloescht]).delete()
+        if geaendert:
+            AufgabeOption.objects.bulk_update(geaendert, ["text", "position"])
+        if neu:
+            _vergib_positionen(neu)
+            AufgabeOption.objects.bulk_create(neu)
+        if betroffen and pruefsumme:
+            # Optionen gehören zur Import-Prüfsumme der Aufgabe
+            Aufgabe.objects.filter(pk__in=betroffen).exclude(inhalt_hash="").update(inhalt_hash="")
+    for aufgabe_id in betroffen:
+        verwerfe_schluessel(aufgabe_id)
+    return betroffen
+
+
+def _vergib_positionen(neu):
+    # bulk_create umgeht AufgabeOption.save(): fehlende Positionen (z.B. Admin-Inline,
+    # dort schreibgeschützt) hinten anhängen - eine Abfrage für alle betroffenen Aufgaben
+    ohne = [o for o in neu if o.position is None]
+    if not ohne:
+        return
+    letzte = dict(
+        AufgabeOption.objects.filter(aufgabe_id__in={o.aufgabe_id for o in ohne})
+        .values("aufgabe_id").annotate(m=Max("position")).values_list("aufgabe_id", "m")
+    )
+    for o in neu:
+        if o.position is not None:
+            letzte[o.aufgabe_id] = max(letzte.get(o.aufgabe_id) or 0, o.position)
+    for o in ohne:
+        o.position = max(letzte.get(o.aufgabe_id) or 0, ERSTE_POSITION - 1) + 1
+        letzte[o.aufgabe_id] = o.position
+
+
+def speichere_aufgabe(aufgabe, felder=None, optionen=None, neue_optionen=()):
+    """
+    Ändert eine Aufgabe samt Optionen in einer Transaktion, mit einer Benachrichtigung.
+    felder: {feld: wert} der Aufgabe,
+    optionen: {option_id: text} bestehender Optionen (leerer Text = löschen; fremde IDs werden ignoriert),
+    neue_optionen: Texte, die hinten angehängt werden (leere werden übergangen).
+    Liefert True, wenn sich etwas geändert hat.
+    """
+    geaenderte_felder = [f for f, wert in (felder or {}).items() if getattr(aufgabe, f) != wert]
+    for feld in geaenderte_felder:
+        setattr(aufgabe, feld, felder[feld])
+
+    # Eine Abfrage für den Bestand (auch für die nächste freie Position)
+    vorhandene = {o.id: o for o in AufgabeOption.objects.filter(aufgabe=aufgabe)}
+    geaendert, geloescht = [], []
+    for opt_id, text in (optionen or {}).items():
+        option = vorhandene.get(opt_id)
+        if option is None:
+            continue
+        text = (text or "").strip()
+        if not text:
+            geloescht.append(option)
+        elif option.text != text:
+            option.text = text
+            geaendert.append(option)
+
+    position = max((o.position for o in vorhandene.values()), default=ERSTE_POSITION - 1)
+    neu = []
+    for text in neue_optionen:
+        if text and text.strip():
+            position += 1
+            neu.append(AufgabeOption(aufgabe=aufgabe, position=position, text=text.strip()))
+
+    with transaction.atomic():
+        optionen_geaendert = bool(wende_optionen_an(neu, geaendert, geloescht))
+        if geaenderte_felder:
+            # post_save: Antwortschlüssel verwerfen und Benachrichtigung vormerken
+            # (save() leert auch die Import-Prüfsumme)
+            aufgabe.save(update_fields=geaenderte_felder)
+        elif optionen_geaendert:
+            Benachrichtigung.vormerken(aufgabe)
+    return bool(geaenderte_felder) or optionen_geaendert
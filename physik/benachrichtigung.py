@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail, get_connection
+from django.utils import timezone
+
+from .models import Benachrichtigung
+
+# ===========================================================
+# BENACHRICHTIGUNGEN (Outbox -> Sammel-Mail)
+# ===========================================================
+
+def empfaenger():
+    return list(getattr(settings, "PHYSIK_INFO_EMPFAENGER", ["info@physiktrainer.app"]))
+
+def fenster():
+    return timedelta(minutes=getattr(settings, "PHYSIK_DIGEST_MINUTEN", 10))
+
+def baue_digest(eintraege):
+    """
+    Fasst Outbox-Einträge pro Aufgabe zusammen und liefert (betreff, nachricht).
+    Mehrfache Änderungen derselben Aufgabe ergeben nur eine Zeile.
+    """
+    pro_aufgabe = {}
+    for e in eintraege:
+        key = e.aufgabe_id or e.lfd_nr
+        if key not in pro_aufgabe:
+            pro_aufgabe[key] = {"lfd_nr": e.lfd_nr, "aufgabe_id": e.aufgabe_id, "neu": False, "anzahl": 0}
+        pro_aufgabe[key]["neu"] = pro_aufgabe[key]["neu"] or e.neu
+        pro_aufgabe[key]["anzahl"] += 1
+
+    zeilen = []
+    for info in pro_aufgabe.values():
+        status = "NEU ERSTELLT" if info["neu"] else "GEÄNDERT"
+        zeile = f"Nr. {info['lfd_nr']}: {status}"
+        if info["anzahl"] > 1:
+            zeile += f" ({info['anzahl']}x)"
+        if info["aufgabe_id"]:
+            # Die Admin-URLs basieren auf der Primärschlüssel-ID
+            zeile += f"\n  https://physiktrainer.app/admin/physik/aufgabe/{info['aufgabe_id']}/change/"
+        zeilen.append(zeile)
+
+    if len(pro_aufgabe) == 1:
+        info = next(iter(pro_aufgabe.values()))
+        status = "NEU ERSTELLT" if info["neu"] else "GEÄNDERT"
+        betreff = f"PT-Info: Aufgabe Nr. {info['lfd_nr']} {status}"
+    else:
+        betreff = f"PT-Info: {len(pro_aufgabe)} Aufgaben neu/geändert"
+
+    nachricht = "Folgende Aufgaben wurden neu erstellt oder geändert:\n\n" + "\n".join(zeilen)
+    return betreff, nachricht
+
+def versende_digest(jetzt=None, warte_fenster=True, connection=None):
+    """
+    Verschickt alle offenen Einträge als eine Mail.
+    Mit warte_fenster=True wird erst versendet, wenn der älteste offene Eintrag
+    älter als das Sammel-Fenster ist - so landen Serien von Änderungen in einer Mail.
+    Rückgabe: Anzahl der versendeten Einträge.
+    """
+    jetzt = jetzt or timezone.now()
+    offen = Benachrichtigung.objects.filter(versendet__isnull=True).order_by("zeitpunkt")
+
+    erster = offen.first()
+    if erster is None:
+        return 0
+    if warte_fenster and erster.zeitpunkt > jetzt - fenster():
+        return 0
+
+    eintraege = list(offen.filter(zeitpunkt__lte=jetzt))
+    betreff, nachricht = baue_digest(eintraege)
+    send_mail(
+        betreff,
+        nachricht,
+        getattr(settings, "DEFAULT_FROM_EMAIL", "info@physiktrainer.app"),
+        empfaenger(),
+        fail_silently=False,
+        connection=connection or get_connection(),
+    )
+    Benachrichtigung.objects.filter(id__in=[e.id for e in eintraege]).update(versendet=jetzt)
+    return len(eintraege)
@@ -1,31 +1,26 @@
-from difflib import SequenceMatcher
 import re
-from .models import Protokoll, FehlerLog
+from typing import NamedTuple
+
+from .aehnlichkeit import ist_aehnlich, findet_aehnliches
+from .antwortschluessel import hole_schluessel, parse_ausdruck, werte_aus
 
 # ===========================================================
 # VERGLEICHE (Kern-Logik für Sätze)
+# Alle Vergleiche arbeiten auf dem Antwortschlüssel (keine DB-Zugriffe).
 # ===========================================================
 
-def vergleich_streng(index, aufgabe, antwort_norm, antwort_original, case_sensitiv, contain):
+def vergleich_streng(index, schluessel, antwort_norm, antwort_original, case_sensitiv, contain):
     # Feld-Zuordnung: 1 = loesung, ab 2 = optionen
-    if index == 1:
-        text = aufgabe.loesung
-    else:
-        opts = list(aufgabe.optionen.order_by("position"))
-        pos = index - 2
-        if pos < 0 or pos >= len(opts):
-            return False, None
-        text = opts[pos].text
-
-    if not text:
+    if not schluessel.text(index):
         return False, None
 
     # Normalisierung für den Vergleich
-    soll = text.strip()
     ist = antwort_original.strip()
 
-    if not case_sensitiv:
-        soll = soll.casefold()
+    if case_sensitiv:
+        soll = schluessel.texte_gestrippt[index]
+    else:
+        soll = schluessel.texte_gefaltet[index]
         ist = ist.casefold()
 
     # Logik: Teilstring-Suche (für Sätze) oder exakter Vergleich
@@ -38,17 +33,13 @@ def vergleich_streng(index, aufgabe, antwort_norm, antwort_original, case_sensit
         ist_clean = "".join(ist.split())
         return (soll_clean == ist_clean), None
 
-def vergleich_fuzzy(index, aufgabe, antwort_norm, antwort_original, ratio):
-    if index == 1:
-        text = aufgabe.loesung
-    else:
-        opts = list(aufgabe.optionen.order_by("position"))
-        text = opts[index-2].text if (index-2) < len(opts) else ""
+def vergleich_fuzzy(index, schluessel, antwort_norm, antwort_original, ratio):
+    text = schluessel.text(index)
 
     if not text or not antwort_original:
         return False, None
 
-    soll = text.casefold().strip()
+    soll = schluessel.texte_gefaltet[index]
     ist_satz = antwort_original.casefold().strip()
 
     # 1. Schneller Check: Ist das Wort exakt im Satz?
@@ -57,201 +48,122 @@ def vergleich_fuzzy(index, aufgabe, antwort_norm, antwort_original, ratio):
 
     # 2. Wort-für-Wort Fuzzy Check (Damit Tippfehler in langen Sätzen erkannt werden)
     # Wir trennen den Satz an allen Nicht-Wort-Zeichen
+    # (gleiche Entscheidung wie SequenceMatcher, siehe aehnlichkeit.py)
     woerter_im_satz = re.findall(r'\w+', ist_satz)
     
-    for wort in woerter_im_satz:
-        if SequenceMatcher(None, soll, wort).ratio() >= ratio:
-            return True, f"Fast richtig – gemeint war: {text}"
+    if findet_aehnliches(soll, woerter_im_satz, ratio) is not None:
+        return True, f"Fast richtig – gemeint war: {text}"
 
     return False, None
 
 # ===========================================================
-# HAUPTFUNKTION (Bewerte Aufgabe)
+# ERGEBNIS
 # ===========================================================
 
-def bewerte_aufgabe(request, aufgabe, user_antwort, text_antwort=None, bild_antwort=None, session=None):
+class Bewertung(NamedTuple):
+    richtig: bool
+    hinweis: str
+    ungueltig: bool = False
+
+    def als_dict(self):
+        return {"richtig": self.richtig, "hinweis": self.hinweis, "ungueltig": self.ungueltig}
+
+
+# ===========================================================
+# HAUPTFUNKTION (Bewertungskern)
+# ===========================================================
+
+def bewerte(aufgabe, antwort, variante=0, bild_antwort=None):
+    """
+    Bewertet eine Eingabe ohne Request und Session.
+    aufgabe: AufgabenDaten (oder Aufgabe), variante: gewürfelter Index bei Typ r,
+    bild_antwort: gewählte Bild-ID bei Typ p. Liefert eine Bewertung.
+    Greift nur auf den (gecachten) Antwortschlüssel zu und ist damit auch
+    in Thread- oder Prozess-Pools nutzbar.
+    """
     ergebnis = None
-    typ_roh = (aufgabe.typ or "").strip()
-    
-    # Fallback für Tests
-    if not text_antwort and user_antwort:
-        text_antwort = user_antwort
-        
-    norm = "".join(text_antwort.split()) if text_antwort else ""
-    
-    # Flags bereinigen
-    typ_rein = typ_roh.replace("X", "").replace("Y", "").replace("Z", "").strip()
-    
-    # WICHTIG: Erkennung ob logischer Ausdruck (o/u) oder reine Zahl
-    ist_logisch = 'o' in typ_rein or 'u' in typ_rein
-    is_pure_number = typ_rein.isdigit()
-
-    # X-Flag: Case Sensitivity
-    # Bei reinen Zahlen ist X (case-sensitiv) Standard (False), bei Texten umgekehrt
-    if is_pure_number:
-        case_sensitiv = ("X" not in typ_roh) 
-    else:
-        case_sensitiv = ("X" in typ_roh)
-
-    # Fuzzy-Aktivierung (Y, Z oder automatisch bei o/u)
-    fuzzy_aktiv = False
-    ratio = 0.8
-    if "Y" in typ_roh: 
-        fuzzy_aktiv = True
-        ratio = 0.8
-    elif "Z" in typ_roh:
-        fuzzy_aktiv = True
-        ratio = 0.65
-    elif ist_logisch:
-        fuzzy_aktiv = True # Logische Ausdrücke erlauben immer Fuzzy
-        ratio = 0.8
-
-    typ = typ_rein
-
-    # --- A. Spezial-Typen (r, p, w, a, e) ---
-    # (Hier gekürzt: Deine bestehenden Funktionen bewerte_bildauswahl etc. bleiben gleich)
+
+    # Vorkompilierter Schlüssel: Typ-Flags, Ausdruck, Texte (max. 1 Abfrage pro Aufgabe)
+    schluessel = hole_schluessel(aufgabe)
+    text_antwort = antwort or ""
+    norm = "".join(text_antwort.split())
+
+    case_sensitiv = schluessel.case_sensitiv
+    fuzzy_aktiv = schluessel.fuzzy_aktiv
+    ratio = schluessel.ratio
+    ist_logisch = schluessel.ist_logisch
+    typ = schluessel.typ
+
+    # --- A. Spezial-Typen (r, p, w, a, l) ---
     if typ == "r":
-        ergebnis = bewerte_rechnen(aufgabe, text_antwort, request)
+        ergebnis = bewerte_rechnen(schluessel, text_antwort, variante)
     elif "p" in typ:
-        ergebnis = bewerte_bildauswahl(aufgabe, bild_antwort, session)
+        ergebnis = bewerte_bildauswahl(schluessel, bild_antwort)
     elif "w" in typ:
-        ergebnis = bewerte_wahr_falsch(aufgabe, norm)
+        ergebnis = bewerte_wahr_falsch(schluessel, norm)
     elif "a" in typ:
-        ergebnis = bewerte_liste(aufgabe, text_antwort)
+        ergebnis = bewerte_liste(schluessel, text_antwort)
     elif "l" in typ:
         # Die neue Lückentext-Weiche
-        ergebnis = bewerte_luecke(aufgabe, user_antwort, fuzzy_aktiv, ratio)
+        ergebnis = bewerte_luecke(schluessel, text_antwort, fuzzy_aktiv, ratio)
 
     # --- B. Text-Parser (Der entscheidende Teil) ---
     if not ergebnis and "f" in typ:
-        ok, hinweis = pruefe_verbotene_begriffe(aufgabe, norm, text_antwort)
+        ok, hinweis = pruefe_verbotene_begriffe(schluessel, norm, text_antwort)
         if not ok:
-            ergebnis = {"richtig": False, "hinweis": hinweis}
+            ergebnis = Bewertung(False, hinweis)
 
     # 1. Reiner Zahlentyp (nur eine Ziffer)
-    if not ergebnis and is_pure_number:
+    if not ergebnis and schluessel.is_pure_number:
         idx = int(typ)
-        ok, _ = vergleich_streng(idx, aufgabe, norm, text_antwort, case_sensitiv, False)
+        ok, _ = vergleich_streng(idx, schluessel, norm, text_antwort, case_sensitiv, False)
         if ok:
-            ergebnis = {"richtig": True, "hinweis": "Richtig!"}
+            ergebnis = Bewertung(True, "Richtig!")
         elif fuzzy_aktiv:
-            ok_f, f_hinw = vergleich_fuzzy(idx, aufgabe, norm, text_antwort, ratio)
+            ok_f, f_hinw = vergleich_fuzzy(idx, schluessel, norm, text_antwort, ratio)
             if ok_f:
-                ergebnis = {"richtig": True, "hinweis": f_hinw or "Richtig!"}
+                ergebnis = Bewertung(True, f_hinw or "Richtig!")
 
     # 2. Logische Ausdrücke (1o2, 1u(2o3) etc.)
     if not ergebnis:
         # STRENG-CHECK
-        streng_ok, hinweis = bewerte_booleschen_ausdruck(
-            typ, aufgabe, norm, text_antwort,
-            # Bei logischen Ausdrücken ist contain=True (Teilstring-Suche)
-            lambda idx, aufg, n, o: vergleich_streng(idx, aufg, n, o, case_sensitiv, ist_logisch)
+        # Bei logischen Ausdrücken ist contain=True (Teilstring-Suche)
+        streng_ok, hinweis = werte_aus(
+            schluessel.ausdruck,
+            lambda idx: vergleich_streng(idx, schluessel, norm, text_antwort, case_sensitiv, ist_logisch)
         )
         if streng_ok:
-            ergebnis = {"richtig": True, "hinweis": "Richtig!"}
+            ergebnis = Bewertung(True, "Richtig!")
 
         # FUZZY-CHECK (wenn streng nicht gereicht hat)
+        # Alle Alternativen auf einmal über den Trigramm-Index des Schlüssels
         if not ergebnis and fuzzy_aktiv:
-            fuzzy_ok, f_hinw = bewerte_booleschen_ausdruck(
-                typ, aufgabe, norm, text_antwort,
-                lambda idx, aufg, n, o: vergleich_fuzzy(idx, aufg, n, o, ratio)
+            treffer = schluessel.fuzzy_treffer(text_antwort, ratio)
+            fuzzy_ok, f_hinw = werte_aus(
+                schluessel.ausdruck,
+                lambda idx: treffer.get(idx, (False, None))
             )
             if fuzzy_ok:
-                ergebnis = {"richtig": True, "hinweis": f_hinw or "Fast richtig!"}
+                ergebnis = Bewertung(True, f_hinw or "Fast richtig!")
+
+    return ergebnis or Bewertung(False, "Leider falsch.")
 
-    # --- C. Protokollierung & FehlerLog (Bleibt gleich) ---
-    # ... (Dein Code für Protokoll.objects.create / delete)
-    
-    if ergebnis is None:
-        ergebnis = {"richtig": False, "hinweis": "Leider falsch."}
 
-    return ergebnis
+def bewerte_aufgabe(request, aufgabe, user_antwort, text_antwort=None, bild_antwort=None, session=None):
+    """Alte Schnittstelle (dict, Variante aus session['aktiver_index']); neu: bewerte()."""
+    variante = (session or {}).get("aktiver_index") or 0
+    return bewerte(aufgabe, text_antwort or user_antwort, variante=variante, bild_antwort=bild_antwort).als_dict()
 
 # ===========================================================
 # PARSER
+# Der eigentliche Parser steckt in antwortschluessel.py und wird pro
+# Typ-String nur einmal ausgeführt.
 # ===========================================================
-def bewerte_booleschen_ausdruck(typ, aufgabe, antwort_norm, antwort_original, vergleich):
-    tokens = []
-    i = 0
-    while i < len(typ):
-        if typ[i].isdigit():
-            j = i
-            while j < len(typ) and typ[j].isdigit():
-                j += 1
-            tokens.append(("NUM", int(typ[i:j])))
-            i = j
-        elif typ[i] in "ou()":
-            tokens.append((typ[i], typ[i]))
-            i += 1
-        else:
-            i += 1
-
-    pos = 0
-
-    def peek():
-        return tokens[pos] if pos < len(tokens) else None
-
-    def eat(k):
-        nonlocal pos
-        if peek() and peek()[0] == k:
-            pos += 1
-            return True
-        return False
-
-    def expr():
-        res_ok, res_hinweis = term()
-        while peek() and peek()[0] == "o":
-            eat("o")
-            ok2, hinw2 = term()
-            res_ok = res_ok or ok2
-            if ok2 and not res_hinweis:
-                res_hinweis = hinw2
-        return res_ok, res_hinweis
-
-    def term():
-        res_ok, res_hinweis = factor()
-        while peek() and peek()[0] == "u":
-            eat("u")
-            ok2, hinw2 = factor()
-            res_ok = res_ok and ok2
-            if not ok2: res_hinweis = hinw2
-        return res_ok, res_hinweis
-
-    def factor():
-        nonlocal pos
-        tok = peek()
-        if not tok: return False, None
-        
-        if tok[0] == "(":
-            eat("(")
-            res = expr()
-            eat(")")
-            return res
-        
-        if tok[0] == "NUM":
-            num1 = tok[1]
-            eat("NUM")
-            
-            # PRÜFUNG: Folgt ein 'o' und eine weitere NUM? (Bereichs-Check)
-            if peek() and peek()[0] == "o":
-                # Schauen, ob das Token nach dem 'o' eine Zahl ist
-                if pos + 1 < len(tokens) and tokens[pos+1][0] == "NUM":
-                    eat("o") # 'o' essen
-                    num2 = tokens[pos][1]
-                    eat("NUM") # zweite Zahl essen
-                    
-                    #print(f" !!! BEREICH GEFUNDEN: {num1} bis {num2}")
-                    for n in range(num1, num2 + 1):
-                        ok, hinw = vergleich(n, aufgabe, antwort_norm, antwort_original)
-                        if ok: return True, hinw
-                    return False, None
-
-            # Normalfall
-            #print(f" -> Einzelvergleich NUM {num1}")
-            return vergleich(num1, aufgabe, antwort_norm, antwort_original)
-        
-        return False, None
-    return expr()
+def bewerte_booleschen_ausdruck(typ, schluessel, antwort_norm, antwort_original, vergleich):
+    return werte_aus(
+        parse_ausdruck(typ),
+        lambda idx: vergleich(idx, schluessel, antwort_norm, antwort_original)
+    )
 
 # ===========================================================
 # HILFSFUNKTIONEN
@@ -260,9 +172,9 @@ def bewerte_booleschen_ausdruck(typ, aufgabe, antwort_norm, antwort_original, ve
 def normalisiere(text):
     return "".join(text.split()) if text else ""
 
-def bewerte_rechnen(aufgabe, antwort, request):
-    idx = request.session.get('aktiver_index', 0)
-    loesungs_liste = [l.strip() for l in aufgabe.loesung.split(";")]
+def bewerte_rechnen(schluessel, antwort, idx=0):
+    # idx = gewürfelte Variante (Serien-Stand)
+    loesungs_liste = [l.strip() for l in schluessel.loesung.split(";")]
     
     try:
         korrektes_ergebnis = loesungs_liste[idx]
@@ -270,34 +182,24 @@ def bewerte_rechnen(aufgabe, antwort, request):
         korrektes_ergebnis = loesungs_liste[0]
 
     # Säuberung (Komma, Einheiten)
-    import re
     ist_clean = re.sub(r'[^0-9,.]', '', antwort).replace(",", ".")
     soll_clean = re.sub(r'[^0-9,.]', '', korrektes_ergebnis).replace(",", ".")
 
     if ist_clean == soll_clean and ist_clean != "":
-        return {"richtig": True, "hinweis": "Richtig gerechnet!"}
-    
-    return {
-        "richtig": False,
-        "hinweis": (
-            f"Das Ergebnis ist leider nicht korrekt.<br><br>"
-            f"<strong>Deine Eingabe:</strong> »{antwort}«<br>"
-            f"<strong>Richtig wäre:</strong> »{korrektes_ergebnis}«"
-        )
-    }
-
-def bewerte_bildauswahl(aufgabe, bild_antwort, session):
-    # Wir berechnen erst den Boolean
-    ist_richtig = session and str(session.get("p_richtig")) == str(bild_antwort)
+        return Bewertung(True, "Richtig gerechnet!")
     
-    # Und geben sofort das erwartete Dictionary zurück
-    return {
-        "richtig": ist_richtig,
-        "hinweis": "Richtig!" if ist_richtig else "Leider falsch.",
-        "ungueltig": False
-    }
-
-def bewerte_wahr_falsch(aufgabe, norm):
+    return Bewertung(False, (
+        f"Das Ergebnis ist leider nicht korrekt.<br><br>"
+        f"<strong>Deine Eingabe:</strong> »{antwort}«<br>"
+        f"<strong>Richtig wäre:</strong> »{korrektes_ergebnis}«"
+    ))
+
+def bewerte_bildauswahl(schluessel, bild_antwort):
+    # Richtig ist das erste Bild der Aufgabe (steht im Schlüssel)
+    ist_richtig = schluessel.richtiges_bild is not None and str(schluessel.richtiges_bild) == str(bild_antwort)
+    return Bewertung(ist_richtig, "Richtig!" if ist_richtig else "Leider falsch.")
+
+def bewerte_wahr_falsch(schluessel, norm):
     """
     Vergleicht die Bedeutung der User-Eingabe mit der Bedeutung der Lösung in der DB.
     'f' (User) wird gegen 'falsch' (Datenbank) korrekt als WAHR gewertet.
@@ -306,7 +208,7 @@ def bewerte_wahr_falsch(aufgabe, norm):
     t = (norm or "").lower()
 
     # Lösung aus Feld 1 (antwort) radikal bereinigen (entfernt auch Punkte/Leerzeichen)
-    db_lsg = "".join((aufgabe.loesung or "").lower().split()).rstrip(".")
+    db_lsg = "".join((schluessel.loesung or "").lower().split()).rstrip(".")
 
     # 2. Bedeutungsgruppen definieren
     WAHR_GRUPPE = {"w", "wahr", "ja", "j", "richtig", "r", "ok", "stimmt"}
@@ -322,56 +224,49 @@ def bewerte_wahr_falsch(aufgabe, norm):
     # 4. Der eigentliche Vergleich der Bedeutung
     if user_meint_wahr:
         # User sagt 'Ja' -> Richtig, wenn DB auch 'Ja'-Bedeutung hat
-        return {"richtig": db_ist_wahr, "hinweis": "Richtig!" if db_ist_wahr else "Leider falsch."}
+        return Bewertung(db_ist_wahr, "Richtig!" if db_ist_wahr else "Leider falsch.")
     
     if user_meint_falsch:
-        return {"richtig": db_ist_falsch, "hinweis": "Richtig!" if db_ist_falsch else "Leider falsch."}
+        return Bewertung(db_ist_falsch, "Richtig!" if db_ist_falsch else "Leider falsch.")
 
     # 5. Pech gehabt (Quatsch geschrieben)
-    return {
-        "richtig": False,
-        "ungueltig": True,
-        "hinweis": "Bitte mit w/f, wahr/falsch oder ja/nein antworten."
-    }
+    return Bewertung(False, "Bitte mit w/f, wahr/falsch oder ja/nein antworten.", ungueltig=True)
 
-def bewerte_liste(aufgabe, antwort):
+def bewerte_liste(schluessel, antwort):
     # 1. Die richtige Lösung (Text) holen
-    korrekt_text = aufgabe.loesung
+    korrekt_text = schluessel.loesung
     gewaehlter_text = ""
 
     # 2. Versuchen, den Text der Schüler-Wahl zu identifizieren
     try:
         idx = int(antwort)
         if idx == 0:
-            return {"richtig": True, "hinweis": "Richtig!"}
+            return Bewertung(True, "Richtig!")
         else:
-            # Holen der gewählten Option aus der DB für das Feedback
+            # Text der gewählten Option für das Feedback
             # Da 0 richtig ist, sind 1, 2, 3... die falschen Optionen
-            opts = list(aufgabe.optionen.order_by("position"))
+            opts = schluessel.optionen
             # -1, weil in deiner Logik 0 die Lösung ist und 1 die erste Option
             pos = idx - 1 
             if 0 <= pos < len(opts):
-                gewaehlter_text = opts[pos].text
+                gewaehlter_text = opts[pos]
     except (ValueError, TypeError):
         # Fallback: Falls Text direkt gesendet wurde
         gewaehlter_text = antwort
         if normalisiere(antwort) == normalisiere(korrekt_text):
-            return {"richtig": True, "hinweis": "Richtig!"}
+            return Bewertung(True, "Richtig!")
 
     # 3. Das "schöne" Feedback zusammenbauen
     # Wenn wir den Text der Wahl kennen, zeigen wir ihn an
     wahl_display = f"»{gewaehlter_text}«" if gewaehlter_text else f"Nummer {antwort}"
     
-    return {
-        "richtig": False,
-        "hinweis": (
-            f"Das war leider nicht die gesuchte Antwort.<br><br>"
-            f"**Deine Wahl:** {wahl_display}<br>"
-            f"**Richtig wäre:** »{korrekt_text}«"
-        )
-    }
+    return Bewertung(False, (
+        f"Das war leider nicht die gesuchte Antwort.<br><br>"
+        f"**Deine Wahl:** {wahl_display}<br>"
+        f"**Richtig wäre:** »{korrekt_text}«"
+    ))
 
-def bewerte_e_typ(typ, aufgabe, antwort, case_sensitiv, is_integer, ratio, fuzzy_aktiv):
+def bewerte_e_typ(typ, schluessel, antwort, case_sensitiv, is_integer, ratio, fuzzy_aktiv):
     # 1. Typ am 'e' splitten
     links, rechts = typ.split("e", 1)
     
@@ -390,14 +285,14 @@ def bewerte_e_typ(typ, aufgabe, antwort, case_sensitiv, is_integer, ratio, fuzzy
     # Hilfsfunktion für die doppelte Prüfung (Streng -> dann Fuzzy)
     def check_einzeln(t_typ, n_val, o_val):
         # Erst Streng
-        ok, _ = bewerte_booleschen_ausdruck(t_typ, aufgabe, n_val, o_val, 
+        ok, _ = bewerte_booleschen_ausdruck(t_typ, schluessel, n_val, o_val, 
                     lambda idx, aufg, n, o: vergleich_streng(idx, aufg, n, o, case_sensitiv, not is_integer))
         if ok:
             return True, None
         
         # Dann Fuzzy (wenn erlaubt)
         if fuzzy_aktiv:
-            ok_f, hinw_f = bewerte_booleschen_ausdruck(t_typ, aufgabe, n_val, o_val, 
+            ok_f, hinw_f = bewerte_booleschen_ausdruck(t_typ, schluessel, n_val, o_val, 
                                 lambda idx, aufg, n, o: vergleich_fuzzy(idx, aufg, n, o, ratio))
             if ok_f:
                 return True, hinw_f
@@ -419,65 +314,31 @@ def bewerte_e_typ(typ, aufgabe, antwort, case_sensitiv, is_integer, ratio, fuzzy
     
     return False, "Beide Begriffe sind leider falsch."
     
-def pruefe_verbotene_begriffe(aufgabe, norm, text_antwort):
-    typ = (aufgabe.typ or "").strip()
-
-    if "f" not in typ:
+def pruefe_verbotene_begriffe(schluessel, norm, text_antwort):
+    if not schluessel.hat_verbot or not schluessel.verbot:
         return True, ""
 
-    _, verbot = typ.split("f", 1)
-    if not verbot:
-        return True, ""
+    def enthalten(k):
+        return vergleich_streng(k, schluessel, norm, text_antwort, case_sensitiv=False, contain=True)
 
     # prüfen, ob verbotener Ausdruck zutrifft
-    kommt_vor, _ = bewerte_booleschen_ausdruck(
-        verbot,
-        aufgabe,
-        norm,
-        text_antwort,
-        lambda i, a, n, o: vergleich_streng(
-            i, a, n, o,
-            case_sensitiv=False,
-            contain=True
-        )
-    )
+    kommt_vor, _ = werte_aus(schluessel.verbot_ausdruck, enthalten)
 
     if not kommt_vor:
         return True, ""
 
     # konkreten Begriff bestimmen
     verbotener_begriff = None
-    i = 0
-    indices = []
-    while i < len(verbot):
-        if verbot[i].isdigit():
-            j = i
-            while j < len(verbot) and verbot[j].isdigit():
-                j += 1
-            indices.append(int(verbot[i:j]))
-            i = j
-        else:
-            i += 1
-
-    for k in indices:
-        ok, _ = vergleich_streng(
-            k, aufgabe, norm, text_antwort,
-            case_sensitiv=False,
-            contain=True
-        )
+    for k in schluessel.verbot_indizes:
+        ok, _ = enthalten(k)
         if ok:
-            if k == 1:
-                verbotener_begriff = aufgabe.loesung
-            else:
-                opts = list(aufgabe.optionen.order_by("position"))
-                if k - 2 < len(opts):
-                    verbotener_begriff = opts[k - 2].text
+            verbotener_begriff = schluessel.text(k)
             break
 
     if not verbotener_begriff:
         verbotener_begriff = text_antwort
 
-    erklaerung = getattr(aufgabe, "erklaerung", "").strip()
+    erklaerung = schluessel.erklaerung.strip()
     if erklaerung:
         hinweis = (
             f"Das ist hier falsch: „{verbotener_begriff}“\n\n"
@@ -488,61 +349,42 @@ def pruefe_verbotene_begriffe(aufgabe, norm, text_antwort):
 
     return False, hinweis
 
-def bewerte_luecke(aufgabe, user_antwort, fuzzy_aktiv=False, ratio=0.8):
-    # 1. Einträge aus den Optionen holen (sortiert)
-    optionen = aufgabe.optionen.all().order_by('position', 'id')
-    anzahl_vorgabe = optionen.count()
-    print(optionen)
+def bewerte_luecke(schluessel, user_antwort, fuzzy_aktiv=False, ratio=0.8):
+    # 1. Einträge aus den Optionen (sortiert, Alternativen schon zerlegt)
+    luecken = schluessel.luecken
+    anzahl_vorgabe = len(luecken)
     
     # User-Eingabe am Semikolon splitten und Leerzeichen vorn/hinten entfernen
     user_eingaben = [a.strip() for a in user_antwort.split(";") if a.strip()]
     anzahl_user = len(user_eingaben)
-    print(anzahl_user)
 
     # PUNKT 1: Überprüfung der Anzahl
     if anzahl_user != anzahl_vorgabe:
-        return {
-            "richtig": False, 
-            "hinweis": f"Die Anzahl der Begriffe stimmt nicht. Erwartet werden <b>{anzahl_vorgabe}</b> Begriffe (getrennt durch Semikolon), du hast <b>{anzahl_user}</b> eingegeben. Versuch es noch einmal!"
-        }
+        return Bewertung(False, f"Die Anzahl der Begriffe stimmt nicht. Erwartet werden <b>{anzahl_vorgabe}</b> Begriffe (getrennt durch Semikolon), du hast <b>{anzahl_user}</b> eingegeben. Versuch es noch einmal!")
 
-    loesungs_vorgaben = [opt.text for opt in optionen]
-    
     # Wir gehen die Lücken nacheinander durch
-    for i, korrekter_text in enumerate(loesungs_vorgaben):
+    for i, (erlaubte, erlaubte_klein) in enumerate(luecken):
         user_wort = user_eingaben[i]
         # Falls in einer Option Alternativen stehen (z.B. "Reihe; Reihenschaltung")
-        erlaubte = [e.strip() for e in str(korrekter_text).split(";") if e.strip()]
-        
         wort_korrekt = False
-        for alternative in erlaubte:
-            if fuzzy_aktiv:
-                # PUNKT 3: Mit "Y" -> Case-Insensitive, ENTHALTEN und FUZZY
-                u_word_lower = user_wort.lower()
-                alt_lower = alternative.lower()
-                print(u_word_lower,alt_lower)               
+        if fuzzy_aktiv:
+            # PUNKT 3: Mit "Y" -> Case-Insensitive, ENTHALTEN und FUZZY
+            u_word_lower = user_wort.lower()
+            for alt_lower in erlaubte_klein:
                 # Check A: Ist die Lösung im Schüler-Eintrag enthalten?
                 # Check B: Ist die Fuzzy-Ähnlichkeit hoch genug?
-                similarity = SequenceMatcher(None, u_word_lower, alt_lower).ratio()
-                
-                if alt_lower in u_word_lower or similarity >= ratio:
-                    wort_korrekt = True
-                    break
-            else:
-                # PUNKT 2: Ohne "Y" -> Exakte Übereinstimmung (Case-Sensitive, ohne Leerzeichen)
-                print(user_wort,alternative)
-                if user_wort == alternative:
+                if alt_lower in u_word_lower or ist_aehnlich(u_word_lower, alt_lower, ratio):
                     wort_korrekt = True
                     break
+        else:
+            # PUNKT 2: Ohne "Y" -> Exakte Übereinstimmung (Case-Sensitive, ohne Leerzeichen)
+            wort_korrekt = user_wort in erlaubte
         
         # Falls ein Begriff (trotz eventueller Alternativen) falsch ist:
         if not wort_korrekt:
             # Wir zeigen nur die korrekten Begriffe der Optionen als Hilfe
-            loesung_hilfe = " ; ".join([f"<b>{t.split(';')[0].strip()}</b>" for t in loesungs_vorgaben])
-            return {
-                "richtig": False, 
-                "hinweis": f"Nicht ganz korrekt. Die Begriffe wären: {loesung_hilfe}"
-            }
+            loesung_hilfe = " ; ".join([f"<b>{t.split(';')[0].strip()}</b>" for t in schluessel.optionen])
+            return Bewertung(False, f"Nicht ganz korrekt. Die Begriffe wären: {loesung_hilfe}")
 
     # Wenn alle Schleifen durchgelaufen sind:
-    return {"richtig": True, "hinweis": "Hervorragend! Alles korrekt gelöst."}
\ No newline at end of file
+    return Bewertung(True, "Hervorragend! Alles korrekt gelöst.")
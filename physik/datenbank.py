@@ -0,0 +1,27 @@
+from django.conf import settings
+
+# ===========================================================
+# SQLITE-PRAGMAS
+# Wird über connection_created (models.py) für jede neue Verbindung
+# aufgerufen. Das Profil steht in settings.SQLITE_PROFILE.
+# ===========================================================
+
+def setze_pragmas(connection, pragmas=None):
+    if connection.vendor != "sqlite":
+        return
+    if pragmas is None:
+        pragmas = getattr(settings, "PHYSIK_SQLITE_PRAGMAS", {})
+    with connection.cursor() as cursor:
+        for name, wert in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {wert}")
+
+
+def lies_pragmas(connection, namen=("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size")):
+    """Aktuelle Werte, z.B. für Lasttest-Ausgaben."""
+    werte = {}
+    with connection.cursor() as cursor:
+        for name in namen:
+            cursor.execute(f"PRAGMA {name}")
+            zeile = cursor.fetchone()
+            werte[name] = zeile[0] if zeile else None
+    return werte
@@ -0,0 +1,151 @@
+import hashlib
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min
+
+from .models import Aufgabe, FehlerSumme
+
+# ===========================================================
+# FEHLER-ANALYSE (gruppiert)
+# Statt jeder einzelnen Fehl-Eingabe: pro Aufgabe die verschiedenen
+# Antworten (antwort_norm = klein, ohne Rand-Leerzeichen) mit Anzahl,
+# erstem und letztem Auftreten - gezählt in SQL über den Index
+# (aufgabe, antwort_norm, zeitpunkt).
+# Geblättert wird per Keyset über die Aufgaben-ID: jede Seite zählt nur
+# die Logs ihrer Aufgaben, egal wie viele Millionen Zeilen es insgesamt sind.
+# Ältere Logs sind zu FehlerSumme verdichtet (verdichte) und werden dazugezählt.
+# ===========================================================
+
+AUFGABEN_PRO_SEITE = 20
+VERDICHTEN_BLOCK = 2000
+
+
+def antwort_hash(antwort_norm):
+    return hashlib.sha256(antwort_norm.encode("utf-8")).hexdigest()
+
+
+def _id(wert):
+    try:
+        return int(wert)
+    except (TypeError, ValueError):
+        return None
+
+
+def gruppiere(logs, summen=None, nach=None, vor=None, anzahl=AUFGABEN_PRO_SEITE):
+    """
+    logs: (gefiltertes) FehlerLog-QuerySet, summen: ebenso gefiltertes FehlerSumme-QuerySet.
+    nach/vor: Aufgaben-ID, hinter bzw. vor der die Seite beginnt.
+    Liefert (aufgaben, cursor_zurueck, cursor_weiter); jede Aufgabe trägt in
+    .antworten ihre Gruppen, häufigste zuerst.
+    """
+    logs = logs.order_by()
+    summen = (summen if summen is not None else FehlerSumme.objects.none()).order_by()
+    marke_vor, marke_nach = _id(vor), _id(nach)
+
+    # 1. Die Aufgaben der Seite (eine mehr: gibt es eine weitere Seite?)
+    ids = set()
+    for qs in (logs, summen):
+        qs = qs.values_list("aufgabe_id", flat=True).distinct()
+        if marke_vor is not None:
+            qs = qs.filter(aufgabe_id__lt=marke_vor).order_by("-aufgabe_id")
+        else:
+            if marke_nach is not None:
+                qs = qs.filter(aufgabe_id__gt=marke_nach)
+            qs = qs.order_by("aufgabe_id")
+        ids.update(qs[:anzahl + 1])
+    ids = sorted(ids, reverse=marke_vor is not None)
+    mehr = len(ids) > anzahl
+    ids = sorted(ids[:anzahl])
+    if not ids:
+        return [], None, None
+
+    # 2. Gruppen nur für diese Aufgaben: Roh-Logs plus verdichtete Summen
+    gruppen = {}
+    for g in (
+        logs.filter(aufgabe_id__in=ids)
+        .values("aufgabe_id", "antwort_norm")
+        .annotate(anzahl=Count("id"), erster=Min("zeitpunkt"), letzter=Max("zeitpunkt"), beispiel_id=Max("id"))
+    ):
+        gruppen[g["aufgabe_id"], g["antwort_norm"]] = g
+    for aufgabe_id, antwort, zahl, erster, letzter in summen.filter(aufgabe_id__in=ids).values_list(
+        "aufgabe_id", "antwort", "anzahl", "erster", "letzter"
+    ):
+        g = gruppen.get((aufgabe_id, antwort))
+        if g is None:
+            gruppen[aufgabe_id, antwort] = dict(
+                aufgabe_id=aufgabe_id, antwort_norm=antwort, anzahl=zahl, erster=erster, letzter=letzter, beispiel_id=None,
+            )
+        else:
+            g.update(anzahl=g["anzahl"] + zahl, erster=min(g["erster"], erster), letzter=max(g["letzter"], letzter))
+
+    pro_aufgabe = {}
+    for g in sorted(gruppen.values(), key=lambda g: (-g["anzahl"], g["antwort_norm"])):
+        pro_aufgabe.setdefault(g["aufgabe_id"], []).append(g)
+
+    aufgaben = Aufgabe.objects.select_related("thema", "kapitel").in_bulk(ids)
+    seite = []
+    for aufgabe_id in ids:
+        aufgabe = aufgaben[aufgabe_id]
+        aufgabe.antworten = pro_aufgabe.get(aufgabe_id, [])
+        aufgabe.fehler_gesamt = sum(g["anzahl"] for g in aufgabe.antworten)
+        seite.append(aufgabe)
+
+    if marke_vor is not None:
+        hat_zurueck, hat_weiter = mehr, True
+    else:
+        hat_zurueck, hat_weiter = marke_nach is not None, mehr
+    return (
+        seite,
+        ids[0] if hat_zurueck else None,
+        ids[-1] if hat_weiter else None,
+    )
+
+
+def verdichte(grenze, block=VERDICHTEN_BLOCK):
+    """
+    Überträgt alle FehlerLog-Einträge vor `grenze` in FehlerSumme und löscht sie.
+    Blockweise, je Block eine Transaktion:
+      1. DELETE ... RETURNING holt die Zeilen und nimmt sie zugleich weg - ein
+         paralleler Lauf kann denselben Eintrag nicht noch einmal zählen,
+      2. ein INSERT ... ON CONFLICT addiert die Zähler in der Datenbank
+         (anzahl = anzahl + excluded.anzahl), ohne den Bestand vorher zu lesen;
+         erster/letzter über SQLites skalares MIN/MAX mit zwei Argumenten.
+    Liefert die Zahl der verdichteten Einträge.
+    """
+    upsert = """
+        INSERT INTO physik_fehlersumme (aufgabe_id, antwort_hash, antwort, anzahl, erster, letzter)
+        VALUES {werte}
+        ON CONFLICT (aufgabe_id, antwort_hash) DO UPDATE SET
+            anzahl = physik_fehlersumme.anzahl + excluded.anzahl,
+            erster = MIN(physik_fehlersumme.erster, excluded.erster),
+            letzter = MAX(physik_fehlersumme.letzter, excluded.letzter)
+    """
+    grenze = connection.ops.adapt_datetimefield_value(grenze)
+    gesamt = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM physik_fehlerlog WHERE id IN ("
+                "  SELECT id FROM physik_fehlerlog WHERE zeitpunkt < %s ORDER BY id LIMIT %s"
+                ") RETURNING aufgabe_id, antwort_norm, zeitpunkt",
+                [grenze, block],
+            )
+            zeilen = cursor.fetchall()
+            if not zeilen:
+                return gesamt
+
+            # Zeitpunkte bleiben im Speicherformat der Datenbank (Vergleich und Rückschreiben)
+            gruppen = {}
+            for aufgabe_id, antwort_norm, zeitpunkt in zeilen:
+                g = gruppen.get((aufgabe_id, antwort_norm))
+                if g is None:
+                    gruppen[aufgabe_id, antwort_norm] = [1, zeitpunkt, zeitpunkt]
+                else:
+                    g[0] += 1
+                    g[1], g[2] = min(g[1], zeitpunkt), max(g[2], zeitpunkt)
+
+            params = []
+            for (aufgabe_id, antwort_norm), (anzahl, erster, letzter) in gruppen.items():
+                params += [aufgabe_id, antwort_hash(antwort_norm), antwort_norm, anzahl, erster, letzter]
+            cursor.execute(upsert.format(werte=", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(gruppen))), params)
+        gesamt += len(zeilen)
@@ -0,0 +1,81 @@
+from .models import ThemenBereich
+
+# ===========================================================
+# INVENTAR (Bestandsliste für Mitarbeiter)
+# Blättern per Keyset auf (Thema-Ordnung, lfd_nr) statt OFFSET:
+# jede Seite ist ein Index-Bereich ab dem letzten Eintrag der
+# vorigen Seite und kostet gleich viel, egal wie groß der Katalog ist.
+# Der Cursor steht in der URL als "<ordnung>~<lfd_nr>".
+# ===========================================================
+
+SEITE_STANDARD = 100
+SEITE_MAX = 500
+
+
+def seitengroesse(wert):
+    try:
+        return min(max(int(wert), 1), SEITE_MAX)
+    except (TypeError, ValueError):
+        return SEITE_STANDARD
+
+
+def cursor(ordnung, lfd_nr):
+    return f"{ordnung}~{lfd_nr}"
+
+
+def lies_cursor(wert):
+    try:
+        ordnung, lfd_nr = wert.split("~", 1)
+        return int(ordnung), lfd_nr
+    except (AttributeError, ValueError):
+        return None
+
+
+def blaettere(aufgaben, nach=None, vor=None, groesse=SEITE_STANDARD, themen=None):
+    """
+    Eine Seite in der Reihenfolge (thema.ordnung, lfd_nr).
+    nach: Cursor des letzten Eintrags der vorigen Seite (vorwärts),
+    vor: Cursor des ersten Eintrags der folgenden Seite (rückwärts),
+    themen: optional die IDs der Themen, auf die aufgaben schon gefiltert ist.
+    Liefert (aufgaben, cursor_zurueck, cursor_weiter); None = keine Seite in diese Richtung.
+
+    Nach einer Spalte einer anderen Tabelle kann SQLite nicht per Index sortieren.
+    Darum geht es Thema für Thema (wenige, kleine Tabelle) durch den Index
+    (thema, lfd_nr) - jede Abfrage ist ein Bereich, der nach der Seite abbricht.
+    """
+    marke = lies_cursor(vor) or lies_cursor(nach)
+    rueckwaerts = marke is not None and lies_cursor(vor) is not None
+
+    thema_qs = ThemenBereich.objects.order_by("-ordnung" if rueckwaerts else "ordnung")
+    if themen is not None:
+        thema_qs = thema_qs.filter(id__in=themen)
+
+    treffer = []  # (ordnung, aufgabe)
+    for thema_id, ordnung in thema_qs.values_list("id", "ordnung"):
+        qs = aufgaben.filter(thema_id=thema_id)
+        if marke:
+            if (ordnung > marke[0]) if rueckwaerts else (ordnung < marke[0]):
+                continue
+            if ordnung == marke[0]:
+                qs = qs.filter(lfd_nr__lt=marke[1]) if rueckwaerts else qs.filter(lfd_nr__gt=marke[1])
+        # Ein Eintrag mehr, um zu wissen, ob es weitergeht
+        qs = qs.order_by("-lfd_nr" if rueckwaerts else "lfd_nr")[:groesse + 1 - len(treffer)]
+        treffer.extend((ordnung, a) for a in qs)
+        if len(treffer) > groesse:
+            break
+
+    mehr = len(treffer) > groesse
+    treffer = treffer[:groesse]
+    if rueckwaerts:
+        treffer.reverse()
+    if not treffer:
+        return [], None, None
+
+    hat_zurueck = mehr if rueckwaerts else marke is not None
+    hat_weiter = marke is not None if rueckwaerts else mehr
+    erster, letzter = treffer[0], treffer[-1]
+    return (
+        [a for _, a in treffer],
+        cursor(erster[0], erster[1].lfd_nr) if hat_zurueck else None,
+        cursor(letzter[0], letzter[1].lfd_nr) if hat_weiter else None,
+    )
@@ -0,0 +1,203 @@
+import json
+import os
+import shutil
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Aufgabe, FehlerLog, LernstandZaehler, Protokoll
+from .planer import faellig_am, neue_leichtigkeit
+
+# ===========================================================
+# LERNFORTSCHRITT (Leitner-Kartei)
+# Jede bewertete Antwort wird nur vorgemerkt (kein SQL pro Klick).
+# Geschrieben wird gebündelt in einer Transaktion:
+#   - am Ende der Serie,
+#   - sobald der Puffer älter als PUFFER_SEKUNDEN ist,
+#   - beim Start der nächsten Serie bzw. auf der Startseite (abgebrochene Serien),
+#   - per 'manage.py lernfortschritt_schreiben' (Cron) für alle, die nicht wiederkommen.
+# Fächer: ohne Eintrag = neu, 1 = falsch beantwortet, 2..4 = richtig in Folge.
+# Dabei wird auch der nächste Termin gesetzt (planer.py).
+#
+# Puffer: ein Verzeichnis pro User unter PHYSIK_LERNFORTSCHRITT_PUFFER, eine
+# Datei pro Antwort ("<time_ns>-<zufall>.json", fertig geschrieben und per
+# os.replace hineingelegt). Nichts wird überschrieben und nichts verdrängt
+# (anders als im Session-Cache). schreibe holt sich die Dateien per os.rename
+# in ein eigenes Unterverzeichnis - jede Datei bekommt nur ein Aufruf, parallele
+# Aufrufe schreiben also nichts doppelt. Schlägt die Transaktion fehl, wandern
+# die Dateien zurück.
+# ===========================================================
+
+PUFFER_SEKUNDEN = 60
+MAX_FACH = 4
+# Beleg-Verzeichnisse, die so alt sind, stammen von einem abgebrochenen Prozess
+VERWAIST_SEKUNDEN = 60 * 60
+BELEG_PREFIX = "schreiben-"
+
+
+def _verzeichnis(user_id):
+    return Path(settings.PHYSIK_LERNFORTSCHRITT_PUFFER) / str(user_id)
+
+
+def _eintraege(verzeichnis):
+    # Namen der vorgemerkten Antworten, älteste zuerst (Temp-Dateien beginnen mit ".")
+    try:
+        namen = [e.name for e in os.scandir(verzeichnis) if e.is_file() and not e.name.startswith(".")]
+    except FileNotFoundError:
+        return []
+    return sorted(namen)
+
+
+def _alter(name):
+    return time.time() - int(name.split("-", 1)[0]) / 1e9
+
+
+def neues_fach(alt, richtig):
+    """Leitner: richtig -> ein Fach weiter (neu -> 2), falsch -> zurück in Fach 1."""
+    if not richtig:
+        return 1
+    return 2 if alt is None else min(alt + 1, MAX_FACH)
+
+
+def merke(user_id, aufgabe_id, richtig, eingabe=""):
+    """
+    Merkt das Ergebnis einer Antwort vor. Pro Aufgabe zählt der erste Versuch;
+    falsche Eingaben kommen zusätzlich ins FehlerLog.
+    Liefert True, wenn der Puffer wegen seines Alters gleich geschrieben wurde.
+    """
+    verzeichnis = _verzeichnis(user_id)
+    verzeichnis.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.json"
+    temp = verzeichnis / f".{name}"
+    temp.write_text(json.dumps([aufgabe_id, richtig, eingabe]), encoding="utf-8")
+    os.replace(temp, verzeichnis / name)
+
+    eintraege = _eintraege(verzeichnis)
+    if eintraege and _alter(eintraege[0]) >= PUFFER_SEKUNDEN:
+        schreibe(user_id)
+        return True
+    return False
+
+
+def schreibe(user_id):
+    """Schreibt den Puffer eines Users: Protokoll (Upsert), FehlerLog und Lernstand-Zähler."""
+    verzeichnis = _verzeichnis(user_id)
+    eintraege = _eintraege(verzeichnis)
+    if not eintraege:
+        return 0
+
+    beleg = verzeichnis / f"{BELEG_PREFIX}{uuid.uuid4().hex}"
+    beleg.mkdir()
+    geholt = []
+    for name in eintraege:
+        try:
+            os.rename(verzeichnis / name, beleg / name)
+        except FileNotFoundError:
+            continue  # hat ein paralleler Aufruf schon geholt
+        geholt.append(name)
+
+    ergebnisse, fehler = {}, []
+    for name in geholt:
+        aufgabe_id, richtig, eingabe = json.loads((beleg / name).read_text(encoding="utf-8"))
+        ergebnisse.setdefault(aufgabe_id, richtig)
+        if not richtig:
+            fehler.append((aufgabe_id, eingabe))
+    if not ergebnisse:
+        beleg.rmdir()
+        return 0
+
+    try:
+        with transaction.atomic():
+            alt, alt_leicht = {}, {}
+            for aufgabe_id, fach, leichtigkeit in (
+                Protokoll.objects.filter(user_id=user_id, aufgabe_id__in=ergebnisse)
+                .values_list("aufgabe_id", "fach", "leichtigkeit")
+            ):
+                alt[aufgabe_id], alt_leicht[aufgabe_id] = fach, leichtigkeit
+            jetzt = timezone.now()
+            aufgaben = Aufgabe.objects.only("id", "thema_id", "kapitel_id", "schwierigkeit").in_bulk(list(ergebnisse))
+
+            protokolle, wechsel = [], Counter()
+            for aufgabe_id, richtig in ergebnisse.items():
+                aufgabe = aufgaben.get(aufgabe_id)
+                if aufgabe is None:
+                    continue  # inzwischen gelöscht
+                fach = neues_fach(alt.get(aufgabe_id), richtig)
+                leichtigkeit = neue_leichtigkeit(alt_leicht.get(aufgabe_id), richtig)
+                protokolle.append(Protokoll(
+                    user_id=user_id, aufgabe_id=aufgabe_id, fach=fach,
+                    leichtigkeit=leichtigkeit, faellig=faellig_am(fach, leichtigkeit, jetzt),
+                ))
+                if alt.get(aufgabe_id) != fach:
+                    gruppe = (aufgabe.thema_id, aufgabe.kapitel_id, aufgabe.schwierigkeit)
+                    wechsel[gruppe + (fach,)] += 1
+                    if aufgabe_id in alt:
+                        wechsel[gruppe + (alt[aufgabe_id],)] -= 1
+
+            # Ein INSERT ... ON CONFLICT für alle Aufgaben der Serie
+            Protokoll.objects.bulk_create(
+                protokolle,
+                update_conflicts=True,
+                unique_fields=["user", "aufgabe"],
+                update_fields=["fach", "letzte_bearbeitung", "faellig", "leichtigkeit"],
+            )
+            FehlerLog.objects.bulk_create([
+                FehlerLog(aufgabe_id=aufgabe_id, eingegebene_antwort=eingabe)
+                for aufgabe_id, eingabe in fehler if aufgabe_id in aufgaben
+            ])
+
+            # bulk_create löst keine Signale aus -> Zähler hier fortschreiben
+            for (thema_id, kapitel_id, schwierigkeit, fach), delta in wechsel.items():
+                if delta:
+                    LernstandZaehler.verbuche(
+                        user_id, Aufgabe(thema_id=thema_id, kapitel_id=kapitel_id, schwierigkeit=schwierigkeit),
+                        fach, delta,
+                    )
+    except Exception:
+        # Nichts verlieren: Dateien zurücklegen, der nächste Anlauf schreibt sie
+        _zuruecklegen(beleg)
+        raise
+    shutil.rmtree(beleg)
+    return len(protokolle)
+
+
+def _zuruecklegen(beleg):
+    for eintrag in list(os.scandir(beleg)):
+        os.replace(eintrag.path, beleg.parent / eintrag.name)
+    beleg.rmdir()
+
+
+def schreibe_liegengebliebene(alter=PUFFER_SEKUNDEN):
+    """
+    Schreibt die Puffer aller User, deren älteste Antwort mindestens `alter` Sekunden
+    alt ist (abgebrochene Serien ohne Rückkehr). Verwaiste Belege eines abgestürzten
+    Prozesses werden vorher zurückgelegt - stürzt er nach dem Commit ab, zählt
+    diese Serie dann doppelt; das ist seltener und harmloser als sie zu verlieren.
+    Liefert (User, geschriebene Protokolle).
+    """
+    wurzel = Path(settings.PHYSIK_LERNFORTSCHRITT_PUFFER)
+    try:
+        verzeichnisse = [Path(e.path) for e in os.scandir(wurzel) if e.is_dir()]
+    except FileNotFoundError:
+        return 0, 0
+
+    users = protokolle = 0
+    for verzeichnis in verzeichnisse:
+        if not verzeichnis.name.isdigit():
+            continue
+        for eintrag in os.scandir(verzeichnis):
+            if (
+                eintrag.is_dir() and eintrag.name.startswith(BELEG_PREFIX)
+                and time.time() - eintrag.stat().st_mtime >= VERWAIST_SEKUNDEN
+            ):
+                _zuruecklegen(Path(eintrag.path))
+        eintraege = _eintraege(verzeichnis)
+        if eintraege and _alter(eintraege[0]) >= alter:
+            users += 1
+            protokolle += schreibe(int(verzeichnis.name))
+    return users, protokolle
@@ -0,0 +1,101 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Max, Min
+
+from physik.models import ThemenBereich, Aufgabe, Protokoll, FehlerLog, LernstandZaehler, Benachrichtigung
+from physik.planer import faellige_abfrage
+from physik.serie import serie_abfrage
+from physik.suche import aufgaben_filter, fehler_filter, fehlende_trigger
+
+# Kleine Nachschlage-Tabellen (ein paar Dutzend Zeilen) dürfen gescannt werden
+KLEINE_TABELLEN = {"physik_themenbereich", "physik_kapitel"}
+
+
+def kanonische_abfragen():
+    """(Name, QuerySet) der heißen Abfragen - Parameter egal, es zählt nur der Plan."""
+    user = User(pk=1)
+    thema = ThemenBereich(pk=1, kapitel_unabhaengig=False)
+    return [
+        ("serie_fach1", serie_abfrage(user, thema, start_kap=1, end_kap=5, fach_int=1)),
+        ("serie_fach3", serie_abfrage(user, thema, start_kap=1, end_kap=5, fach_int=3)),
+        ("serie_faellig", faellige_abfrage(user, thema, start_kap=1, end_kap=5)),
+        # views.index
+        ("startseite_gesamt", Aufgabe.bestand_abfrage()),
+        ("startseite_lernstand", LernstandZaehler.objects.filter(user=user, thema__in=[1, 2, 3], anzahl__gt=0)
+            .values_list("thema_id", "kapitel_id", "schwierigkeit", "fach", "anzahl")),
+        # Protokoll eines Users nach Fach über Thema/Kapitel/Stufe (Auswertungen)
+        ("protokoll_fach", Protokoll.objects.filter(user=user, fach=2, aufgabe__thema_id=1)
+            .values("aufgabe__kapitel_id", "aufgabe__schwierigkeit").annotate(cnt=Count("id"))),
+        # views.aufgaben_liste: eine Keyset-Abfrage von inventar.blaettere (pro Thema)
+        ("aufgaben_liste", Aufgabe.objects.select_related("thema", "kapitel")
+            .filter(thema_id=1, lfd_nr__gt="M100").order_by("lfd_nr")[:101]),
+        # views.fehler_liste (Thema gewählt), neueste Fehler
+        ("fehler_thema", FehlerLog.objects.filter(aufgabe__thema_id=1).order_by("-id")[:50]),
+        ("fehler_suche", FehlerLog.objects.filter(fehler_filter("Newton")).order_by("-id")),
+        ("aufgaben_suche", Aufgabe.objects.filter(aufgaben_filter("Newton"))),
+        # fehleranalyse.gruppiere: Aufgaben der Seite, dann deren Antwort-Gruppen
+        ("fehler_gruppen_seite", FehlerLog.objects.filter(aufgabe_id__gt=1).values_list("aufgabe_id", flat=True)
+            .distinct().order_by("aufgabe_id")[:21]),
+        ("fehler_gruppen", FehlerLog.objects.filter(aufgabe_id__in=[1, 2, 3]).values("aufgabe_id", "antwort_norm")
+            .annotate(anzahl=Count("id"), erster=Min("zeitpunkt"), letzter=Max("zeitpunkt"))
+            .order_by("aufgabe_id", "-anzahl")),
+        ("fehler_neueste", FehlerLog.objects.order_by("-zeitpunkt")[:50]),
+        ("fehler_aufgabe", FehlerLog.objects.filter(aufgabe_id=1).order_by("-zeitpunkt")),
+        ("benachrichtigung_offen", Benachrichtigung.objects.filter(versendet__isnull=True).order_by("zeitpunkt")),
+    ]
+
+
+def plan(queryset):
+    """EXPLAIN QUERY PLAN als Liste der Detail-Zeilen (SQLite)."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [zeile[-1] for zeile in cursor.fetchall()]
+
+
+def tabellen_scans(zeilen):
+    """Tabellen, die ohne Index komplett gelesen werden ("SCAN t" ohne "USING ... INDEX")."""
+    scans = []
+    for detail in zeilen:
+        teile = detail.split()
+        if teile and teile[0] == "SCAN" and "INDEX" not in teile:
+            tabelle = teile[2] if teile[1:2] == ["TABLE"] else teile[1]
+            if tabelle not in KLEINE_TABELLEN:
+                scans.append(tabelle)
+    return scans
+
+
+class Command(BaseCommand):
+    help = (
+        "Prüft mit EXPLAIN QUERY PLAN die heißen Abfragen und schlägt fehl, wenn eine davon eine ganze Tabelle scannt"
+        " oder dem Volltext-Index Trigger fehlen."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("EXPLAIN QUERY PLAN wird nur für SQLite ausgewertet.")
+
+        fehler = []
+        for name, queryset in kanonische_abfragen():
+            zeilen = plan(queryset)
+            scans = tabellen_scans(zeilen)
+            if scans:
+                fehler.append(f"Tabellen-Scan in {name}: {', '.join(scans)}")
+                self.stdout.write(self.style.ERROR(f"{name}: SCAN {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: ok"))
+            if options["verbosity"] >= 2 or scans:
+                for detail in zeilen:
+                    self.stdout.write(f"    {detail}")
+
+        # Ohne seine Trigger veraltet der Volltext-Index unbemerkt (siehe suche.py)
+        trigger = fehlende_trigger()
+        if trigger:
+            fehler.append(f"Suchindex-Trigger fehlen: {', '.join(trigger)} ('manage.py suchindex --neu')")
+            self.stdout.write(self.style.ERROR(f"suchindex: es fehlen {', '.join(trigger)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("suchindex: Trigger vollständig"))
+
+        if fehler:
+            raise CommandError("; ".join(fehler))
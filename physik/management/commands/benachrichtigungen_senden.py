@@ -0,0 +1,34 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from physik.benachrichtigung import versende_digest
+
+class Command(BaseCommand):
+    help = "Verschickt die gesammelten Aufgaben-Benachrichtigungen als Sammel-Mail (einmalig oder als Worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sofort", action="store_true", help="Nicht auf das Sammel-Fenster warten")
+        parser.add_argument("--schleife", action="store_true", help="Als Worker laufen und regelmäßig prüfen")
+        parser.add_argument("--intervall", type=int, default=60, help="Sekunden zwischen zwei Prüfungen (Worker)")
+        parser.add_argument("--backend", type=str, default=None,
+                            help="E-Mail-Backend überschreiben, z.B. django.core.mail.backends.console.EmailBackend")
+
+    def handle(self, *args, **options):
+        connection = get_connection(options["backend"]) if options["backend"] else None
+
+        while True:
+            try:
+                anzahl = versende_digest(warte_fenster=not options["sofort"], connection=connection)
+            except Exception as e:
+                # Im Worker-Modus weiterlaufen, die Einträge bleiben offen
+                if not options["schleife"]:
+                    raise
+                self.stderr.write(self.style.ERROR(f"Versand fehlgeschlagen: {e}"))
+                anzahl = 0
+            if anzahl:
+                self.stdout.write(self.style.SUCCESS(f"{anzahl} Benachrichtigung(en) versendet"))
+            if not options["schleife"]:
+                break
+            time.sleep(options["intervall"])
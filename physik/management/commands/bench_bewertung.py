@@ -0,0 +1,164 @@
+import json
+import platform
+import random
+import subprocess
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from physik.antwortschluessel import verwerfe_schluessel
+from physik.aufgabendaten import lade_aufgaben
+from physik.bewertung import bewerte
+from physik.models import ThemenBereich, Kapitel, Aufgabe, AufgabeOption, AufgabeBild
+
+# Synthetischer Katalog: eine Familie pro Typ-Art
+# (name, typ, loesung, optionen, typische Eingaben)
+SATZ = "Die Energie wird im Alltag meistens durch {} und manchmal auch anders übertragen"
+FAMILIEN = [
+    ("ziffer", "1", "Newton", ["N"], ["Newton", "newton", "Watt", "Newtn"]),
+    ("ziffer_fuzzy", "1Y", "Wärmestrahlung", [], ["Wärmestrahlung", "Wärmestrahlng", "Strahlung", "Leitung"]),
+    ("ziffer_fuzzy_z", "1Z", "Reihenschaltung", [], ["Reihenschaltng", "Reihe", "Parallelschaltung"]),
+    ("oder", "1o2o3", "Strahlung", ["Konvektion", "Wärmeleitung"],
+     [SATZ.format("Strahlung"), SATZ.format("Konvektoin"), SATZ.format("Reibung"), "Wärmeleitung"]),
+    ("und", "1u(2o3)", "Strahlung", ["Konvektion", "Mitführung"],
+     [SATZ.format("Strahlung und Konvektion"), SATZ.format("Strahlng und Mitfürung"), SATZ.format("Strahlung")]),
+    ("bereich", "2o9", "Energie",
+     ["Joule", "Kilojoule", "Wattsekunde", "Kilowattstunde", "Newtonmeter", "Elektronenvolt", "Kalorie", "Erg"],
+     [SATZ.format("Kilowattstunden"), SATZ.format("Kalorien"), SATZ.format("Pascal"), "Joul"]),
+    ("verbot", "1o2f3o4", "Strahlung", ["Konvektion", "Wärmeleitung", "Reibung"],
+     [SATZ.format("Strahlung"), SATZ.format("Wärmeleitung"), SATZ.format("Reibung und Konvektion")]),
+    ("e_paar", "1e2", "Kraft", ["Gegenkraft"], ["Kraft; Gegenkraft", "Kraft...Gegenkraft", "Kraft"]),
+    ("luecke", "lY", "", ["Reihe; Reihenschaltung", "parallel; Parallelschaltung"],
+     ["Reihe; parallel", "Reihenschaltng; Parallelschaltung", "Reihe", "parallel; Reihe"]),
+    ("rechnen", "r", "12 Ohm; 14 Ohm; 16 Ohm", ["4; 6; 8", "3; 2; 2"], ["12", "14 Ohm", "16,0", "13"]),
+    ("wahr_falsch", "w", "wahr", [], ["ja", "w", "nein", "vielleicht"]),
+    ("auswahl", "a", "Joule", ["Watt", "Newton"], ["0", "1", "2", "Joule"]),
+    ("bild", "p", "", [], []),
+]
+
+
+def tippfehler(text, zufall):
+    if len(text) < 4 or zufall.random() < 0.5:
+        return text
+    i = zufall.randrange(len(text))
+    return text[:i] + text[i + 1:]
+
+
+def git_stand():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Misst die Bewertung je Typ-Familie (Antworten/s, Abfragen pro Aufruf) auf einem synthetischen Katalog (wird zurückgerollt)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--aufgaben", type=int, default=20, help="Aufgaben pro Familie")
+        parser.add_argument("--antworten", type=int, default=5000, help="Bewertungen pro Familie")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", type=str, default=None, help="Ergebnis als JSON in diese Datei schreiben")
+        parser.add_argument("--vergleich", type=str, default=None, help="Früheres JSON-Ergebnis zum Vergleich")
+
+    def handle(self, *args, **options):
+        ergebnis = {}
+        try:
+            with transaction.atomic():
+                ergebnis = self.lauf(options)
+                raise RuntimeError("BENCH_ROLLBACK")
+        except RuntimeError as e:
+            if str(e) != "BENCH_ROLLBACK": raise
+        verwerfe_schluessel()
+
+        alt = {}
+        if options["vergleich"]:
+            with open(options["vergleich"], encoding="utf-8") as f:
+                alt = json.load(f).get("familien", {})
+
+        self.stdout.write(f"{'Familie':16} {'Antw./s':>10} {'Abfr. kalt':>11} {'Abfr. warm':>11}")
+        for name, werte in ergebnis["familien"].items():
+            zeile = (
+                f"{name:16} {werte['antworten_pro_s']:10.0f} "
+                f"{werte['abfragen_kalt']:11.2f} {werte['abfragen_warm']:11.2f}"
+            )
+            if name in alt and alt[name]["antworten_pro_s"]:
+                zeile += f"   x{werte['antworten_pro_s'] / alt[name]['antworten_pro_s']:.2f} ggü. {options['vergleich']}"
+            self.stdout.write(zeile)
+
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as f:
+                json.dump(ergebnis, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"JSON geschrieben: {options['json']}"))
+
+    def lauf(self, options):
+        zufall = random.Random(options["seed"])
+        ordnung = (ThemenBereich.objects.order_by("-ordnung").values_list("ordnung", flat=True).first() or 0) + 1
+        thema = ThemenBereich.objects.create(ordnung=ordnung, thema="Benchmark", farbe="grey", kurz="B")
+        kapitel = Kapitel.objects.create(thema=thema, zeile=1, kapitel="Bewertung")
+
+        familien = {}
+        for name, typ, loesung, optionen, eingaben in FAMILIEN:
+            ids = []
+            for i in range(options["aufgaben"]):
+                aufgabe = Aufgabe.objects.create(
+                    lfd_nr=f"B{len(familien):02d}{i:04d}", thema=thema, kapitel=kapitel,
+                    typ=typ, loesung=loesung, frage="?",
+                )
+                AufgabeOption.objects.bulk_create([
+                    AufgabeOption(aufgabe=aufgabe, position=pos, text=text)
+                    for pos, text in enumerate(optionen, start=2)
+                ])
+                if typ == "p":
+                    AufgabeBild.objects.bulk_create([
+                        AufgabeBild(aufgabe=aufgabe, position=pos, bild=f"bench/{i}_{pos}.png") for pos in (1, 2, 3)
+                    ])
+                ids.append(aufgabe.id)
+            familien[name] = (ids, eingaben)
+
+        ergebnis = {
+            "zeit": timezone.now().isoformat(),
+            "commit": git_stand(),
+            "python": platform.python_version(),
+            "antworten": options["antworten"],
+            "familien": {},
+        }
+        for name, (ids, eingaben) in familien.items():
+            ergebnis["familien"][name] = self.miss(ids, eingaben, options["antworten"], zufall)
+        return ergebnis
+
+    def miss(self, ids, eingaben, n, zufall):
+        daten = lade_aufgaben(ids)
+
+        # Kalt: leerer Schlüssel-Cache, Aufgabe ohne vorab geladene Optionen
+        verwerfe_schluessel()
+        modelle = list(Aufgabe.objects.filter(id__in=ids))
+        with CaptureQueriesContext(connection) as kalt:
+            for aufgabe in modelle:
+                bewerte(aufgabe, eingaben[0] if eingaben else "")
+
+        # Warm: Aufgaben-Snapshots, gemischte Eingaben (richtig, Tippfehler, falsch)
+        auftraege = []
+        for _ in range(n):
+            aufgabe = zufall.choice(daten)
+            if aufgabe.typ == "p":
+                auftraege.append((aufgabe, "", 0, zufall.choice(aufgabe.bilder).id))
+            else:
+                auftraege.append((aufgabe, tippfehler(zufall.choice(eingaben), zufall), zufall.randrange(3), None))
+
+        with CaptureQueriesContext(connection) as warm:
+            start = time.perf_counter()
+            for aufgabe, antwort, variante, bild in auftraege:
+                bewerte(aufgabe, antwort, variante=variante, bild_antwort=bild)
+            dauer = time.perf_counter() - start
+
+        return {
+            "antworten_pro_s": n / dauer if dauer else 0.0,
+            "abfragen_kalt": len(kalt.captured_queries) / len(modelle),
+            "abfragen_warm": len(warm.captured_queries) / n,
+        }
@@ -0,0 +1,103 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from physik.models import ThemenBereich, Kapitel, Aufgabe, Protokoll
+from physik.serie import aufgaben_bereich, filter_fach, waehle_serie
+
+def alte_auswahl(user, thema, fach_int):
+    # Der frühere Weg aus views.aufgaben: doppelter Join + distinct + Mischen in Python
+    aufgaben_qs = aufgaben_bereich(thema)
+    for _ in range(2):
+        if fach_int == 1:
+            aufgaben_qs = aufgaben_qs.filter(
+                Q(protokoll__user=user, protokoll__fach=1) |
+                ~Q(protokoll__user=user)
+            ).distinct()
+        else:
+            aufgaben_qs = aufgaben_qs.filter(protokoll__user=user, protokoll__fach=fach_int)
+    all_ids = list(aufgaben_qs.values_list("id", flat=True))
+    random.shuffle(all_ids)
+    return all_ids[:10]
+
+class Command(BaseCommand):
+    help = "Vergleicht die alte und die neue Serien-Auswahl auf synthetischen Daten (wird zurückgerollt)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--aufgaben", type=int, default=50000)
+        parser.add_argument("--user", type=int, default=5000)
+        parser.add_argument("--protokolle-pro-user", type=int, default=50)
+        parser.add_argument("--runden", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.lauf(options)
+                raise RuntimeError("BENCH_ROLLBACK")
+        except RuntimeError as e:
+            if str(e) != "BENCH_ROLLBACK": raise
+
+    def lauf(self, options):
+        n_aufgaben = options["aufgaben"]
+        n_user = options["user"]
+        pro_user = min(options["protokolle_pro_user"], n_aufgaben)
+
+        self.stdout.write(f"Erzeuge {n_aufgaben} Aufgaben, {n_user} User, {pro_user} Protokolle/User ...")
+        ordnung = (ThemenBereich.objects.order_by("-ordnung").values_list("ordnung", flat=True).first() or 0) + 1
+        thema = ThemenBereich.objects.create(ordnung=ordnung, thema="Benchmark", farbe="grey", kurz="B")
+        kapitel = Kapitel.objects.bulk_create([
+            Kapitel(thema=thema, zeile=z, kapitel=f"Kapitel {z}") for z in range(1, 21)
+        ])
+        Aufgabe.objects.bulk_create([
+            Aufgabe(
+                lfd_nr=f"B{i:07d}", thema=thema, kapitel=kapitel[i % len(kapitel)],
+                schwierigkeit=1 + i % 3, typ="1", frage="?", loesung="x",
+            )
+            for i in range(n_aufgaben)
+        ], batch_size=1000)
+        aufgabe_ids = list(Aufgabe.objects.filter(thema=thema).values_list("id", flat=True))
+
+        User.objects.bulk_create([User(username=f"bench_{i}") for i in range(n_user)], batch_size=1000)
+        users = list(User.objects.filter(username__startswith="bench_"))
+
+        protokolle = []
+        for u in users:
+            for a_id in random.sample(aufgabe_ids, pro_user):
+                protokolle.append(Protokoll(user=u, aufgabe_id=a_id, fach=random.randint(1, 4)))
+            if len(protokolle) >= 10000:
+                Protokoll.objects.bulk_create(protokolle, batch_size=1000)
+                protokolle = []
+        Protokoll.objects.bulk_create(protokolle, batch_size=1000)
+
+        # Treffermengen vergleichen
+        for u in random.sample(users, min(3, len(users))):
+            for fach in (1, 2):
+                neu = set(filter_fach(aufgaben_bereich(thema), u, fach).values_list("id", flat=True))
+                alt_qs = aufgaben_bereich(thema)
+                if fach == 1:
+                    alt_qs = alt_qs.filter(Q(protokoll__user=u, protokoll__fach=1) | ~Q(protokoll__user=u)).distinct()
+                else:
+                    alt_qs = alt_qs.filter(protokoll__user=u, protokoll__fach=fach)
+                alt = set(alt_qs.values_list("id", flat=True))
+                # Der alte Fach-1-Filter korreliert ~Q über die gejointe Protokollzeile und
+                # lässt damit Aufgaben durch, die nur ein ANDERER User protokolliert hat.
+                self.stdout.write(
+                    f"User {u.pk}, Fach {fach}: Treffer alt={len(alt)} neu={len(neu)}, "
+                    f"nur alt={len(alt - neu)}, nur neu={len(neu - alt)}"
+                )
+
+        runden = options["runden"]
+        for name, funktion in (
+            ("alt", lambda u, f: alte_auswahl(u, thema, f)),
+            ("neu", lambda u, f: waehle_serie(u, thema, fach_int=f)),
+        ):
+            for fach in (1, 2):
+                start = time.perf_counter()
+                for _ in range(runden):
+                    funktion(random.choice(users), fach)
+                dauer = (time.perf_counter() - start) / runden * 1000
+                self.stdout.write(f"{name:4} Fach {fach}: {dauer:8.1f} ms pro Serie")
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from physik.fehleranalyse import VERDICHTEN_BLOCK, verdichte
+
+
+class Command(BaseCommand):
+    help = "Verdichtet alte FehlerLog-Einträge zu Zählern pro Aufgabe und Antwort (FehlerSumme) und löscht sie."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tage", type=int, default=settings.PHYSIK_FEHLER_AUFBEWAHRUNG_TAGE,
+                            help="Roh-Einträge so viele Tage aufbewahren (Standard: PHYSIK_FEHLER_AUFBEWAHRUNG_TAGE)")
+        parser.add_argument("--block", type=int, default=VERDICHTEN_BLOCK, help="Einträge pro Transaktion")
+
+    def handle(self, *args, **options):
+        grenze = timezone.now() - timedelta(days=options["tage"])
+        anzahl = verdichte(grenze, block=options["block"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{anzahl} FehlerLog-Einträge vor {grenze:%d.%m.%Y} verdichtet"
+        ))
@@ -1,10 +1,16 @@
 import csv
+import hashlib
+import json
 import os
+import time
+from itertools import islice
 
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
-from physik.models import ThemenBereich, Kapitel, Aufgabe, AufgabeOption 
+from physik.models import ThemenBereich, Kapitel, Aufgabe, AufgabeOption, Benachrichtigung, LernstandZaehler, verwerfe_bestand
+from physik.antwortschluessel import verwerfe_schluessel
+from physik.bearbeitung import wende_optionen_an
 
 def clean_csv_value(value):
     # Wandelt den Wert in einen String um und entfernt Leerzeichen
@@ -31,18 +37,51 @@ REQUIRED_COLUMNS = [
 
 OPTION_COLUMNS = ["2", "3", "4", "5", "6", "7", "8", "9"]
 
+# Felder, die der Import an einer bestehenden Aufgabe überschreibt
+AUFGABE_FELDER = ["thema", "kapitel", "schwierigkeit", "typ", "frage", "loesung", "erklaerung", "anmerkung", "hilfe", "inhalt_hash"]
+
 def norm(wert):
-    if wert is None: 
+    if wert is None:
         return "" # Wichtig: Leerstring statt None
-    
+
     s = str(wert).strip()
-    
+
     # Alle "Null-Varianten" in einen sauberen Leerstring umwandeln
-    if s in ["0", "0.0", "nan", "None", ""]: 
+    if s in ["0", "0.0", "nan", "None", ""]:
         return ""
-    
+
     return s
 
+def berechne_hash(felder, optionen):
+    # Prüfsumme über alle importierten Werte einer Zeile inkl. Optionen
+    inhalt = [
+        felder["thema"].id,
+        felder["kapitel"].id,
+        [felder[f] for f in AUFGABE_FELDER if f not in ("thema", "kapitel", "inhalt_hash")],
+        sorted(optionen.items()),
+    ]
+    return hashlib.sha256(json.dumps(inhalt, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def geaenderte_felder(obj, felder):
+    # Vergleich über die IDs, damit keine Fremdschlüssel nachgeladen werden
+    anders = set()
+    for feld, wert in felder.items():
+        if feld in ("thema", "kapitel"):
+            if getattr(obj, f"{feld}_id") != wert.id:
+                anders.add(feld)
+        elif getattr(obj, feld) != wert:
+            anders.add(feld)
+    return anders
+
+def in_bloecken(iterable, groesse):
+    # Liefert Listen mit höchstens 'groesse' Elementen, ohne alles zu laden
+    it = iter(iterable)
+    while True:
+        block = list(islice(it, groesse))
+        if not block:
+            return
+        yield block
+
 class Command(BaseCommand):
     help = "Importiert Aufgaben aus CSV. Thema wird aus Spalte 'thema_id' gelesen."
 
@@ -52,142 +91,321 @@ class Command(BaseCommand):
         parser.add_argument("--commit", action="store_true", help="Schreibt in die DB")
         parser.add_argument("--encoding", type=str, default="utf-8", help="CSV-Encoding")
         parser.add_argument("--delimiter", type=str, default=";", help="CSV-Trennzeichen")
+        parser.add_argument("--batch-size", type=int, default=500, help="Zeilen pro Block (bulk_create/bulk_update)")
+        parser.add_argument("--incremental", action="store_true",
+                            help="Zeilen mit unveränderter Prüfsumme komplett überspringen, entfernte Aufgaben melden")
+        parser.add_argument("--entfernen", action="store_true",
+                            help="Mit --incremental: Aufgaben, die nicht mehr in der CSV stehen, löschen")
 
     def handle(self, *args, **options):
         path = options["file"]
         commit = options["commit"]
         encoding = options["encoding"]
         delimiter = options["delimiter"]
+        batch_size = options["batch_size"]
+        self.incremental = options["incremental"]
+        entfernen = options["entfernen"]
 
+        if batch_size < 1:
+            raise CommandError("--batch-size muss mindestens 1 sein.")
+        if entfernen and not self.incremental:
+            raise CommandError("--entfernen geht nur zusammen mit --incremental.")
         if not os.path.exists(path):
             raise CommandError(f"Datei nicht gefunden: {path}")
 
-        # CSV lesen
+        self.errors = []
+        self.error_count = 0
+        self.stats = {
+            "rows": 0,
+            "created_chapters": 0,
+            "created_tasks": 0,
+            "updated_tasks": 0,
+            "unchanged_tasks": 0,
+            "skipped_tasks": 0,
+            "removed_tasks": 0,
+            "created_options": 0,
+            "updated_options": 0,
+            "deleted_options": 0,
+        }
+
+        # Caches für Performance
+        self.thema_cache = {}
+        self.kap_cache = {}
+        # Alle gültigen lfd_nr der Datei (nur im Modus --incremental, für "entfernt")
+        self.gesehen = set()
+        # IDs der Aufgaben mit neuem Thema/Kapitel/Schwierigkeit (Lernstand-Zähler)
+        self.umsortiert = set()
+
+        start = time.perf_counter()
+
         with open(path, "r", encoding=encoding, newline="") as f:
             reader = csv.DictReader(f, delimiter=delimiter)
-            rows = list(reader)
 
-        if not rows:
+            # Header prüfen
+            header_set = {h.strip() for h in (reader.fieldnames or []) if h}
+            if not header_set:
+                raise CommandError("Keine Datenzeilen gefunden.")
+            missing = [c for c in REQUIRED_COLUMNS if c not in header_set]
+            if missing:
+                raise CommandError(f"Fehlende Spalten in CSV: {missing}")
+
+            try:
+                with transaction.atomic():
+                    # Zeilennummern ab 2 (Zeile 1 = Header)
+                    for block in in_bloecken(enumerate(reader, start=2), batch_size):
+                        self.importiere_block(block)
+
+                    if self.incremental and self.stats["rows"]:
+                        self.entfernte_aufgaben(entfernen, batch_size)
+
+                    # bulk_update umgeht die Signale, die die Zähler sonst umbuchen
+                    if self.umsortiert:
+                        LernstandZaehler.neu_aufbauen()
+
+                    if not commit:
+                        raise RuntimeError("DRY_RUN_ROLLBACK")
+            except RuntimeError as e:
+                if str(e) != "DRY_RUN_ROLLBACK": raise
+
+        if commit:
+            # bulk_* umgeht die post_save-Signale -> Caches hier leeren (verwerfe_schluessel
+            # setzt auch die Generation, damit die Web-Worker ihre Schlüssel verwerfen)
+            verwerfe_schluessel()
+            verwerfe_bestand()
+
+        if not self.stats["rows"]:
             raise CommandError("Keine Datenzeilen gefunden.")
 
-        # Header prüfen
-        header_set = {h.strip() for h in rows[0].keys() if h}
-        missing = [c for c in REQUIRED_COLUMNS if c not in header_set]
-        if missing:
-            raise CommandError(f"Fehlende Spalten in CSV: {missing}")
+        dauer = time.perf_counter() - start
+        s = self.stats
 
-        errors = []
-        warnings = []
-        created_chapters = 0
-        created_tasks = 0
-        updated_tasks = 0
-        created_options = 0
+        # Zusammenfassung
+        self.stdout.write(self.style.MIGRATE_HEADING("\nImport abgeschlossen"))
+        self.stdout.write(f"Modus: {'COMMIT' if commit else 'TROCKENLAUF'}{' (inkrementell)' if self.incremental else ''}")
+        if self.incremental:
+            aktion = "gelöscht" if entfernen else "nicht mehr in CSV"
+            self.stdout.write(
+                f"Aufgaben neu/geändert/{aktion}: "
+                f"{s['created_tasks']}/{s['updated_tasks']}/{s['removed_tasks']} "
+                f"(übersprungen: {s['skipped_tasks']})"
+            )
+        self.stdout.write(f"Aufgaben neu/update: {s['created_tasks']}/{s['updated_tasks']}")
+        self.stdout.write(f"Aufgaben unverändert: {s['unchanged_tasks']}")
+        self.stdout.write(f"Optionen neu/update/gelöscht: {s['created_options']}/{s['updated_options']}/{s['deleted_options']}")
+        self.stdout.write(f"Kapitel neu: {s['created_chapters']}")
+        if self.umsortiert:
+            self.stdout.write(f"Umsortiert (Lernstand-Zähler neu aufgebaut): {len(self.umsortiert)}")
+        self.stdout.write(f"Zeilen: {s['rows']} in {dauer:.2f}s ({s['rows'] / dauer if dauer else 0:.0f} Zeilen/s)")
 
-        # Caches für Performance
-        thema_cache = {}
-        kap_cache = {}
-
-        @transaction.atomic
-        def run():
-            nonlocal created_chapters, created_tasks, updated_tasks, created_options
-
-            for i, row in enumerate(rows, start=2):
-                row_hint = f"Zeile {i}"
-                lfd_nr = norm(row.get("lfd_nr"))
-                
-                # 1. Thema ermitteln
-                t_id_raw = norm(row.get("thema_id"))
-                if not t_id_raw:
-                    errors.append(f"{row_hint}: thema_id fehlt")
-                    continue
-                
-                if t_id_raw not in thema_cache:
-                    try:
-                        thema_cache[t_id_raw] = ThemenBereich.objects.get(ordnung=int(t_id_raw))
-                    except (ThemenBereich.DoesNotExist, ValueError):
-                        errors.append(f"{row_hint}: ThemenBereich mit ordnung={t_id_raw} existiert nicht.")
-                        continue
-                
-                aktuel_thema = thema_cache[t_id_raw]
-
-                # 2. Validierung Pflichtfelder
-                frage = norm(row.get("frage"))
-                zeile_raw = norm(row.get("zeile"))
-                kapitel_name = norm(row.get("kapitel"))
-                schwierigkeit_raw = norm(row.get("schwierigkeit"))
-
-                if not frage or not zeile_raw or not kapitel_name or not schwierigkeit_raw:
-                    errors.append(f"{row_hint} ({lfd_nr}): Pflichtfelder unvollständig")
-                    continue
-
-                try:
-                    zeile = int(zeile_raw)
-                    schwierigkeit = int(schwierigkeit_raw)
-                except ValueError:
-                    errors.append(f"{row_hint}: Zeile/Schwierigkeit keine Zahl")
-                    continue
-
-                # 3. Kapitel holen/erstellen (jetzt mit dynamischem Thema)
-                kap_key = (aktuel_thema.id, zeile)
-                kap = kap_cache.get(kap_key)
-                if kap is None:
-                    kap, created = Kapitel.objects.get_or_create(
-                        thema=aktuel_thema,
-                        zeile=zeile,
-                        defaults={"kapitel": kapitel_name},
-                    )
-                    if created:
-                        created_chapters += 1
-                    kap_cache[kap_key] = kap
-
-                # 4. Aufgabe upsert
-                obj, created = Aufgabe.objects.update_or_create(
-                    lfd_nr=lfd_nr,
-                    defaults={
-                        "thema": aktuel_thema,
-                        "kapitel": kap,
-                        "schwierigkeit": schwierigkeit,
-                        "typ": norm(row.get("typ")),
-                        "frage": frage,
-                        "antwort": norm(row.get("antwort")),
-                        "erklaerung": clean_csv_value(row.get("erklaerung")),
-                        "anmerkung": clean_csv_value(row.get("anmerkung")),
-                        "hilfe": clean_csv_value(row.get("hilfe")),
-                    },
-                )
-                if created: created_tasks += 1
-                else: updated_tasks += 1
-
-                # 5. Optionen
-                # Zuerst ALLES löschen, was zu dieser Aufgabe gehört
-                AufgabeOption.objects.filter(aufgabe=obj).delete()
-
-                for col in OPTION_COLUMNS:
-                    # Nutze die radikale Reinigung
-                    val = clean_csv_value(row.get(col))
-                    
-                    # Nur wenn der Wert NICHT leer ist (clean_csv_value gibt "" bei Nullen zurück)
-                    if val != "":
-                        AufgabeOption.objects.create(
-                            aufgabe=obj, 
-                            position=int(col), 
-                            text=val
-                        )
-                        created_options += 1
-
-            if not commit:
-                raise RuntimeError("DRY_RUN_ROLLBACK")
+        if self.error_count:
+            self.stdout.write(self.style.ERROR(f"\nFEHLER gefunden: {self.error_count}"))
+            for err in self.errors: self.stdout.write(f" - {err}")
+
+    def fehler(self, text):
+        # Nur die ersten 10 Meldungen aufheben, damit der Speicher begrenzt bleibt
+        self.error_count += 1
+        if len(self.errors) < 10:
+            self.errors.append(text)
+
+    def thema_fuer(self, t_id_raw):
+        if t_id_raw not in self.thema_cache:
+            try:
+                self.thema_cache[t_id_raw] = ThemenBereich.objects.get(ordnung=int(t_id_raw))
+            except (ThemenBereich.DoesNotExist, ValueError):
+                self.thema_cache[t_id_raw] = None
+        return self.thema_cache[t_id_raw]
+
+    def kapitel_fuer(self, thema, zeile, kapitel_name):
+        kap_key = (thema.id, zeile)
+        kap = self.kap_cache.get(kap_key)
+        if kap is None:
+            kap, created = Kapitel.objects.get_or_create(
+                thema=thema,
+                zeile=zeile,
+                defaults={"kapitel": kapitel_name},
+            )
+            if created:
+                self.stats["created_chapters"] += 1
+            self.kap_cache[kap_key] = kap
+        return kap
+
+    def lies_zeile(self, i, row):
+        """Prüft eine CSV-Zeile und liefert (lfd_nr, felder, optionen) oder None."""
+        row_hint = f"Zeile {i}"
+        lfd_nr = norm(row.get("lfd_nr"))
+        if not lfd_nr:
+            self.fehler(f"{row_hint}: lfd_nr fehlt")
+            return None
+
+        # 1. Thema ermitteln
+        t_id_raw = norm(row.get("thema_id"))
+        if not t_id_raw:
+            self.fehler(f"{row_hint}: thema_id fehlt")
+            return None
+
+        aktuel_thema = self.thema_fuer(t_id_raw)
+        if aktuel_thema is None:
+            self.fehler(f"{row_hint}: ThemenBereich mit ordnung={t_id_raw} existiert nicht.")
+            return None
+
+        # 2. Validierung Pflichtfelder
+        frage = norm(row.get("frage"))
+        zeile_raw = norm(row.get("zeile"))
+        kapitel_name = norm(row.get("kapitel"))
+        schwierigkeit_raw = norm(row.get("schwierigkeit"))
+
+        if not frage or not zeile_raw or not kapitel_name or not schwierigkeit_raw:
+            self.fehler(f"{row_hint} ({lfd_nr}): Pflichtfelder unvollständig")
+            return None
 
         try:
-            run()
-        except RuntimeError as e:
-            if str(e) != "DRY_RUN_ROLLBACK": raise
+            zeile = int(zeile_raw)
+            schwierigkeit = int(schwierigkeit_raw)
+        except ValueError:
+            self.fehler(f"{row_hint}: Zeile/Schwierigkeit keine Zahl")
+            return None
 
-        # Zusammenfassung (gekürzt)
-        self.stdout.write(self.style.MIGRATE_HEADING("\nImport abgeschlossen"))
-        self.stdout.write(f"Modus: {'COMMIT' if commit else 'TROCKENLAUF'}")
-        self.stdout.write(f"Aufgaben neu/update: {created_tasks}/{updated_tasks}")
-        
-        if errors:
-            self.stdout.write(self.style.ERROR(f"\nFEHLER gefunden: {len(errors)}"))
-            for err in errors[:10]: self.stdout.write(f" - {err}")
\ No newline at end of file
+        # 3. Kapitel holen/erstellen (jetzt mit dynamischem Thema)
+        kap = self.kapitel_fuer(aktuel_thema, zeile, kapitel_name)
+
+        felder = {
+            "thema": aktuel_thema,
+            "kapitel": kap,
+            "schwierigkeit": schwierigkeit,
+            "typ": norm(row.get("typ")),
+            "frage": frage,
+            "loesung": norm(row.get("antwort")),
+            "erklaerung": clean_csv_value(row.get("erklaerung")),
+            "anmerkung": clean_csv_value(row.get("anmerkung")),
+            "hilfe": clean_csv_value(row.get("hilfe")),
+        }
+
+        # Optionen: Position = Spaltenname, leere Werte ("0", "nan" ...) entfallen
+        optionen = {}
+        for col in OPTION_COLUMNS:
+            val = clean_csv_value(row.get(col))
+            if val != "":
+                optionen[int(col)] = val
+
+        felder["inhalt_hash"] = berechne_hash(felder, optionen)
+        return lfd_nr, felder, optionen
+
+    def entfernte_aufgaben(self, entfernen, batch_size):
+        # Bestand einmal durchgehen statt riesiger NOT IN-Listen
+        weg = [
+            (pk, lfd_nr)
+            for pk, lfd_nr in Aufgabe.objects.values_list("id", "lfd_nr").iterator(chunk_size=2000)
+            if lfd_nr not in self.gesehen
+        ]
+        self.stats["removed_tasks"] = len(weg)
+        if entfernen:
+            for block in in_bloecken([pk for pk, _ in weg], batch_size):
+                Aufgabe.objects.filter(id__in=block).delete()
+        else:
+            for _, lfd_nr in weg[:10]:
+                self.stdout.write(f" - nicht mehr in CSV: {lfd_nr}")
+
+    def importiere_block(self, block):
+        self.stats["rows"] += len(block)
+
+        # Zeilen prüfen; doppelte lfd_nr im Block -> letzte Zeile gewinnt
+        daten = {}
+        for i, row in block:
+            ergebnis = self.lies_zeile(i, row)
+            if ergebnis:
+                lfd_nr, felder, optionen = ergebnis
+                daten[lfd_nr] = (felder, optionen)
+        if not daten:
+            return
+
+        if self.incremental:
+            self.gesehen.update(daten)
+            # Nur Prüfsummen laden; identische Zeilen fallen komplett heraus
+            hashes = dict(
+                Aufgabe.objects.filter(lfd_nr__in=list(daten)).values_list("lfd_nr", "inhalt_hash")
+            )
+            for lfd_nr in list(daten):
+                if hashes.get(lfd_nr) and hashes[lfd_nr] == daten[lfd_nr][0]["inhalt_hash"]:
+                    del daten[lfd_nr]
+                    self.stats["skipped_tasks"] += 1
+            if not daten:
+                return
+
+        # 4. Aufgaben: eine Abfrage für den Bestand, dann bulk_create/bulk_update
+        bestehend = Aufgabe.objects.in_bulk(list(daten), field_name="lfd_nr")
+        neue, geaenderte, unveraenderte = [], [], []
+        nur_hash = []
+        update_felder = set()
+        for lfd_nr, (felder, _) in daten.items():
+            obj = bestehend.get(lfd_nr)
+            if obj is None:
+                neue.append(Aufgabe(lfd_nr=lfd_nr, **felder))
+                continue
+            anders = geaenderte_felder(obj, felder)
+            if anders & {"thema", "kapitel", "schwierigkeit"}:
+                self.umsortiert.add(obj.id)
+            for feld in anders:
+                setattr(obj, feld, felder[feld])
+            update_felder |= anders
+            # Nur eine neue Prüfsumme (z.B. erster Lauf) zählt nicht als inhaltliche Änderung
+            if anders - {"inhalt_hash"}:
+                geaenderte.append(obj)
+            else:
+                unveraenderte.append(obj)
+                if anders:
+                    nur_hash.append(obj)
+
+        if neue:
+            Aufgabe.objects.bulk_create(neue)
+        self.stats["created_tasks"] += len(neue)
+        self.stats["updated_tasks"] += len(geaenderte)
+        self.stats["unchanged_tasks"] += len(unveraenderte)
+
+        aufgaben = {a.lfd_nr: a for a in neue + geaenderte + unveraenderte}
+
+        # 5. Optionen: Bestand einmal laden und pro (Aufgabe, Position) abgleichen
+        vorhandene = {}
+        for opt in AufgabeOption.objects.filter(aufgabe__in=[a.id for a in geaenderte + unveraenderte]):
+            vorhandene[(opt.aufgabe_id, opt.position)] = opt
+
+        opt_neu, opt_update = [], []
+        for lfd_nr, (_, optionen) in daten.items():
+            aufgabe = aufgaben[lfd_nr]
+            for position, text in optionen.items():
+                opt = vorhandene.pop((aufgabe.id, position), None)
+                if opt is None:
+                    opt_neu.append(AufgabeOption(aufgabe=aufgabe, position=position, text=text))
+                elif opt.text != text:
+                    opt.text = text
+                    opt_update.append(opt)
+        # Was übrig ist, steht nicht mehr in der CSV
+        opt_weg = list(vorhandene.values())
+        opt_weg_aufgaben = {opt.aufgabe_id for opt in opt_weg}
+
+        # Gemeinsamer Schreibweg (bearbeitung.py); die Prüfsummen setzt der Import unten selbst
+        wende_optionen_an(neu=opt_neu, geaendert=opt_update, geloescht=opt_weg, pruefsumme=False)
+
+        # Aufgaben erst nach den Optionen schreiben
+        zu_schreiben = geaenderte + nur_hash
+        if zu_schreiben:
+            # Nur geänderte Zeilen und Spalten: bulk_update baut pro Zeile und Spalte CASE-Ausdrücke
+            Aufgabe.objects.bulk_update(zu_schreiben, [f for f in AUFGABE_FELDER if f in update_felder])
+
+        self.stats["created_options"] += len(opt_neu)
+        self.stats["updated_options"] += len(opt_update)
+        self.stats["deleted_options"] += len(opt_weg)
+
+        # Aufgaben, bei denen sich nur Optionen geändert haben, zählen als geändert
+        geaendert_ids = {a.id for a in geaenderte}
+        geaendert_ids.update(o.aufgabe_id for o in opt_update)
+        geaendert_ids.update(o.aufgabe.id for o in opt_neu)
+        geaendert_ids.update(opt_weg_aufgaben)
+        nur_optionen = [a for a in unveraenderte if a.id in geaendert_ids]
+        self.stats["updated_tasks"] += len(nur_optionen)
+        self.stats["unchanged_tasks"] -= len(nur_optionen)
+
+        # Benachrichtigungen gesammelt vormerken (bulk_* sendet kein post_save)
+        Benachrichtigung.objects.bulk_create(
+            [Benachrichtigung(aufgabe=a, lfd_nr=a.lfd_nr, neu=True) for a in neue]
+            + [Benachrichtigung(aufgabe=a, lfd_nr=a.lfd_nr, neu=False) for a in geaenderte + nur_optionen]
+        )
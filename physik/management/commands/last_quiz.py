@@ -0,0 +1,184 @@
+import base64
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, OperationalError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from physik.datenbank import lies_pragmas
+from physik.models import ThemenBereich, Kapitel, Aufgabe, Protokoll
+from physik.seriestand import SerienStand, COOKIE_NAME, COOKIE_SALT
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "file": "django.contrib.sessions.backends.file",
+}
+
+AUTH = "Basic " + base64.b64encode(b"einstein:physik").decode()
+SCHREIBEND = ("INSERT", "UPDATE", "DELETE")
+
+
+class Messung:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.post_ms = []
+        self.anfragen = 0
+        self.session_sql = 0
+        self.schreib_sql = 0
+        self.schreib_ms = 0.0
+        self.gesperrt = 0
+        self.fehler = 0
+
+    def beobachter(self, execute, sql, params, many, context):
+        # Zählt pro SQL-Befehl: Session-Zugriffe, Schreibzugriffe und "database is locked"
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            if "locked" in str(e):
+                with self.lock:
+                    self.gesperrt += 1
+            raise
+        finally:
+            dauer = (time.perf_counter() - start) * 1000
+            with self.lock:
+                if "django_session" in sql:
+                    self.session_sql += 1
+                if sql.lstrip()[:6].upper() in SCHREIBEND:
+                    self.schreib_sql += 1
+                    self.schreib_ms += dauer
+
+
+def schueler(nr, user, aufgabe_ids, klicks, barriere, messung):
+    client = Client(HTTP_AUTHORIZATION=AUTH)
+    signer = signing.get_cookie_signer(salt=COOKIE_NAME + COOKIE_SALT)
+    url = reverse("physik:aufgaben")
+    try:
+        with connection.execute_wrapper(messung.beobachter):
+            barriere.wait()
+            try:
+                client.force_login(user)
+                for k in range(klicks):
+                    a_id = aufgabe_ids[(nr + k) % len(aufgabe_ids)]
+                    client.cookies[COOKIE_NAME] = signer.sign(SerienStand([a_id]).packe())
+
+                    client.get(url)
+                    for antwort in ("falsch", ""):
+                        start = time.perf_counter()
+                        client.post(url, {"antwort": antwort})
+                        with messung.lock:
+                            messung.post_ms.append((time.perf_counter() - start) * 1000)
+
+                    # Das Serienende schreibt Protokoll + FehlerLog gebündelt (lernfortschritt)
+                    with messung.lock:
+                        messung.anfragen += 3
+            except Exception as e:
+                with messung.lock:
+                    messung.fehler += 1
+                    if "locked" in str(e):
+                        messung.gesperrt += 1
+        client.logout()
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Lasttest: Eine Klasse beantwortet gleichzeitig Aufgaben, Vergleich der Session-Speicher und SQLite-Profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schueler", type=int, default=30)
+        parser.add_argument("--klicks", type=int, default=20, help="Aufgaben pro Schüler")
+        parser.add_argument("--sessions", type=str, default="db,cache",
+                            help=f"Kommagetrennt, Auswahl aus: {', '.join(ENGINES)}")
+        parser.add_argument("--profile", type=str, default=None,
+                            help="SQLite-Profile aus settings.SQLITE_PROFILE, kommagetrennt (Standard: aktuelles Profil)")
+
+    def handle(self, *args, **options):
+        engines = [e.strip() for e in options["sessions"].split(",") if e.strip()]
+        for e in engines:
+            if e not in ENGINES:
+                self.stderr.write(self.style.ERROR(f"Unbekannter Session-Speicher: {e}"))
+                return
+        profile = [p.strip() for p in (options["profile"] or settings.PHYSIK_SQLITE_PROFIL).split(",") if p.strip()]
+        for p in profile:
+            if p not in settings.SQLITE_PROFILE:
+                self.stderr.write(self.style.ERROR(f"Unbekanntes SQLite-Profil: {p}"))
+                return
+
+        thema, users, aufgabe_ids = self.anlegen(options["schueler"])
+        try:
+            for profil in profile:
+                with self.sqlite_profil(profil):
+                    self.stdout.write(f"-- Profil {profil}: {lies_pragmas(connection)}")
+                    for engine in engines:
+                        with override_settings(SESSION_ENGINE=ENGINES[engine], ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ["testserver"]):
+                            self.lauf(engine, users, aufgabe_ids, options["klicks"])
+        finally:
+            Protokoll.objects.filter(user__in=users).delete()
+            User.objects.filter(pk__in=[u.pk for u in users]).delete()
+            Aufgabe.objects.filter(thema=thema).delete()
+            thema.delete()
+
+    @contextmanager
+    def sqlite_profil(self, name):
+        # OPTIONS/CONN_MAX_AGE wirken erst bei neuen Verbindungen, die PRAGMAs über den Hook
+        profil = settings.SQLITE_PROFILE[name]
+        db = connections.settings["default"]
+        alt = (db["OPTIONS"], db["CONN_MAX_AGE"])
+        db["OPTIONS"], db["CONN_MAX_AGE"] = dict(profil["OPTIONS"]), profil["CONN_MAX_AGE"]
+        connection.close()
+        try:
+            with override_settings(PHYSIK_SQLITE_PRAGMAS=profil["PRAGMAS"]):
+                connection.ensure_connection()
+                yield
+        finally:
+            db["OPTIONS"], db["CONN_MAX_AGE"] = alt
+            connection.close()
+
+    def anlegen(self, n_schueler):
+        # Die Threads haben eigene Verbindungen -> Testdaten werden echt geschrieben und danach gelöscht
+        ordnung = (ThemenBereich.objects.order_by("-ordnung").values_list("ordnung", flat=True).first() or 0) + 1
+        thema = ThemenBereich.objects.create(ordnung=ordnung, thema="Lasttest", farbe="grey", kurz="L")
+        kapitel = Kapitel.objects.create(thema=thema, zeile=1, kapitel="Lasttest")
+        Aufgabe.objects.bulk_create([
+            Aufgabe(lfd_nr=f"L{i:05d}", thema=thema, kapitel=kapitel, typ="1", frage="?", loesung="richtig")
+            for i in range(50)
+        ])
+        aufgabe_ids = list(Aufgabe.objects.filter(thema=thema).values_list("id", flat=True))
+        User.objects.bulk_create([User(username=f"lasttest_{i}") for i in range(n_schueler)])
+        users = list(User.objects.filter(username__startswith="lasttest_"))
+        return thema, users, aufgabe_ids
+
+    def lauf(self, engine, users, aufgabe_ids, klicks):
+        Protokoll.objects.filter(user__in=users).delete()
+        messung = Messung()
+        barriere = threading.Barrier(len(users))
+        threads = [
+            threading.Thread(target=schueler, args=(nr, u, aufgabe_ids, klicks, barriere, messung))
+            for nr, u in enumerate(users)
+        ]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        dauer = time.perf_counter() - start
+
+        ms = sorted(messung.post_ms) or [0.0]
+        p95 = ms[int(len(ms) * 0.95) - 1] if len(ms) > 1 else ms[0]
+        self.stdout.write(
+            f"{engine:9} {messung.anfragen / dauer:7.1f} Anfragen/s | "
+            f"POST p50 {statistics.median(ms):6.1f} ms, p95 {p95:6.1f} ms | "
+            f"Session-SQL {messung.session_sql:5} | Schreib-SQL {messung.schreib_sql:5} "
+            f"({messung.schreib_ms:7.0f} ms) | gesperrt {messung.gesperrt} | Fehler {messung.fehler}"
+        )
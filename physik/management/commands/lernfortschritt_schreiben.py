@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from physik.lernfortschritt import PUFFER_SEKUNDEN, schreibe_liegengebliebene
+
+
+class Command(BaseCommand):
+    help = "Schreibt vorgemerkten Lernfortschritt abgebrochener Serien (für Cron, z.B. alle 5 Minuten)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--alter", type=int, default=PUFFER_SEKUNDEN,
+                            help="Nur Puffer, deren älteste Antwort so viele Sekunden alt ist")
+
+    def handle(self, *args, **options):
+        users, protokolle = schreibe_liegengebliebene(options["alter"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Lernfortschritt von {users} Usern geschrieben ({protokolle} Protokolle)"
+        ))
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from physik.models import LernstandZaehler
+
+class Command(BaseCommand):
+    help = "Baut die LernstandZaehler-Tabelle aus dem Protokoll neu auf (alle User oder einen)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=str, help="Nur diesen Benutzernamen neu aufbauen")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"User nicht gefunden: {options['user']}")
+
+        anzahl = LernstandZaehler.neu_aufbauen(user=user)
+        self.stdout.write(self.style.SUCCESS(f"Lernstand neu aufgebaut: {anzahl} Zählerzeilen"))
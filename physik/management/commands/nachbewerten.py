@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from physik.models import Aufgabe
+from physik.nachbewertung import nachbewerten
+
+class Command(BaseCommand):
+    help = "Bewertet gespeicherte Fehler-Eingaben mit dem aktuellen Aufgabenstand neu und zeigt, welche jetzt richtig wären."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--aufgabe", action="append", default=[], help="lfd_nr, mehrfach möglich (Standard: alle)")
+        parser.add_argument("--prozesse", type=int, default=None, help="Anzahl Worker-Prozesse (1 = ohne Pool)")
+
+    def handle(self, *args, **options):
+        aufgabe_ids = None
+        if options["aufgabe"]:
+            gefunden = dict(Aufgabe.objects.filter(lfd_nr__in=options["aufgabe"]).values_list("lfd_nr", "id"))
+            fehlend = sorted(set(options["aufgabe"]) - set(gefunden))
+            if fehlend:
+                raise CommandError(f"Aufgabe(n) nicht gefunden: {', '.join(fehlend)}")
+            aufgabe_ids = list(gefunden.values())
+
+        start = time.perf_counter()
+        ergebnis = nachbewerten(aufgabe_ids, prozesse=options["prozesse"])
+        dauer = time.perf_counter() - start
+
+        pro_aufgabe = {}
+        for u in ergebnis["umschlaege"]:
+            pro_aufgabe.setdefault(u.lfd_nr, []).append(u)
+        for lfd_nr in sorted(pro_aufgabe):
+            liste = pro_aufgabe[lfd_nr]
+            self.stdout.write(f"{lfd_nr}: {len(liste)} Eingabe(n) jetzt richtig")
+            if options["verbosity"] >= 2:
+                for u in liste:
+                    self.stdout.write(f"    #{u.log_id}: »{u.antwort}«")
+
+        for aufgabe in ergebnis["uebersprungen"]:
+            self.stdout.write(self.style.WARNING(f"{aufgabe.lfd_nr}: übersprungen (Typ {aufgabe.typ} nicht nachbewertbar)"))
+
+        geprueft = ergebnis["geprueft"]
+        self.stdout.write(self.style.SUCCESS(
+            f"{geprueft} Eingaben geprüft, {len(ergebnis['umschlaege'])} jetzt richtig "
+            f"({dauer:.2f}s, {geprueft / dauer if dauer else 0:.0f} Eingaben/s)"
+        ))
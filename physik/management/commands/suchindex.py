@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from physik.suche import baue_suchindex_neu, fehlende_trigger
+
+
+class Command(BaseCommand):
+    help = "Prüft die Trigger des Volltext-Index; mit --neu werden fehlende angelegt und der Index neu gefüllt."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--neu", action="store_true", help="Fehlende Trigger anlegen und den Index neu aufbauen")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Der Volltext-Index existiert nur unter SQLite.")
+
+        if options["neu"]:
+            baue_suchindex_neu()
+            self.stdout.write(self.style.SUCCESS("Suchindex neu aufgebaut"))
+            return
+
+        fehlend = fehlende_trigger()
+        if fehlend:
+            raise CommandError(
+                "Trigger des Suchindex fehlen (Index veraltet): " + ", ".join(fehlend)
+                + " - 'manage.py suchindex --neu' ausführen."
+            )
+        self.stdout.write(self.style.SUCCESS("Suchindex: alle Trigger vorhanden"))
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def zaehler_fuellen(apps, schema_editor):
+    Protokoll = apps.get_model('physik', 'Protokoll')
+    LernstandZaehler = apps.get_model('physik', 'LernstandZaehler')
+    gruppen = (
+        Protokoll.objects
+        .values('user_id', 'aufgabe__thema_id', 'aufgabe__kapitel_id', 'aufgabe__schwierigkeit', 'fach')
+        .annotate(cnt=models.Count('id'))
+    )
+    LernstandZaehler.objects.bulk_create([
+        LernstandZaehler(
+            user_id=g['user_id'],
+            thema_id=g['aufgabe__thema_id'],
+            kapitel_id=g['aufgabe__kapitel_id'],
+            schwierigkeit=g['aufgabe__schwierigkeit'],
+            fach=g['fach'],
+            anzahl=g['cnt'],
+        )
+        for g in gruppen
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('physik', '0030_alter_aufgabe_frage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LernstandZaehler',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schwierigkeit', models.PositiveSmallIntegerField()),
+                ('fach', models.IntegerField()),
+                ('anzahl', models.IntegerField(default=0)),
+                ('kapitel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='physik.kapitel')),
+                ('thema', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='physik.themenbereich')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lernstand_zaehler', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lernstand-Zähler',
+                'verbose_name_plural': 'Lernstand-Zähler',
+                'indexes': [models.Index(fields=['user', 'thema'], name='lernstand_user_thema_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'kapitel', 'schwierigkeit', 'fach'), name='uniq_lernstand_user_kapitel_stufe_fach')],
+            },
+        ),
+        migrations.RunPython(zaehler_fuellen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('physik', '0031_lernstandzaehler'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Benachrichtigung',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lfd_nr', models.CharField(max_length=10)),
+                ('neu', models.BooleanField(default=False)),
+                ('zeitpunkt', models.DateTimeField(auto_now_add=True)),
+                ('versendet', models.DateTimeField(blank=True, null=True)),
+                ('aufgabe', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='physik.aufgabe')),
+            ],
+            options={
+                'verbose_name': 'Benachrichtigung',
+                'verbose_name_plural': 'Benachrichtigungen',
+                'ordering': ['zeitpunkt'],
+                'indexes': [models.Index(fields=['versendet', 'zeitpunkt'], name='benachrichtigung_offen_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('physik', '0032_benachrichtigung'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aufgabe',
+            name='inhalt_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:42
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def termine_fuellen(apps, schema_editor):
+    # Bestehende Einträge: letzte Bearbeitung + Intervall des Fachs (Stand planer.INTERVALLE)
+    Protokoll = apps.get_model('physik', 'Protokoll')
+    intervalle = {1: timedelta(0), 2: timedelta(days=1), 3: timedelta(days=3), 4: timedelta(days=10)}
+    for fach, intervall in intervalle.items():
+        Protokoll.objects.filter(fach=fach).update(faellig=models.F('letzte_bearbeitung') + intervall)
+    Protokoll.objects.filter(faellig__isnull=True).update(faellig=models.F('letzte_bearbeitung'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('physik', '0033_aufgabe_inhalt_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='protokoll',
+            name='faellig',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='protokoll',
+            name='leichtigkeit',
+            field=models.FloatField(default=2.5),
+        ),
+        migrations.AddIndex(
+            model_name='protokoll',
+            index=models.Index(fields=['user', 'faellig'], name='protokoll_user_faellig_idx'),
+        ),
+        migrations.RunPython(termine_fuellen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('physik', '0034_protokoll_faellig'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aufgabe',
+            index=models.Index(fields=['thema', 'kapitel', 'schwierigkeit'], name='aufgabe_thema_kap_stufe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fehlerlog',
+            index=models.Index(fields=['zeitpunkt'], name='fehlerlog_zeit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fehlerlog',
+            index=models.Index(fields=['aufgabe', 'zeitpunkt'], name='fehlerlog_aufgabe_zeit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='protokoll',
+            index=models.Index(fields=['user', 'fach', 'aufgabe'], name='protokoll_user_fach_idx'),
+        ),
+    ]
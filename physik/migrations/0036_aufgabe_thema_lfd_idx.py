@@ -0,0 +1,19 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('physik', '0035_hot_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aufgabe',
+            index=models.Index(fields=['thema', 'lfd_nr'], name='aufgabe_thema_lfd_idx'),
+        ),
+    ]
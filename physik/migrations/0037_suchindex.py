@@ -0,0 +1,96 @@
+from django.db import migrations
+
+# Volltext-Index (SQLite FTS5, Trigramme = Teilwort-Suche wie icontains) für die
+# Mitarbeiter-Suche. Gepflegt per Trigger, damit auch bulk_create/bulk_update
+# (Import, Lernfortschritt) erfasst werden, die keine Signale auslösen.
+
+AUFGABE_ZEILE = """
+    DELETE FROM physik_aufgabe_fts WHERE rowid = {id};
+    INSERT INTO physik_aufgabe_fts(rowid, lfd_nr, frage, loesung, optionen, erklaerung, hilfe)
+        SELECT a.id, a.lfd_nr, a.frage, a.loesung,
+               (SELECT group_concat(o.text, ' ') FROM physik_aufgabeoption o WHERE o.aufgabe_id = a.id),
+               a.erklaerung, a.hilfe
+        FROM physik_aufgabe a WHERE a.id = {id};
+"""
+
+ANLEGEN = [
+    """CREATE VIRTUAL TABLE physik_aufgabe_fts USING fts5(
+        lfd_nr, frage, loesung, optionen, erklaerung, hilfe, tokenize = 'trigram')""",
+    f"""CREATE TRIGGER physik_aufgabe_fts_ai AFTER INSERT ON physik_aufgabe BEGIN
+        {AUFGABE_ZEILE.format(id="new.id")}
+    END""",
+    f"""CREATE TRIGGER physik_aufgabe_fts_au AFTER UPDATE OF lfd_nr, frage, loesung, erklaerung, hilfe
+        ON physik_aufgabe BEGIN
+        {AUFGABE_ZEILE.format(id="new.id")}
+    END""",
+    """CREATE TRIGGER physik_aufgabe_fts_ad AFTER DELETE ON physik_aufgabe BEGIN
+        DELETE FROM physik_aufgabe_fts WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER physik_aufgabeoption_fts_ai AFTER INSERT ON physik_aufgabeoption BEGIN
+        {AUFGABE_ZEILE.format(id="new.aufgabe_id")}
+    END""",
+    f"""CREATE TRIGGER physik_aufgabeoption_fts_au AFTER UPDATE OF text, aufgabe_id ON physik_aufgabeoption BEGIN
+        {AUFGABE_ZEILE.format(id="old.aufgabe_id")}
+        {AUFGABE_ZEILE.format(id="new.aufgabe_id")}
+    END""",
+    f"""CREATE TRIGGER physik_aufgabeoption_fts_ad AFTER DELETE ON physik_aufgabeoption BEGIN
+        {AUFGABE_ZEILE.format(id="old.aufgabe_id")}
+    END""",
+    """INSERT INTO physik_aufgabe_fts(rowid, lfd_nr, frage, loesung, optionen, erklaerung, hilfe)
+        SELECT a.id, a.lfd_nr, a.frage, a.loesung,
+               (SELECT group_concat(o.text, ' ') FROM physik_aufgabeoption o WHERE o.aufgabe_id = a.id),
+               a.erklaerung, a.hilfe
+        FROM physik_aufgabe a""",
+
+    # FehlerLog: External-Content-Tabelle, der Text steht nur einmal in physik_fehlerlog
+    """CREATE VIRTUAL TABLE physik_fehlerlog_fts USING fts5(
+        eingegebene_antwort, content = 'physik_fehlerlog', content_rowid = 'id', tokenize = 'trigram')""",
+    """CREATE TRIGGER physik_fehlerlog_fts_ai AFTER INSERT ON physik_fehlerlog BEGIN
+        INSERT INTO physik_fehlerlog_fts(rowid, eingegebene_antwort) VALUES (new.id, new.eingegebene_antwort);
+    END""",
+    """CREATE TRIGGER physik_fehlerlog_fts_au AFTER UPDATE OF eingegebene_antwort ON physik_fehlerlog BEGIN
+        INSERT INTO physik_fehlerlog_fts(physik_fehlerlog_fts, rowid, eingegebene_antwort)
+            VALUES ('delete', old.id, old.eingegebene_antwort);
+        INSERT INTO physik_fehlerlog_fts(rowid, eingegebene_antwort) VALUES (new.id, new.eingegebene_antwort);
+    END""",
+    """CREATE TRIGGER physik_fehlerlog_fts_ad AFTER DELETE ON physik_fehlerlog BEGIN
+        INSERT INTO physik_fehlerlog_fts(physik_fehlerlog_fts, rowid, eingegebene_antwort)
+            VALUES ('delete', old.id, old.eingegebene_antwort);
+    END""",
+    "INSERT INTO physik_fehlerlog_fts(physik_fehlerlog_fts) VALUES ('rebuild')",
+]
+
+ENTFERNEN = [
+    "DROP TRIGGER IF EXISTS physik_aufgabe_fts_ai",
+    "DROP TRIGGER IF EXISTS physik_aufgabe_fts_au",
+    "DROP TRIGGER IF EXISTS physik_aufgabe_fts_ad",
+    "DROP TRIGGER IF EXISTS physik_aufgabeoption_fts_ai",
+    "DROP TRIGGER IF EXISTS physik_aufgabeoption_fts_au",
+    "DROP TRIGGER IF EXISTS physik_aufgabeoption_fts_ad",
+    "DROP TRIGGER IF EXISTS physik_fehlerlog_fts_ai",
+    "DROP TRIGGER IF EXISTS physik_fehlerlog_fts_au",
+    "DROP TRIGGER IF EXISTS physik_fehlerlog_fts_ad",
+    "DROP TABLE IF EXISTS physik_aufgabe_fts",
+    "DROP TABLE IF EXISTS physik_fehlerlog_fts",
+]
+
+
+def _ausfuehren(anweisungen):
+    def ausfuehren(apps, schema_editor):
+        # Nur SQLite; andere Datenbanken nutzen in suche.py die icontains-Suche
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for sql in anweisungen:
+            schema_editor.execute(sql)
+    return ausfuehren
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('physik', '0036_aufgabe_thema_lfd_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(_ausfuehren(ANLEGEN), _ausfuehren(ENTFERNEN)),
+    ]
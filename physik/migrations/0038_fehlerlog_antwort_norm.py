@@ -0,0 +1,50 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:49
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# SQLite baut physik_fehlerlog für die neue Spalte neu auf; dabei gehen die
+# Trigger des Volltext-Index (0037) verloren -> wieder anlegen.
+TRIGGER = [
+    """CREATE TRIGGER IF NOT EXISTS physik_fehlerlog_fts_ai AFTER INSERT ON physik_fehlerlog BEGIN
+        INSERT INTO physik_fehlerlog_fts(rowid, eingegebene_antwort) VALUES (new.id, new.eingegebene_antwort);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS physik_fehlerlog_fts_au AFTER UPDATE OF eingegebene_antwort ON physik_fehlerlog BEGIN
+        INSERT INTO physik_fehlerlog_fts(physik_fehlerlog_fts, rowid, eingegebene_antwort)
+            VALUES ('delete', old.id, old.eingegebene_antwort);
+        INSERT INTO physik_fehlerlog_fts(rowid, eingegebene_antwort) VALUES (new.id, new.eingegebene_antwort);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS physik_fehlerlog_fts_ad AFTER DELETE ON physik_fehlerlog BEGIN
+        INSERT INTO physik_fehlerlog_fts(physik_fehlerlog_fts, rowid, eingegebene_antwort)
+            VALUES ('delete', old.id, old.eingegebene_antwort);
+    END""",
+]
+
+
+def trigger_anlegen(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in TRIGGER:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('physik', '0037_suchindex'),
+    ]
+
+    operations = [
+        # Rückwärts läuft diese Operation zuletzt (nach dem Entfernen der Spalte)
+        migrations.RunPython(migrations.RunPython.noop, trigger_anlegen),
+        migrations.AddField(
+            model_name='fehlerlog',
+            name='antwort_norm',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('eingegebene_antwort')), output_field=models.TextField()),
+        ),
+        migrations.AddIndex(
+            model_name='fehlerlog',
+            index=models.Index(fields=['aufgabe', 'antwort_norm', 'zeitpunkt'], name='fehlerlog_gruppe_idx'),
+        ),
+        migrations.RunPython(trigger_anlegen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('physik', '0038_fehlerlog_antwort_norm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FehlerSumme',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('antwort_hash', models.CharField(max_length=64)),
+                ('antwort', models.TextField()),
+                ('anzahl', models.PositiveIntegerField(default=0)),
+                ('erster', models.DateTimeField()),
+                ('letzter', models.DateTimeField()),
+                ('aufgabe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fehler_summen', to='physik.aufgabe')),
+            ],
+            options={
+                'verbose_name': 'Fehler-Summe',
+                'verbose_name_plural': 'Fehler-Summen',
+                'constraints': [models.UniqueConstraint(fields=('aufgabe', 'antwort_hash'), name='uniq_fehlersumme_aufgabe_antwort')],
+            },
+        ),
+    ]
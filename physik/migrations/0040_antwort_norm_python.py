@@ -0,0 +1,73 @@
+from django.db import migrations, models
+
+import physik.models
+
+# Die GeneratedField-Spalte (0038) faltete mit SQLites LOWER nur ASCII ("WÄRME"
+# blieb groß). Jetzt füllt Python die Spalte (casefold/strip). Generierte Spalten
+# lassen sich nicht ändern: entfernen, neu anlegen, Bestand nachtragen.
+# SQLite baut die Tabelle dabei neu auf, die Volltext-Trigger gehen verloren.
+TRIGGER = [
+    """CREATE TRIGGER IF NOT EXISTS physik_fehlerlog_fts_ai AFTER INSERT ON physik_fehlerlog BEGIN
+        INSERT INTO physik_fehlerlog_fts(rowid, eingegebene_antwort) VALUES (new.id, new.eingegebene_antwort);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS physik_fehlerlog_fts_au AFTER UPDATE OF eingegebene_antwort ON physik_fehlerlog BEGIN
+        INSERT INTO physik_fehlerlog_fts(physik_fehlerlog_fts, rowid, eingegebene_antwort)
+            VALUES ('delete', old.id, old.eingegebene_antwort);
+        INSERT INTO physik_fehlerlog_fts(rowid, eingegebene_antwort) VALUES (new.id, new.eingegebene_antwort);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS physik_fehlerlog_fts_ad AFTER DELETE ON physik_fehlerlog BEGIN
+        INSERT INTO physik_fehlerlog_fts(physik_fehlerlog_fts, rowid, eingegebene_antwort)
+            VALUES ('delete', old.id, old.eingegebene_antwort);
+    END""",
+]
+
+
+def trigger_anlegen(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in TRIGGER:
+        schema_editor.execute(sql)
+
+
+def normen_nachtragen(apps, schema_editor):
+    FehlerLog = apps.get_model("physik", "FehlerLog")
+    stapel = []
+    for log in FehlerLog.objects.only("id", "eingegebene_antwort").iterator(chunk_size=2000):
+        log.antwort_norm = (log.eingegebene_antwort or "").casefold().strip()
+        stapel.append(log)
+        if len(stapel) >= 2000:
+            FehlerLog.objects.bulk_update(stapel, ["antwort_norm"])
+            stapel = []
+    if stapel:
+        FehlerLog.objects.bulk_update(stapel, ["antwort_norm"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('physik', '0039_fehlersumme'),
+    ]
+
+    operations = [
+        # Rückwärts läuft diese Operation zuletzt (nach dem Neuaufbau der Tabelle)
+        migrations.RunPython(migrations.RunPython.noop, trigger_anlegen),
+        migrations.RemoveIndex(
+            model_name='fehlerlog',
+            name='fehlerlog_gruppe_idx',
+        ),
+        migrations.RemoveField(
+            model_name='fehlerlog',
+            name='antwort_norm',
+        ),
+        migrations.AddField(
+            model_name='fehlerlog',
+            name='antwort_norm',
+            field=physik.models.NormierteAntwortField(default='', editable=False),
+        ),
+        migrations.RunPython(normen_nachtragen, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='fehlerlog',
+            index=models.Index(fields=['aufgabe', 'antwort_norm', 'zeitpunkt'], name='fehlerlog_gruppe_idx'),
+        ),
+        migrations.RunPython(trigger_anlegen, migrations.RunPython.noop),
+    ]
@@ -3,13 +3,18 @@ from django.conf import settings
 from django.dispatch import receiver
 from django.db.models.signals import post_save
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
 
 from django.contrib.auth.models import User
 
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
+
+from django.db.backends.signals import connection_created
+from django.core.cache import caches
+
+from .antwortschluessel import verwerfe_schluessel
+from .datenbank import setze_pragmas
 
 class Profil(models.Model):
     user = models.OneToOneField(User, related_name='physik_profil', on_delete=models.CASCADE )
@@ -112,13 +117,62 @@ class Aufgabe(models.Model):
         blank=True,
     )
 
+    # Prüfsumme der zuletzt importierten CSV-Zeile (import_aufgaben --incremental).
+    # Jede Bearbeitung außerhalb des Imports leert sie, damit die Zeile wieder importiert wird.
+    inhalt_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+
     class Meta:
         verbose_name = "Aufgabe"
         verbose_name_plural = "Aufgaben"
+        indexes = [
+            # Serien-Auswahl und Startseiten-Zählung: Thema -> Kapitel/Stufe ohne Tabellenzugriff
+            models.Index(fields=["thema", "kapitel", "schwierigkeit"], name="aufgabe_thema_kap_stufe_idx"),
+            # Bestandsliste: Keyset-Blättern nach (Thema, lfd_nr)
+            models.Index(fields=["thema", "lfd_nr"], name="aufgabe_thema_lfd_idx"),
+        ]
 
     def __str__(self):
         return f"{self.thema} / {self.kapitel} – {self.frage[:50]}"
 
+    def save(self, *args, **kwargs):
+        self.inhalt_hash = ""
+        # Auch bei save(update_fields=[...]) mitschreiben, sonst überspringt
+        # import_aufgaben --incremental die Zeile trotz Änderung
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "inhalt_hash"}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Geladene Einordnung merken: ändert sie sich, ziehen die Lernstand-Zähler um
+        instance._einordnung_geladen = instance.einordnung()
+        return instance
+
+    def einordnung(self):
+        """(thema_id, kapitel_id, schwierigkeit) - die Gruppe der Startseiten-Zähler."""
+        return tuple(self.__dict__.get(f) for f in ("thema_id", "kapitel_id", "schwierigkeit"))
+
+    @classmethod
+    def bestand_abfrage(cls):
+        return cls.objects.values("thema_id", "kapitel_id", "schwierigkeit").annotate(cnt=models.Count("id"))
+
+    @classmethod
+    def bestand(cls):
+        """
+        Anzahl Aufgaben je (thema_id, kapitel_id, schwierigkeit) für die Startseite.
+        Liegt im gemeinsamen Cache und wird bei neuen, gelöschten und umsortierten
+        Aufgaben verworfen (Signale unten, Import); BESTAND_TIMEOUT als Rückfallebene.
+        """
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        bestand = cache.get(BESTAND_KEY)
+        if bestand is None:
+            bestand = {
+                (r["thema_id"], r["kapitel_id"], r["schwierigkeit"]): r["cnt"] for r in cls.bestand_abfrage()
+            }
+            cache.set(BESTAND_KEY, bestand, BESTAND_TIMEOUT)
+        return bestand
+
     def naechste_lfd_nr(self):
         thema = self.kapitel.thema
         prefix = thema.kurz   # z.B. "E", "O", "W"
@@ -136,6 +190,14 @@ class Aufgabe(models.Model):
         num = int(letzte.lfd_nr[1:]) + 1
         return f"{prefix}{num:03d}"
 
+BESTAND_KEY = "physik:aufgaben_bestand"
+BESTAND_TIMEOUT = 60 * 60
+
+
+def verwerfe_bestand():
+    caches[settings.SESSION_CACHE_ALIAS].delete(BESTAND_KEY)
+
+
 class AufgabeOption(models.Model):
     aufgabe = models.ForeignKey(Aufgabe, on_delete=models.CASCADE, related_name="optionen")
     position = models.PositiveSmallIntegerField("Position", blank=True, null=True)
@@ -188,46 +250,326 @@ class Protokoll(models.Model):
     aufgabe = models.ForeignKey('Aufgabe', on_delete=models.CASCADE)
     fach = models.IntegerField(default=2)
     letzte_bearbeitung = models.DateTimeField(auto_now=True)
+    # Wiederholungsplan (planer.py): nächster Termin und SM-2-Leichtigkeit
+    faellig = models.DateTimeField(null=True, blank=True)
+    leichtigkeit = models.FloatField(default=2.5)
 
     class Meta:
         # Sorgt dafür, dass jeder User pro Aufgabe nur einen Lernstand hat
         unique_together = ('user', 'aufgabe')
+        indexes = [
+            # "Die nächsten fälligen Aufgaben" = Bereichs-Scan über (user, faellig)
+            models.Index(fields=["user", "faellig"], name="protokoll_user_faellig_idx"),
+            # Höhere Fächer (filter_fach) und Auswertungen pro Fach, deckend bis aufgabe_id
+            models.Index(fields=["user", "fach", "aufgabe"], name="protokoll_user_fach_idx"),
+        ]
         verbose_name = "Lernkärtchen-Protokoll"
         verbose_name_plural = "Lernkärtchen-Protokolle"
 
     def __str__(self):
         return f"{self.user.username}: {self.aufgabe.lfd_nr} -> Fach {self.fach}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Geladenes Fach merken, damit LernstandZaehler nur Wechsel verbucht
+        instance._fach_geladen = instance.__dict__.get("fach")
+        return instance
+
+class LernstandZaehler(models.Model):
+    """
+    Denormalisierte Zählerstände pro User, Kapitel, Schwierigkeit und Fach.
+    Wird bei jeder Protokoll-Änderung inkrementell fortgeschrieben (Signale unten),
+    damit die Startseite nur noch diese Tabelle lesen muss.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="lernstand_zaehler")
+    thema = models.ForeignKey(ThemenBereich, on_delete=models.CASCADE, related_name="+")
+    kapitel = models.ForeignKey(Kapitel, on_delete=models.CASCADE, related_name="+")
+    schwierigkeit = models.PositiveSmallIntegerField()
+    fach = models.IntegerField()
+    anzahl = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "kapitel", "schwierigkeit", "fach"],
+                name="uniq_lernstand_user_kapitel_stufe_fach",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["user", "thema"], name="lernstand_user_thema_idx"),
+        ]
+        verbose_name = "Lernstand-Zähler"
+        verbose_name_plural = "Lernstand-Zähler"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.kapitel_id}/{self.schwierigkeit} Fach {self.fach} = {self.anzahl}"
+
+    @classmethod
+    def verbuche(cls, user_id, aufgabe, fach, delta):
+        # Zähler um delta verschieben, fehlende Zeile bei Bedarf anlegen
+        schluessel = dict(
+            user_id=user_id,
+            kapitel_id=aufgabe.kapitel_id,
+            schwierigkeit=aufgabe.schwierigkeit,
+            fach=fach,
+        )
+        if cls.objects.filter(**schluessel).update(anzahl=models.F("anzahl") + delta) or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(thema_id=aufgabe.thema_id, anzahl=delta, **schluessel)
+        except IntegrityError:
+            # Parallel angelegt -> dann eben doch aktualisieren
+            cls.objects.filter(**schluessel).update(anzahl=models.F("anzahl") + delta)
+
+    @classmethod
+    def verbuche_id(cls, user_id, aufgabe_id, fach, delta):
+        """Wie verbuche, aber nur mit der Aufgaben-ID: Kapitel/Stufe per Unterabfrage, ohne die Aufgabe zu laden."""
+        aufgabe = Aufgabe.objects.filter(pk=aufgabe_id)
+        if cls.objects.filter(
+            user_id=user_id, fach=fach,
+            kapitel_id=models.Subquery(aufgabe.values("kapitel_id")),
+            schwierigkeit=models.Subquery(aufgabe.values("schwierigkeit")),
+        ).update(anzahl=models.F("anzahl") + delta) or delta < 0:
+            return
+        # Erste Karte dieser Gruppe: Zeile anlegen (dafür wird die Aufgabe gebraucht)
+        cls.verbuche(user_id, aufgabe.only("thema_id", "kapitel_id", "schwierigkeit").get(), fach, delta)
+
+    @classmethod
+    def ausbuchen_aufgabe(cls, aufgabe):
+        """Nimmt alle Karten einer Aufgabe aus den Zählern - eine Anweisung (vor dem Löschen)."""
+        einordnung = aufgabe.einordnung()
+        if None in einordnung:
+            einordnung = Aufgabe.objects.values_list("thema_id", "kapitel_id", "schwierigkeit").get(pk=aufgabe.pk)
+        _, kapitel_id, schwierigkeit = einordnung
+        cls.objects.filter(
+            models.Exists(Protokoll.objects.filter(
+                aufgabe_id=aufgabe.pk, user_id=models.OuterRef("user_id"), fach=models.OuterRef("fach"),
+            )),
+            kapitel_id=kapitel_id, schwierigkeit=schwierigkeit,
+        ).update(anzahl=models.F("anzahl") - 1)
+
+    @classmethod
+    def umbuchen(cls, aufgabe, alt):
+        """
+        Zieht die Zähler einer Aufgabe von ihrer alten Einordnung
+        (thema_id, kapitel_id, schwierigkeit) zur aktuellen um - je (User, Fach) ein Schritt.
+        """
+        _, kapitel_id, schwierigkeit = alt
+        gruppen = (
+            Protokoll.objects.filter(aufgabe=aufgabe).order_by()
+            .values_list("user_id", "fach").annotate(cnt=models.Count("id"))
+        )
+        with transaction.atomic():
+            for user_id, fach, cnt in gruppen:
+                cls.objects.filter(
+                    user_id=user_id, kapitel_id=kapitel_id, schwierigkeit=schwierigkeit, fach=fach
+                ).update(anzahl=models.F("anzahl") - cnt)
+                cls.verbuche(user_id, aufgabe, fach, cnt)
+
+    @classmethod
+    def neu_aufbauen(cls, user=None):
+        """Baut die Zähler komplett aus dem Protokoll neu auf (z.B. nach Massen-Updates)."""
+        protokolle = Protokoll.objects.all()
+        alte = cls.objects.all()
+        if user is not None:
+            protokolle = protokolle.filter(user=user)
+            alte = alte.filter(user=user)
+
+        gruppen = (
+            protokolle
+            .values("user_id", "aufgabe__thema_id", "aufgabe__kapitel_id", "aufgabe__schwierigkeit", "fach")
+            .annotate(cnt=models.Count("id"))
+        )
+        neue = [
+            cls(
+                user_id=g["user_id"],
+                thema_id=g["aufgabe__thema_id"],
+                kapitel_id=g["aufgabe__kapitel_id"],
+                schwierigkeit=g["aufgabe__schwierigkeit"],
+                fach=g["fach"],
+                anzahl=g["cnt"],
+            )
+            for g in gruppen
+        ]
+        with transaction.atomic():
+            alte.delete()
+            cls.objects.bulk_create(neue, batch_size=500)
+        return len(neue)
+
+class NormierteAntwortField(models.TextField):
+    """
+    Gespeicherte Fassung von eingegebene_antwort für die Gruppierung: casefold() und
+    ohne Rand-Leerzeichen. In Python berechnet, weil SQLites LOWER nur ASCII faltet
+    ("WÄRME" != "wärme"). pre_save greift bei save() und bulk_create, nicht bei update().
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("editable", False)
+        kwargs.setdefault("default", "")
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        wert = (model_instance.eingegebene_antwort or "").casefold().strip()
+        setattr(model_instance, self.attname, wert)
+        return wert
+
+
 class FehlerLog(models.Model):
     aufgabe = models.ForeignKey(Aufgabe, on_delete=models.CASCADE, related_name="fehler_logs")
     eingegebene_antwort = models.TextField()
     zeitpunkt = models.DateTimeField(auto_now_add=True)
+    # Grundlage der Gruppierung (fehleranalyse.py), auch bei bulk_create gefüllt
+    antwort_norm = NormierteAntwortField()
 
     class Meta:
         ordering = ['-zeitpunkt']
+        indexes = [
+            # Neueste Fehler (Standard-Sortierung) und Fehler einer Aufgabe nach Zeit
+            models.Index(fields=["zeitpunkt"], name="fehlerlog_zeit_idx"),
+            models.Index(fields=["aufgabe", "zeitpunkt"], name="fehlerlog_aufgabe_zeit_idx"),
+            # Gruppierte Fehler-Analyse: (Aufgabe, Antwort) direkt aus dem Index zählen
+            models.Index(fields=["aufgabe", "antwort_norm", "zeitpunkt"], name="fehlerlog_gruppe_idx"),
+        ]
+
 
+class FehlerSumme(models.Model):
+    """
+    Verdichtete FehlerLog-Einträge: pro Aufgabe und (normalisierter) Antwort ein Zähler.
+    Alte Roh-Einträge werden per 'manage.py fehler_verdichten' hierher übertragen
+    und gelöscht, die Tabelle wächst also nur mit den verschiedenen Fehlern.
+    """
+    aufgabe = models.ForeignKey(Aufgabe, on_delete=models.CASCADE, related_name="fehler_summen")
+    antwort_hash = models.CharField(max_length=64)
+    antwort = models.TextField()
+    anzahl = models.PositiveIntegerField(default=0)
+    erster = models.DateTimeField()
+    letzter = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["aufgabe", "antwort_hash"], name="uniq_fehlersumme_aufgabe_antwort"),
+        ]
+        verbose_name = "Fehler-Summe"
+        verbose_name_plural = "Fehler-Summen"
+
+    def __str__(self):
+        return f"{self.aufgabe_id}: \"{self.antwort}\" x{self.anzahl}"
+
+
+
+# Antwortschlüssel-Cache (bewertung.py) bei Änderungen verwerfen
+@receiver([post_save, post_delete], sender=Aufgabe)
+def verwerfe_schluessel_aufgabe(sender, instance, **kwargs):
+    verwerfe_schluessel(instance.pk)
+
+@receiver([post_save, post_delete], sender=AufgabeOption)
+def verwerfe_schluessel_option(sender, instance, **kwargs):
+    verwerfe_schluessel(instance.aufgabe_id)
+    # Optionen gehören zur Import-Prüfsumme der Aufgabe
+    Aufgabe.objects.filter(pk=instance.aufgabe_id).exclude(inhalt_hash="").update(inhalt_hash="")
+
+@receiver([post_save, post_delete], sender=AufgabeBild)
+def verwerfe_schluessel_bild(sender, instance, **kwargs):
+    # Das erste Bild ist bei Typ p die richtige Antwort
+    verwerfe_schluessel(instance.aufgabe_id)
+
+
+# Neue, gelöschte oder umsortierte Aufgaben: Startseiten-Bestand und Lernstand-Zähler nachziehen
+@receiver(pre_save, sender=Aufgabe)
+def merke_einordnung(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    alt = getattr(instance, "_einordnung_geladen", None)
+    if alt is None or None in alt:
+        # Nicht (vollständig) geladen - dann den Stand in der Datenbank fragen
+        alt = Aufgabe.objects.filter(pk=instance.pk).values_list("thema_id", "kapitel_id", "schwierigkeit").first()
+    instance._einordnung_geladen = alt
+
+@receiver(post_save, sender=Aufgabe)
+def ziehe_einordnung_nach(sender, instance, created, **kwargs):
+    alt = getattr(instance, "_einordnung_geladen", None)
+    neu = instance.einordnung()
+    if created or alt is None:
+        verwerfe_bestand()
+    elif alt != neu:
+        verwerfe_bestand()
+        LernstandZaehler.umbuchen(instance, alt)
+    instance._einordnung_geladen = neu
+
+@receiver(post_delete, sender=Aufgabe)
+def verwerfe_bestand_aufgabe(sender, instance, **kwargs):
+    verwerfe_bestand()
+
+
+def _geloescht_als(origin, model):
+    # Wurde direkt (Instanz oder QuerySet dieses Modells) gelöscht, nicht per Kaskade?
+    return origin is None or isinstance(origin, model) or getattr(origin, "model", None) is model
+
+
+# Lernstand-Zähler bei jedem Fachwechsel fortschreiben (nur über die IDs, ohne die Aufgabe zu laden)
+@receiver(post_save, sender=Protokoll)
+def verbuche_lernstand(sender, instance, created, **kwargs):
+    alt = None if created else getattr(instance, "_fach_geladen", None)
+    if alt == instance.fach and not created:
+        return
+    if alt is not None:
+        LernstandZaehler.verbuche_id(instance.user_id, instance.aufgabe_id, alt, -1)
+    LernstandZaehler.verbuche_id(instance.user_id, instance.aufgabe_id, instance.fach, 1)
+    instance._fach_geladen = instance.fach
+
+@receiver(post_delete, sender=Protokoll)
+def entferne_lernstand(sender, instance, origin=None, **kwargs):
+    # Kaskaden nicht pro Zeile: Aufgabe -> ausbuche_aufgabe (pre_delete, eine Anweisung);
+    # User/Thema/Kapitel -> deren Zähler-Zeilen werden ohnehin mitgelöscht
+    if not _geloescht_als(origin, Protokoll):
+        return
+    fach = getattr(instance, "_fach_geladen", instance.fach)
+    LernstandZaehler.verbuche_id(instance.user_id, instance.aufgabe_id, fach, -1)
+
+@receiver(pre_delete, sender=Aufgabe)
+def ausbuche_aufgabe(sender, instance, origin=None, **kwargs):
+    if _geloescht_als(origin, Aufgabe):
+        LernstandZaehler.ausbuchen_aufgabe(instance)
+
+
+# SQLite-Profil (WAL, busy_timeout, ...) auf jede neue Verbindung anwenden
+@receiver(connection_created)
+def sqlite_pragmas(sender, connection, **kwargs):
+    setze_pragmas(connection)
+
+
+class Benachrichtigung(models.Model):
+    """
+    Outbox für Info-Mails über neue/geänderte Aufgaben.
+    Der post_save-Handler schreibt nur hierher; versendet wird gesammelt
+    per 'manage.py benachrichtigungen_senden' (siehe benachrichtigung.py).
+    """
+    aufgabe = models.ForeignKey(Aufgabe, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    lfd_nr = models.CharField(max_length=10)
+    neu = models.BooleanField(default=False)
+    zeitpunkt = models.DateTimeField(auto_now_add=True)
+    versendet = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["zeitpunkt"]
+        indexes = [
+            models.Index(fields=["versendet", "zeitpunkt"], name="benachrichtigung_offen_idx"),
+        ]
+        verbose_name = "Benachrichtigung"
+        verbose_name_plural = "Benachrichtigungen"
+
+    def __str__(self):
+        status = "NEU ERSTELLT" if self.neu else "GEÄNDERT"
+        return f"{self.lfd_nr} {status}"
+
+    @classmethod
+    def vormerken(cls, aufgabe, neu=False):
+        return cls.objects.create(aufgabe_id=aufgabe.pk, lfd_nr=getattr(aufgabe, "lfd_nr", "") or "Unbekannt", neu=neu)
 
 
 @receiver(post_save, sender=Aufgabe) 
 def benachrichtige_mich(sender, instance, created, **kwargs):
-    status = "NEU ERSTELLT" if created else "GEÄNDERT"
-    
-    # Wir holen uns die lfd_nr von der Instanz
-    # Falls lfd_nr mal leer sein sollte, nutzen wir .get oder einen Fallback
-    nummer = getattr(instance, 'lfd_nr', 'Unbekannt')
-
-    betreff = f"PT-Info: Aufgabe Nr. {nummer} {status}"
-    
-    nachricht = f"Die Aufgabe mit der laufenden Nummer {nummer} wurde {status.lower()}.\n\n"
-    # Der Link braucht für Django intern meist trotzdem die ID (instance.id), 
-    # da die Admin-URLs auf der Primärschlüssel-ID basieren.
-    nachricht += f"Link zur Aufgabe: https://physiktrainer.app/admin/physik/aufgabe/{instance.id}/change/"
-    empfaenger = ['info@physiktrainer.app'] 
-
-    send_mail(
-        betreff,
-        nachricht,
-        'info@physiktrainer.app', # Hier jetzt die Artfiles-Adresse
-        ['info@physiktrainer.app'],
-        fail_silently=False, 
-    )
\ No newline at end of file
+    # Kein SMTP im Request: nur in die Outbox schreiben, Versand gesammelt im Hintergrund
+    Benachrichtigung.vormerken(instance, neu=created)
@@ -0,0 +1,95 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import connections
+
+from .aufgabendaten import lade_aufgaben
+from .bewertung import bewerte
+from .models import FehlerLog
+
+# ===========================================================
+# NACHBEWERTUNG
+# Bewertet gespeicherte Fehler-Eingaben (FehlerLog) mit dem aktuellen
+# Stand der Aufgaben neu, z.B. nach einer Änderung in fehler_edit.
+# Die Daten werden vorab im Hauptprozess geladen; die Worker bewerten
+# nur noch im Speicher (keine Datenbank, kein Request, keine Session).
+# ===========================================================
+
+# Bei diesen Typen fehlt im FehlerLog die nötige Information:
+# r = gewürfelte Variante, p = gewähltes Bild
+NICHT_NACHBEWERTBAR = ("r", "p")
+
+
+class Umschlag:
+    """Ein Log-Eintrag, der mit dem aktuellen Stand als richtig gilt."""
+
+    def __init__(self, log_id, aufgabe_id, lfd_nr, antwort, hinweis):
+        self.log_id = log_id
+        self.aufgabe_id = aufgabe_id
+        self.lfd_nr = lfd_nr
+        self.antwort = antwort
+        self.hinweis = hinweis
+
+
+def _worker_start():
+    # Bei 'spawn' (Windows/macOS) ist Django im Kindprozess noch nicht geladen
+    django.setup()
+
+
+def bewerte_paket(paket):
+    """Worker: (AufgabenDaten, [(log_id, antwort), ...]) -> (Anzahl, [Umschlag, ...])"""
+    aufgabe, eintraege = paket
+    umschlaege = []
+    for log_id, antwort in eintraege:
+        ergebnis = bewerte(aufgabe, antwort)
+        if ergebnis.richtig:
+            umschlaege.append(Umschlag(log_id, aufgabe.id, aufgabe.lfd_nr, antwort, ergebnis.hinweis))
+    return len(eintraege), umschlaege
+
+
+def lade_pakete(aufgabe_ids=None):
+    """Ein Paket pro Aufgabe; liefert (pakete, übersprungene Aufgaben)."""
+    logs = FehlerLog.objects.order_by("aufgabe_id", "id")
+    if aufgabe_ids is not None:
+        logs = logs.filter(aufgabe_id__in=aufgabe_ids)
+
+    pro_aufgabe = defaultdict(list)
+    for log_id, aufgabe_id, antwort in logs.values_list("id", "aufgabe_id", "eingegebene_antwort").iterator():
+        pro_aufgabe[aufgabe_id].append((log_id, antwort))
+
+    pakete, uebersprungen = [], []
+    for aufgabe in lade_aufgaben(list(pro_aufgabe)):
+        if aufgabe.typ.strip() in NICHT_NACHBEWERTBAR:
+            uebersprungen.append(aufgabe)
+        else:
+            pakete.append((aufgabe, pro_aufgabe[aufgabe.id]))
+    return pakete, uebersprungen
+
+
+def nachbewerten(aufgabe_ids=None, prozesse=None):
+    """
+    Bewertet alle (oder die angegebenen) Fehler-Logs neu.
+    Liefert ein dict mit geprueft, umschlaege (Liste von Umschlag) und uebersprungen.
+    prozesse=1 bewertet ohne Prozess-Pool im aktuellen Prozess.
+    """
+    pakete, uebersprungen = lade_pakete(aufgabe_ids)
+    prozesse = prozesse or os.cpu_count() or 1
+    prozesse = min(prozesse, len(pakete)) or 1
+
+    if prozesse == 1:
+        ergebnisse = map(bewerte_paket, pakete)
+    else:
+        # Die Worker greifen nicht auf die Datenbank zu (Pakete sind vorab geladen).
+        # Offene Verbindungen vorher schließen: per fork geerbte SQLite-Handles
+        # dürfen im Kindprozess nicht weiterbenutzt werden.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=prozesse, initializer=_worker_start) as pool:
+            ergebnisse = list(pool.map(bewerte_paket, pakete, chunksize=max(1, len(pakete) // (prozesse * 4))))
+
+    geprueft, umschlaege = 0, []
+    for anzahl, treffer in ergebnisse:
+        geprueft += anzahl
+        umschlaege.extend(treffer)
+    return {"geprueft": geprueft, "umschlaege": umschlaege, "uebersprungen": uebersprungen}
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Protokoll
+from .serie import SERIEN_LAENGE, aufgaben_bereich
+
+# ===========================================================
+# WIEDERHOLUNGSPLAN
+# Jeder Protokoll-Eintrag bekommt einen Fälligkeitstermin:
+#   faellig = jetzt + INTERVALLE[fach] * leichtigkeit / START_LEICHTIGKEIT
+# Die Leichtigkeit folgt SM-2 (q = 5 bei richtig, q = 2 bei falsch) und
+# lässt sich mit PHYSIK_PLANER_SM2 = False abschalten (reine Leitner-Intervalle).
+# Über den Index (user, faellig) sind "die nächsten fälligen Aufgaben"
+# ein Bereichs-Scan statt eines Filters über alle Protokolle des Users.
+# ===========================================================
+
+INTERVALLE = {
+    1: timedelta(0),           # falsch beantwortet: sofort wieder fällig
+    2: timedelta(days=1),
+    3: timedelta(days=3),
+    4: timedelta(days=10),
+}
+START_LEICHTIGKEIT = 2.5
+MIN_LEICHTIGKEIT = 1.3
+MAX_LEICHTIGKEIT = 3.0
+
+
+def neue_leichtigkeit(alt, richtig):
+    """SM-2: EF' = EF + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02)), begrenzt."""
+    q = 5 if richtig else 2
+    neu = (alt or START_LEICHTIGKEIT) + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+    return round(min(max(neu, MIN_LEICHTIGKEIT), MAX_LEICHTIGKEIT), 2)
+
+
+def faellig_am(fach, leichtigkeit=START_LEICHTIGKEIT, jetzt=None):
+    jetzt = jetzt or timezone.now()
+    intervall = INTERVALLE.get(fach, INTERVALLE[max(INTERVALLE)])
+    if settings.PHYSIK_PLANER_SM2:
+        intervall *= leichtigkeit / START_LEICHTIGKEIT
+    return jetzt + intervall
+
+
+def faellige_abfrage(user, thema, bis_kap_zeile=None, start_kap=0, end_kap=999,
+                     level_param="3", jetzt=None, anzahl=SERIEN_LAENGE):
+    """Die Abfrage hinter faellige_serie (auch für 'manage.py abfrageplan')."""
+    bereich = aufgaben_bereich(thema, bis_kap_zeile, start_kap, end_kap, level_param)
+    return (
+        Protokoll.objects
+        .filter(user=user, faellig__lte=jetzt or timezone.now(), aufgabe__in=bereich.values("id"))
+        .order_by("faellig")
+        .values_list("aufgabe_id", flat=True)[:anzahl]
+    )
+
+
+def faellige_serie(user, thema, **bereich):
+    """Die `anzahl` am längsten fälligen Aufgaben im Bereich, älteste zuerst."""
+    return list(faellige_abfrage(user, thema, **bereich))
@@ -0,0 +1,204 @@
+import random
+from typing import NamedTuple
+
+from django.contrib import messages
+from django.utils.html import escape
+
+from . import lernfortschritt
+from .antwortschluessel import hole_schluessel
+from .bewertung import bewerte
+from .models import ThemenBereich
+from .planer import faellige_serie
+from .serie import waehle_serie
+
+# ===========================================================
+# QUIZ-ABLAUF
+# Anzeige einer Aufgabe vorbereiten und eine Antwort verarbeiten.
+# Gemeinsam genutzt von der HTML-Seite (views.aufgaben) und der
+# JSON-Schnittstelle (api.py); der Zustand steckt im SerienStand.
+# ===========================================================
+
+def serie_aus_parametern(user, params):
+    """
+    Neue Serie aus den Start-Parametern (tb, level, bis_kap, start, end, fach).
+    Mit faellig=1 kommen statt einer Zufallsauswahl die fälligen Wiederholungen.
+    """
+    thema = ThemenBereich.objects.get(id=params.get("tb"))
+    bereich = dict(
+        bis_kap_zeile=params.get("bis_kap"),
+        start_kap=int(params.get("start", 0)),
+        end_kap=int(params.get("end", 999)),
+        level_param=params.get("level", "3"),
+    )
+    if params.get("faellig"):
+        return faellige_serie(user, thema, **bereich)
+    return waehle_serie(user, thema, fach_int=int(params.get("fach", 1)), **bereich)
+
+
+class Anzeige(NamedTuple):
+    aufgabe: object           # AufgabenDaten, bei Typ r mit ausgefüllter Frage
+    auswahl_optionen: list    # Typ a: gemischte (Index, Text)-Paare, 0 = richtig
+    bilder: list              # Medien (bei Typ p gemischt), leer wenn keine
+    anmerkung: str
+    variante: object          # Typ r: gewürfelter Index, sonst wie übergeben
+
+
+class Antwort(NamedTuple):
+    art: str                  # uebersprungen | richtig | ungueltig | falsch
+    hinweis: str
+
+    @property
+    def weiter(self):
+        return self.art in ("uebersprungen", "richtig")
+
+
+def bereite_anzeige(aufgabe, variante=None):
+    """Mischt Bilder/Optionen und würfelt bei Typ r die Variante, falls keine (passende) vorliegt."""
+    anmerkung = ""
+
+    # -------- Medien (Bilder & Videos) --------
+    # Bilder/Videos liegen schon sortiert in den Aufgaben-Daten
+    bilder = list(aufgabe.bilder)
+    if bilder and "p" in aufgabe.typ:
+        # Echte Bildfrage: Die richtige Bild-Antwort (erstes Bild) kennt der Antwortschlüssel.
+        # Bilder mischen, damit das richtige nicht immer an Platz 1 steht.
+        # Illustrationen und Videos bleiben in ihrer Reihenfolge.
+        random.shuffle(bilder)
+
+    optionen_liste = []
+    if "r" in aufgabe.typ and aufgabe.optionen:
+        optionen = aufgabe.optionen
+
+        # Anzahl der Werte aus der ersten Option ermitteln
+        anzahl_werte = len(optionen[0].text.split(';'))
+
+        # Index aus dem Serien-Stand, damit er stabil bleibt; sonst neu würfeln
+        idx = variante
+        if idx is None or idx >= anzahl_werte:
+            idx = variante = random.randrange(anzahl_werte)
+
+        # Von jeder Option den Wert an der Stelle 'idx' (Fallback, falls eine Liste kürzer ist)
+        auswahl_liste = []
+        for opt in optionen:
+            werte = [v.strip() for v in opt.text.split(';')]
+            auswahl_liste.append(werte[idx] if idx < len(werte) else "???")
+
+        # {0}, {1}, ... im Fragetext ersetzen (AufgabenDaten ist unveränderlich -> Kopie)
+        try:
+            aufgabe = aufgabe._replace(frage=aufgabe.frage.format(*auswahl_liste))
+        except (IndexError, TypeError):
+            # Falls die Anzahl der {} im Text nicht zur Anzahl der Optionen passt
+            pass
+
+    if "a" in aufgabe.typ:
+        # Index 0 ist immer die richtige Antwort
+        optionen_liste = [(0, aufgabe.loesung)]
+        for i, o in enumerate(aufgabe.optionen, start=1):
+            optionen_liste.append((i, o.text))
+        random.shuffle(optionen_liste)
+
+    # Spezialfall: Überschreibe für Typ 'e'
+    elif "e" in (aufgabe.typ or "").lower():
+        anmerkung = "Bitte beide Begriffe mit ';' oder '...' trennen."
+
+    return Anzeige(aufgabe, optionen_liste, bilder, anmerkung, variante)
+
+
+def verarbeite_antwort(stand, aufgabe, antwort, bild_antwort=None):
+    """
+    Bewertet die Eingabe und schreibt den SerienStand fort.
+    aufgabe: AufgabenDaten oder direkt der (gecachte) Antwortschlüssel.
+    """
+    # ---- Skip ----
+    if not antwort and not bild_antwort:
+        hinweis = "" if stand.warte_auf_weiter else "Letzte Aufgabe übersprungen."
+        stand.weiter()
+        return Antwort("uebersprungen", hinweis)
+
+    schluessel = hole_schluessel(aufgabe)
+    ergebnis = bewerte(schluessel, antwort, variante=stand.aktiver_index or 0, bild_antwort=bild_antwort)
+
+    if ergebnis.richtig:
+        stand.weiter()
+        return Antwort("richtig", ergebnis.hinweis)
+
+    if ergebnis.ungueltig:
+        stand.warte_auf_weiter = False
+        stand.letzte_antwort = ""
+        return Antwort("ungueltig", ergebnis.hinweis)
+
+    # ---- falsch ----
+    hinweis_text = ergebnis.hinweis
+
+    # Wir hängen den Standard-Text NICHT an bei:
+    # 'p' (Bilder) und 'a' (Listen/Auswahl), weil diese eigene Formate haben.
+    if schluessel.typ_roh not in ["p", "a", "r"]:
+        hinweis_text = (
+            f"{hinweis_text} "
+            f"Deine Eingabe: »{escape(antwort)}« | "
+            f"Richtige Lösung: »{schluessel.loesung}«"
+        )
+
+    # Die Begründung/Erklärung anhängen (<br>, weil der Hinweis als HTML angezeigt wird)
+    if schluessel.erklaerung and schluessel.erklaerung not in hinweis_text:
+        hinweis_text += f"<br><br><strong>Begründung:</strong> {schluessel.erklaerung}"
+
+    stand.warte_auf_weiter = True
+    stand.letzte_antwort = antwort
+    return Antwort("falsch", hinweis_text)
+
+
+def verbuche(user, aufgabe_id, antwort, eingabe, stand):
+    """Leitner-Fortschritt vormerken; am Ende der Serie gebündelt schreiben."""
+    if antwort.art in ("richtig", "falsch"):
+        lernfortschritt.merke(user.pk, aufgabe_id, antwort.art == "richtig", eingabe)
+    if stand.beendet:
+        lernfortschritt.schreibe(user.pk)
+
+
+MELDUNG = {
+    "uebersprungen": messages.INFO,
+    "richtig": messages.SUCCESS,
+    "ungueltig": messages.WARNING,
+    "falsch": messages.WARNING,
+}
+
+def melde(request, antwort):
+    # Rückmeldung für die nächste HTML-Seite
+    if antwort.hinweis:
+        messages.add_message(request, MELDUNG[antwort.art], antwort.hinweis)
+
+
+def braucht_seite(anzeige):
+    """Auswahl, Bildfragen und Medien rendert nur die HTML-Seite."""
+    return bool(anzeige.bilder) or "a" in anzeige.aufgabe.typ
+
+
+def anzeige_als_json(anzeige):
+    a = anzeige.aufgabe
+    return {
+        "id": a.id,
+        "lfd_nr": a.lfd_nr,
+        "typ": a.typ,
+        "kapitel": a.kapitel,
+        "frage": a.frage,
+        "zeichen": a.zeichen,
+        "einheit": a.einheit,
+        "anmerkung": anzeige.anmerkung,
+        "hilfe": a.hilfe if a.hilfe not in (None, "", "0", 0) else "",
+        "loesung": a.loesung,
+        "erklaerung": a.erklaerung,
+        "optionen": [{"index": i, "text": t} for i, t in anzeige.auswahl_optionen],
+        "bilder": [{"id": b.id, "bild_url": b.bild_url, "video_url": b.video_url} for b in anzeige.bilder],
+        "variante": anzeige.variante,
+        "nur_seite": braucht_seite(anzeige),
+    }
+
+
+def stand_als_json(stand):
+    return {
+        "fragenummer": stand.index + 1,
+        "anzahl": len(stand.aufgaben_ids),
+        "warte_auf_weiter": stand.warte_auf_weiter,
+        "beendet": stand.beendet,
+    }
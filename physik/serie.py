@@ -0,0 +1,67 @@
+from django.db.models import Exists, OuterRef
+
+from .models import Aufgabe, Protokoll
+
+# ===========================================================
+# SERIEN-AUSWAHL
+# Eine Abfrage: Bereichs-/Level-Filter + Unterabfrage auf das Protokoll,
+# die Zufallsauswahl passiert direkt in der Datenbank.
+# ===========================================================
+
+SERIEN_LAENGE = 10
+
+def aufgaben_bereich(thema, bis_kap_zeile=None, start_kap=0, end_kap=999, level_param="3"):
+    """Aufgaben eines Themas im gewählten Kapitel-Bereich und Level."""
+    aufgaben_qs = Aufgabe.objects.filter(thema=thema)
+
+    # Fall A: Das Thema ist als "kapitel_unabhaengig" markiert (z.B. Sonstige)
+    if thema.kapitel_unabhaengig:
+        if bis_kap_zeile:
+            # Nur EXAKT dieses Kapitel (keine kumulative Summe)
+            aufgaben_qs = aufgaben_qs.filter(kapitel__zeile=int(bis_kap_zeile))
+        else:
+            aufgaben_qs = aufgaben_qs.filter(kapitel__zeile__gte=start_kap, kapitel__zeile__lte=end_kap)
+
+    # Fall B: Normales Verhalten (Physik-Themen: Aufbauend/Kumulativ)
+    else:
+        if bis_kap_zeile:
+            # Weg über die Index-Tabelle (kumulativ: alle bis hierhin)
+            aufgaben_qs = aufgaben_qs.filter(kapitel__zeile__lte=int(bis_kap_zeile))
+        else:
+            # Klassischer Weg über das Overlay (Bereich)
+            aufgaben_qs = aufgaben_qs.filter(kapitel__zeile__gte=start_kap, kapitel__zeile__lte=end_kap)
+
+    # Level-Logik (kumuliert für 1,2 etc.)
+    if isinstance(level_param, str) and "," in level_param:
+        levels = [int(l) for l in level_param.split(",")]
+        aufgaben_qs = aufgaben_qs.filter(schwierigkeit__in=levels)
+    else:
+        aufgaben_qs = aufgaben_qs.filter(schwierigkeit__lte=int(level_param))
+
+    return aufgaben_qs
+
+def filter_fach(aufgaben_qs, user, fach_int):
+    """
+    Fach 1: Aufgaben ohne Protokoll-Eintrag oder explizit in Fach 1.
+    Sonst: exakt das Fach 2, 3 oder 4.
+    Pro (user, aufgabe) gibt es höchstens einen Eintrag, daher reicht ein NOT EXISTS
+    bzw. eine IN-Unterabfrage - kein Join, kein DISTINCT.
+    """
+    if fach_int == 1:
+        eintraege = Protokoll.objects.filter(user=user, aufgabe=OuterRef("pk"))
+        return aufgaben_qs.filter(~Exists(eintraege.exclude(fach=1)))
+    # Höhere Fächer sind klein: von den Protokoll-Zeilen des Users aus suchen
+    return aufgaben_qs.filter(
+        pk__in=Protokoll.objects.filter(user=user, fach=fach_int).values("aufgabe_id")
+    )
+
+def serie_abfrage(user, thema, bis_kap_zeile=None, start_kap=0, end_kap=999,
+                  level_param="3", fach_int=1, anzahl=SERIEN_LAENGE):
+    """Die Abfrage hinter waehle_serie (auch für 'manage.py abfrageplan')."""
+    aufgaben_qs = aufgaben_bereich(thema, bis_kap_zeile, start_kap, end_kap, level_param)
+    aufgaben_qs = filter_fach(aufgaben_qs, user, fach_int)
+    return aufgaben_qs.order_by("?").values_list("id", flat=True)[:anzahl]
+
+def waehle_serie(user, thema, **bereich):
+    """Liefert bis zu `anzahl` zufällige Aufgaben-IDs für eine neue Serie."""
+    return list(serie_abfrage(user, thema, **bereich))
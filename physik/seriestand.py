@@ -0,0 +1,107 @@
+import base64
+import struct
+
+# ===========================================================
+# SERIEN-STAND
+# Der Zustand einer laufenden Serie (IDs, Position, Flags) steckt kompakt
+# gepackt in einem signierten Cookie statt in mehreren Session-Schlüsseln.
+# So schreibt ein Klick im Quiz keine Zeile in django_session mehr.
+#
+# Format (Version 1, little endian):
+#   B version | B flags | H index | h aktiver_index (-1 = keiner) | H anzahl
+#   anzahl x Q aufgaben_ids | Rest: letzte_antwort (UTF-8)
+# ===========================================================
+
+COOKIE_NAME = "pt_serie"
+COOKIE_SALT = "physik.seriestand"
+
+VERSION = 1
+KOPF = struct.Struct("<BBHhH")
+
+FLAG_WARTE_AUF_WEITER = 1
+
+# Lange Eingaben nicht in den Cookie schreiben (max. 4 KB pro Cookie)
+MAX_ANTWORT_BYTES = 1000
+
+
+class SerienStand:
+
+    def __init__(self, aufgaben_ids=(), index=0, warte_auf_weiter=False, aktiver_index=None, letzte_antwort=""):
+        self.aufgaben_ids = list(aufgaben_ids)
+        self.index = index
+        self.warte_auf_weiter = warte_auf_weiter
+        self.aktiver_index = aktiver_index
+        self.letzte_antwort = letzte_antwort or ""
+
+    # ---------- Ablauf ----------
+
+    @property
+    def beendet(self):
+        return self.index >= len(self.aufgaben_ids)
+
+    @property
+    def aktuelle_id(self):
+        return None if self.beendet else self.aufgaben_ids[self.index]
+
+    def weiter(self):
+        # Nächste Aufgabe: Variante, Warte-Flag und letzte Eingabe zurücksetzen
+        self.index += 1
+        self.aktiver_index = None
+        self.warte_auf_weiter = False
+        self.letzte_antwort = ""
+
+    # ---------- Packen / Entpacken ----------
+
+    def packe(self):
+        flags = FLAG_WARTE_AUF_WEITER if self.warte_auf_weiter else 0
+        aktiv = -1 if self.aktiver_index is None else self.aktiver_index
+        roh = KOPF.pack(VERSION, flags, self.index, aktiv, len(self.aufgaben_ids))
+        roh += struct.pack(f"<{len(self.aufgaben_ids)}Q", *self.aufgaben_ids)
+        roh += self.letzte_antwort.encode("utf-8")[:MAX_ANTWORT_BYTES]
+        return base64.urlsafe_b64encode(roh).decode("ascii")
+
+    @classmethod
+    def entpacke(cls, text):
+        """Gibt None zurück, wenn der Text unlesbar ist oder eine andere Version hat."""
+        try:
+            roh = base64.urlsafe_b64decode(text.encode("ascii"))
+            version, flags, index, aktiv, anzahl = KOPF.unpack_from(roh)
+            if version != VERSION:
+                return None
+            ids = struct.unpack_from(f"<{anzahl}Q", roh, KOPF.size)
+            rest = roh[KOPF.size + 8 * anzahl:]
+            antwort = rest.decode("utf-8", errors="ignore")
+        except (ValueError, struct.error, UnicodeEncodeError):
+            return None
+        return cls(
+            aufgaben_ids=ids,
+            index=index,
+            warte_auf_weiter=bool(flags & FLAG_WARTE_AUF_WEITER),
+            aktiver_index=None if aktiv < 0 else aktiv,
+            letzte_antwort=antwort,
+        )
+
+    # ---------- Cookie ----------
+
+    @classmethod
+    def aus_request(cls, request):
+        """Aktueller Stand oder eine leere (beendete) Serie."""
+        wert = request.get_signed_cookie(COOKIE_NAME, default=None, salt=COOKIE_SALT)
+        stand = cls.entpacke(wert) if wert else None
+        return stand or cls()
+
+    def speichere(self, request, response):
+        response.set_signed_cookie(
+            COOKIE_NAME,
+            self.packe(),
+            salt=COOKIE_SALT,
+            secure=request.is_secure(),
+            httponly=True,
+            samesite="Lax",
+        )
+        return response
+
+    @staticmethod
+    def loesche(response):
+        response.delete_cookie(COOKIE_NAME, samesite="Lax")
+        return response
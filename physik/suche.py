@@ -0,0 +1,176 @@
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# ===========================================================
+# VOLLTEXTSUCHE (Mitarbeiter: Bestandsliste, Fehler-Analyse)
+# SQLite FTS5 mit Trigramm-Tokenizer (Migration 0037, per Trigger aktuell):
+#   physik_aufgabe_fts  - lfd_nr, Frage, Lösung, Optionen, Erklärung, Hilfe
+#   physik_fehlerlog_fts - eingegebene Antworten
+# Trigramme verhalten sich wie icontains (Teilwort, ohne Groß/Klein),
+# brauchen aber mindestens 3 Zeichen. Kürzere Suchbegriffe und andere
+# Datenbanken fallen auf icontains zurück.
+# ===========================================================
+
+MIN_LAENGE = 3
+
+# bm25-Gewichte in Spaltenreihenfolge: Treffer in der Nummer zählen am meisten
+GEWICHTE = (10.0, 5.0, 2.0, 1.0, 1.0, 1.0)
+
+
+# Trigger, die den Index aktuell halten (Stand Migration 0037/0038). Baut SQLite eine
+# der Tabellen neu auf (manche Migrationen), gehen sie verloren und der Index
+# veraltet still -> 'manage.py abfrageplan' meldet das, 'manage.py suchindex --neu' repariert.
+_AUFGABE_ZEILE = """
+    DELETE FROM physik_aufgabe_fts WHERE rowid = {id};
+    INSERT INTO physik_aufgabe_fts(rowid, lfd_nr, frage, loesung, optionen, erklaerung, hilfe)
+        SELECT a.id, a.lfd_nr, a.frage, a.loesung,
+               (SELECT group_concat(o.text, ' ') FROM physik_aufgabeoption o WHERE o.aufgabe_id = a.id),
+               a.erklaerung, a.hilfe
+        FROM physik_aufgabe a WHERE a.id = {id};
+"""
+_FEHLER_WEG = """
+    INSERT INTO physik_fehlerlog_fts(physik_fehlerlog_fts, rowid, eingegebene_antwort)
+        VALUES ('delete', old.id, old.eingegebene_antwort);
+"""
+_FEHLER_NEU = """
+    INSERT INTO physik_fehlerlog_fts(rowid, eingegebene_antwort) VALUES (new.id, new.eingegebene_antwort);
+"""
+TRIGGER = {
+    "physik_aufgabe_fts_ai": ("AFTER INSERT ON physik_aufgabe", _AUFGABE_ZEILE.format(id="new.id")),
+    "physik_aufgabe_fts_au": ("AFTER UPDATE OF lfd_nr, frage, loesung, erklaerung, hilfe ON physik_aufgabe",
+                              _AUFGABE_ZEILE.format(id="new.id")),
+    "physik_aufgabe_fts_ad": ("AFTER DELETE ON physik_aufgabe", "DELETE FROM physik_aufgabe_fts WHERE rowid = old.id;"),
+    "physik_aufgabeoption_fts_ai": ("AFTER INSERT ON physik_aufgabeoption", _AUFGABE_ZEILE.format(id="new.aufgabe_id")),
+    "physik_aufgabeoption_fts_au": ("AFTER UPDATE OF text, aufgabe_id ON physik_aufgabeoption",
+                                    _AUFGABE_ZEILE.format(id="old.aufgabe_id") + _AUFGABE_ZEILE.format(id="new.aufgabe_id")),
+    "physik_aufgabeoption_fts_ad": ("AFTER DELETE ON physik_aufgabeoption", _AUFGABE_ZEILE.format(id="old.aufgabe_id")),
+    "physik_fehlerlog_fts_ai": ("AFTER INSERT ON physik_fehlerlog", _FEHLER_NEU),
+    "physik_fehlerlog_fts_au": ("AFTER UPDATE OF eingegebene_antwort ON physik_fehlerlog", _FEHLER_WEG + _FEHLER_NEU),
+    "physik_fehlerlog_fts_ad": ("AFTER DELETE ON physik_fehlerlog", _FEHLER_WEG),
+}
+
+
+def fehlende_trigger():
+    """Namen der Index-Trigger, die in der Datenbank fehlen (nur SQLite, sonst leer)."""
+    if connection.vendor != "sqlite":
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        vorhanden = {zeile[0] for zeile in cursor.fetchall()}
+    return [name for name in TRIGGER if name not in vorhanden]
+
+
+def baue_suchindex_neu():
+    """Legt fehlende Trigger an und füllt beide Index-Tabellen komplett neu."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for name in fehlende_trigger():
+            wann, rumpf = TRIGGER[name]
+            cursor.execute(f"CREATE TRIGGER {name} {wann} BEGIN {rumpf} END")
+        cursor.execute("DELETE FROM physik_aufgabe_fts")
+        cursor.execute(
+            "INSERT INTO physik_aufgabe_fts(rowid, lfd_nr, frage, loesung, optionen, erklaerung, hilfe)"
+            " SELECT a.id, a.lfd_nr, a.frage, a.loesung,"
+            " (SELECT group_concat(o.text, ' ') FROM physik_aufgabeoption o WHERE o.aufgabe_id = a.id),"
+            " a.erklaerung, a.hilfe FROM physik_aufgabe a"
+        )
+        cursor.execute("INSERT INTO physik_fehlerlog_fts(physik_fehlerlog_fts) VALUES ('rebuild')")
+
+
+def _ausdruck(suche):
+    """Suchbegriff als FTS5-Phrase (Anführungszeichen verdoppelt), sonst None."""
+    suche = (suche or "").strip()
+    if connection.vendor != "sqlite" or len(suche) < MIN_LAENGE:
+        return None
+    return '"' + suche.replace('"', '""') + '"'
+
+
+def _lies_cursor(wert):
+    # "<rang>~<id>", rang als repr(float) - verlustfrei
+    try:
+        rang, aufgabe_id = wert.split("~", 1)
+        return float(rang), int(aufgabe_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def blaettere_treffer(suche, thema_id=None, kapitel_id=None, nach=None, vor=None, groesse=100):
+    """
+    Eine Seite der passenden Aufgaben, beste zuerst (bm25), per Keyset auf (rang, id).
+    Liefert (ids, cursor_zurueck, cursor_weiter) oder None, wenn der Index nicht
+    greift (dann aufgaben_filter verwenden).
+    """
+    ausdruck = _ausdruck(suche)
+    if ausdruck is None:
+        return None
+    innen = [
+        f"SELECT f.rowid AS id, bm25(physik_aufgabe_fts, {', '.join(map(str, GEWICHTE))}) AS rang",
+        "FROM physik_aufgabe_fts f JOIN physik_aufgabe a ON a.id = f.rowid",
+        "WHERE physik_aufgabe_fts MATCH %s",
+    ]
+    params = [ausdruck]
+    if thema_id:
+        innen.append("AND a.thema_id = %s")
+        params.append(thema_id)
+    if kapitel_id:
+        innen.append("AND a.kapitel_id = %s")
+        params.append(kapitel_id)
+
+    marke = _lies_cursor(vor) or _lies_cursor(nach)
+    rueckwaerts = marke is not None and _lies_cursor(vor) is not None
+    vergleich, richtung = ("<", "DESC") if rueckwaerts else (">", "ASC")
+    sql = f"SELECT id, rang FROM ({' '.join(innen)}) AS treffer"
+    if marke:
+        sql += f" WHERE rang {vergleich} %s OR (rang = %s AND id {vergleich} %s)"
+        params += [marke[0], marke[0], marke[1]]
+    # Ein Eintrag mehr, um zu wissen, ob es weitergeht
+    sql += f" ORDER BY rang {richtung}, id {richtung} LIMIT %s"
+    params.append(groesse + 1)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        zeilen = cursor.fetchall()
+
+    mehr = len(zeilen) > groesse
+    zeilen = zeilen[:groesse]
+    if rueckwaerts:
+        zeilen.reverse()
+    if not zeilen:
+        return [], None, None
+
+    hat_zurueck = mehr if rueckwaerts else marke is not None
+    hat_weiter = marke is not None if rueckwaerts else mehr
+    return (
+        [aufgabe_id for aufgabe_id, _ in zeilen],
+        f"{zeilen[0][1]!r}~{zeilen[0][0]}" if hat_zurueck else None,
+        f"{zeilen[-1][1]!r}~{zeilen[-1][0]}" if hat_weiter else None,
+    )
+
+
+def aufgaben_treffer(suche, thema_id=None, kapitel_id=None, anzahl=100):
+    """IDs der besten `anzahl` Treffer (erste Seite von blaettere_treffer), sonst None."""
+    treffer = blaettere_treffer(suche, thema_id, kapitel_id, groesse=anzahl)
+    return None if treffer is None else treffer[0]
+
+
+def aufgaben_filter(suche, prefix=""):
+    """Q-Filter auf Aufgaben (prefix z.B. 'aufgabe__' für FehlerLog)."""
+    ausdruck = _ausdruck(suche)
+    if ausdruck is None:
+        return (
+            Q(**{f"{prefix}lfd_nr__icontains": suche})
+            | Q(**{f"{prefix}frage__icontains": suche})
+            | Q(**{f"{prefix}loesung__icontains": suche})
+        )
+    return Q(**{f"{prefix}id__in": RawSQL(
+        "SELECT rowid FROM physik_aufgabe_fts WHERE physik_aufgabe_fts MATCH %s", [ausdruck]
+    )})
+
+
+def fehler_filter(suche):
+    """Q-Filter auf FehlerLog: Aufgabentext oder eingegebene Antwort passt."""
+    ausdruck = _ausdruck(suche)
+    if ausdruck is None:
+        return aufgaben_filter(suche, prefix="aufgabe__") | Q(eingegebene_antwort__icontains=suche)
+    return aufgaben_filter(suche, prefix="aufgabe__") | Q(id__in=RawSQL(
+        "SELECT rowid FROM physik_fehlerlog_fts WHERE physik_fehlerlog_fts MATCH %s", [ausdruck]
+    ))
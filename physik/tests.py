@@ -1,9 +1,60 @@
+import base64
+import json
+import os
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from difflib import SequenceMatcher
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth.models import AnonymousUser # Falls der User egal ist
 
-from django.test import TestCase
-from physik.models import ThemenBereich, Kapitel, Aufgabe, AufgabeOption
-from physik.bewertung import bewerte_aufgabe
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core import mail, signing
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth.models import User
+from physik.models import ThemenBereich, Kapitel, Aufgabe, AufgabeOption, Protokoll, FehlerLog, FehlerSumme, LernstandZaehler, Benachrichtigung
+from physik.bewertung import bewerte, bewerte_aufgabe, vergleich_fuzzy
+from physik.aufgabendaten import lade_aufgabe
+from physik.aehnlichkeit import ist_aehnlich, findet_aehnliches
+from physik import antwortschluessel
+from physik.antwortschluessel import Antwortschluessel, gecachter_schluessel, hole_schluessel, parse_ausdruck, verwerfe_schluessel
+from physik.serie import waehle_serie
+from physik.benachrichtigung import versende_digest
+from physik.nachbewertung import nachbewerten
+from physik import lernfortschritt
+from physik.planer import faellige_serie, faellig_am, neue_leichtigkeit
+from physik.management.commands.abfrageplan import tabellen_scans
+from physik.suche import aufgaben_treffer, fehlende_trigger
+from physik.fehleranalyse import gruppiere, verdichte
+from physik.seriestand import SerienStand, COOKIE_NAME as SERIEN_COOKIE, COOKIE_SALT
 from django.test import RequestFactory
+from django.urls import reverse
+
+# Test-Caches explizit: Speicher statt tmp/session_cache (Sessions, Antwortschlüssel-Generation, Bestand)
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "sessions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "physik-sessions"},
+}
+_test_caches = override_settings(CACHES=TEST_CACHES)
+
+
+def setUpModule():
+    _test_caches.enable()
+
+
+def tearDownModule():
+    _test_caches.disable()
+
 
 class SchlagwortLogikTest(TestCase):
 
@@ -108,4 +159,1233 @@ class SchlagwortLogikTest(TestCase):
         self.assertTrue(
             res.get("richtig"), 
             "Typ 1Z: 'Thermometer' sollte 'termomter'' akkzeptieren."
-        )
\ No newline at end of file
+        )
+
+class AntwortschluesselTest(TestCase):
+
+    def setUp(self):
+        self.thema = ThemenBereich.objects.create(ordnung=1, thema="Wärmelehre", farbe="red", kurz="W")
+        self.kapitel = Kapitel.objects.create(thema=self.thema, zeile=1, kapitel="Wärmeausbreitung")
+        self.aufgabe = Aufgabe.objects.create(
+            lfd_nr="T200",
+            thema=self.thema,
+            kapitel=self.kapitel,
+            typ="1o2o3o4",
+            loesung="Wärmeleitung"
+        )
+        for pos, text in enumerate(["Konvektion", "Strahlung", "Wärmestrahlung"], start=2):
+            AufgabeOption.objects.create(aufgabe=self.aufgabe, position=pos, text=text)
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+
+    def test_hoechstens_eine_abfrage_pro_aufgabe(self):
+        """Der Schlüssel wird einmal gebaut, danach bewertet der Cache ohne DB"""
+        with self.assertNumQueries(1):
+            res = bewerte_aufgabe(self.request, self.aufgabe, "Strahlung", session={})
+        self.assertTrue(res.get("richtig"))
+
+        with self.assertNumQueries(0):
+            res = bewerte_aufgabe(self.request, self.aufgabe, "Strahlng", session={})
+        self.assertTrue(res.get("richtig"))
+
+    def test_option_aendern_verwirft_schluessel(self):
+        bewerte_aufgabe(self.request, self.aufgabe, "Konvektion", session={})
+
+        option = self.aufgabe.optionen.get(position=2)
+        option.text = "Mitführung"
+        option.save()
+
+        res = bewerte_aufgabe(self.request, self.aufgabe, "Mitführung", session={})
+        self.assertTrue(res.get("richtig"), "Neue Option muss nach dem Speichern gelten.")
+
+    @mock.patch("physik.antwortschluessel.PRUEF_INTERVALL", 0)
+    def test_anderer_worker_verwirft_per_generation(self):
+        bewerte_aufgabe(self.request, self.aufgabe, "Konvektion", session={})
+        self.assertIsNotNone(gecachter_schluessel(self.aufgabe.id))
+
+        # Ein anderer Prozess hat eine Aufgabe geändert
+        caches[settings.SESSION_CACHE_ALIAS].set(antwortschluessel.GENERATION_KEY, "fremd")
+        self.assertIsNone(gecachter_schluessel(self.aufgabe.id))
+
+    @mock.patch("physik.antwortschluessel.CACHE_GROESSE", 1)
+    def test_cache_begrenzt(self):
+        andere = Aufgabe.objects.create(lfd_nr="T201", thema=self.thema, kapitel=self.kapitel, typ="1", loesung="Konvektion")
+        hole_schluessel(self.aufgabe)
+        hole_schluessel(andere)
+        self.assertIsNone(gecachter_schluessel(self.aufgabe.id))
+        self.assertIsNotNone(gecachter_schluessel(andere.id))
+
+    def test_parser_bereich_und_klammern(self):
+        self.assertEqual(parse_ausdruck("1o2o3"), ("oder", (("bereich", 1, 2), ("num", 3))))
+        self.assertEqual(parse_ausdruck("1u(2o3)"), ("und", (("num", 1), ("bereich", 2, 3))))
+
+
+class LernstandZaehlerTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("schueler", password="x")
+        self.thema = ThemenBereich.objects.create(ordnung=1, thema="Mechanik", farbe="blue", kurz="M")
+        self.kapitel = Kapitel.objects.create(thema=self.thema, zeile=1, kapitel="Kraft")
+        self.aufgabe = Aufgabe.objects.create(
+            lfd_nr="M001", thema=self.thema, kapitel=self.kapitel, typ="1", loesung="Newton"
+        )
+
+    def stand(self):
+        return dict(
+            LernstandZaehler.objects.filter(user=self.user, anzahl__gt=0).values_list("fach", "anzahl")
+        )
+
+    def test_fachwechsel_wird_verbucht(self):
+        p = Protokoll.objects.create(user=self.user, aufgabe=self.aufgabe, fach=2)
+        self.assertEqual(self.stand(), {2: 1})
+
+        p = Protokoll.objects.get(pk=p.pk)
+        p.fach = 3
+        p.save()
+        self.assertEqual(self.stand(), {3: 1})
+
+        p.save()  # ohne Fachwechsel keine Änderung
+        self.assertEqual(self.stand(), {3: 1})
+
+        p.delete()
+        self.assertEqual(self.stand(), {})
+
+    def test_neu_aufbauen(self):
+        Protokoll.objects.create(user=self.user, aufgabe=self.aufgabe, fach=4)
+        LernstandZaehler.objects.all().delete()
+        LernstandZaehler.neu_aufbauen(user=self.user)
+        self.assertEqual(self.stand(), {4: 1})
+
+    def test_umsortieren_zieht_zaehler_um(self):
+        Protokoll.objects.create(user=self.user, aufgabe=self.aufgabe, fach=2)
+        Protokoll.objects.create(user=User.objects.create_user("andere", password="x"), aufgabe=self.aufgabe, fach=3)
+        neues_kapitel = Kapitel.objects.create(thema=self.thema, zeile=2, kapitel="Energie")
+
+        aufgabe = Aufgabe.objects.get(pk=self.aufgabe.pk)
+        aufgabe.kapitel = neues_kapitel
+        aufgabe.schwierigkeit = 2
+        aufgabe.save()
+
+        self.assertEqual(
+            sorted(LernstandZaehler.objects.filter(anzahl__gt=0).values_list("kapitel_id", "schwierigkeit", "fach", "anzahl")),
+            [(neues_kapitel.id, 2, 2, 1), (neues_kapitel.id, 2, 3, 1)],
+        )
+        # Inkrementell und Neuaufbau stimmen überein
+        LernstandZaehler.neu_aufbauen()
+        self.assertEqual(
+            sorted(LernstandZaehler.objects.filter(anzahl__gt=0).values_list("kapitel_id", "schwierigkeit", "fach", "anzahl")),
+            [(neues_kapitel.id, 2, 2, 1), (neues_kapitel.id, 2, 3, 1)],
+        )
+
+    def loesche_mit_karten(self, anzahl):
+        # Aufgabe mit `anzahl` Karten (je ein User) löschen; liefert die Zahl der Abfragen
+        aufgabe = Aufgabe.objects.create(
+            lfd_nr=f"M1{anzahl:02d}", thema=self.thema, kapitel=self.kapitel, typ="1", loesung="x", schwierigkeit=2
+        )
+        users = User.objects.bulk_create([User(username=f"u{anzahl}_{i}") for i in range(anzahl)])
+        Protokoll.objects.bulk_create([Protokoll(user=u, aufgabe=aufgabe, fach=2 + i % 2) for i, u in enumerate(users)])
+        LernstandZaehler.neu_aufbauen()
+        with CaptureQueriesContext(connection) as abfragen:
+            Aufgabe.objects.get(pk=aufgabe.pk).delete()
+        return len(abfragen)
+
+    def test_kaskade_ohne_abfrage_pro_karte(self):
+        Protokoll.objects.create(user=self.user, aufgabe=self.aufgabe, fach=2)
+        self.assertEqual(self.loesche_mit_karten(3), self.loesche_mit_karten(30))
+        # Nur die Karten der gelöschten Aufgaben sind aus den Zählern verschwunden
+        self.assertEqual(
+            list(LernstandZaehler.objects.filter(anzahl__gt=0).values_list("user_id", "fach", "anzahl")),
+            [(self.user.id, 2, 1)],
+        )
+        LernstandZaehler.neu_aufbauen()
+        self.assertEqual(list(LernstandZaehler.objects.values_list("user_id", "fach", "anzahl")), [(self.user.id, 2, 1)])
+
+    def test_user_loeschen(self):
+        Protokoll.objects.create(user=self.user, aufgabe=self.aufgabe, fach=2)
+        with CaptureQueriesContext(connection) as abfragen:
+            self.user.delete()
+        self.assertFalse(LernstandZaehler.objects.exists())
+        self.assertFalse([q["sql"] for q in abfragen if q["sql"].startswith('UPDATE "physik_lernstandzaehler"')])
+
+    def test_bestand_gecacht_und_verworfen(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        schluessel = (self.thema.id, self.kapitel.id, self.aufgabe.schwierigkeit)
+        self.assertEqual(Aufgabe.bestand(), {schluessel: 1})
+        with self.assertNumQueries(0):
+            Aufgabe.bestand()
+
+        # Reine Textänderung: Bestand bleibt gültig
+        self.aufgabe.frage = "Neu?"
+        self.aufgabe.save()
+        with self.assertNumQueries(0):
+            Aufgabe.bestand()
+
+        zweite = Aufgabe.objects.create(lfd_nr="M002", thema=self.thema, kapitel=self.kapitel, typ="1", loesung="x")
+        self.assertEqual(Aufgabe.bestand(), {schluessel: 2})
+        zweite.schwierigkeit = 3
+        zweite.save()
+        self.assertEqual(Aufgabe.bestand(), {schluessel: 1, (self.thema.id, self.kapitel.id, 3): 1})
+        zweite.delete()
+        self.assertEqual(Aufgabe.bestand(), {schluessel: 1})
+
+
+class SerienAuswahlTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("schueler", password="x")
+        self.andere = User.objects.create_user("andere", password="x")
+        self.thema = ThemenBereich.objects.create(ordnung=1, thema="Optik", farbe="yellow", kurz="O")
+        self.kapitel = Kapitel.objects.create(thema=self.thema, zeile=1, kapitel="Licht")
+        self.a = [
+            Aufgabe.objects.create(lfd_nr=f"O00{i}", thema=self.thema, kapitel=self.kapitel, typ="1", loesung="x")
+            for i in range(4)
+        ]
+        Protokoll.objects.create(user=self.user, aufgabe=self.a[0], fach=1)
+        Protokoll.objects.create(user=self.user, aufgabe=self.a[1], fach=2)
+        Protokoll.objects.create(user=self.andere, aufgabe=self.a[1], fach=1)
+        Protokoll.objects.create(user=self.andere, aufgabe=self.a[2], fach=3)
+
+    def test_fach1_neu_oder_fach1(self):
+        with self.assertNumQueries(1):
+            ids = waehle_serie(self.user, self.thema, fach_int=1)
+        self.assertEqual(set(ids), {self.a[0].id, self.a[2].id, self.a[3].id})
+
+    def test_hoeheres_fach_und_anzahl(self):
+        self.assertEqual(waehle_serie(self.user, self.thema, fach_int=2), [self.a[1].id])
+        self.assertEqual(len(waehle_serie(self.user, self.thema, fach_int=1, anzahl=2)), 2)
+
+
+def eigener_puffer(test):
+    """Lernfortschritt-Puffer des Tests in einem eigenen, temporären Verzeichnis."""
+    verzeichnis = test.enterContext(tempfile.TemporaryDirectory())
+    test.enterContext(override_settings(PHYSIK_LERNFORTSCHRITT_PUFFER=verzeichnis))
+    return verzeichnis
+
+
+class SerienCookie:
+    """Serien-Stand im Test-Client setzen und lesen"""
+
+    def setze_stand(self, stand):
+        signer = signing.get_cookie_signer(salt=SERIEN_COOKIE + COOKIE_SALT)
+        self.client.cookies[SERIEN_COOKIE] = signer.sign(stand.packe())
+
+    def lies_stand(self):
+        factory = RequestFactory()
+        factory.cookies[SERIEN_COOKIE] = self.client.cookies[SERIEN_COOKIE].value
+        return SerienStand.aus_request(factory.get("/"))
+
+
+class AufgabenSeiteTest(SerienCookie, TestCase):
+    """Abfragen pro Klick im Quiz: Aufgabe, Optionen und Medien werden je einmal geladen"""
+
+    def setUp(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        eigener_puffer(self)
+        self.user = User.objects.create_user("schueler", password="x")
+        self.thema = ThemenBereich.objects.create(ordnung=1, thema="Mechanik", farbe="blue", kurz="M")
+        self.kapitel = Kapitel.objects.create(thema=self.thema, zeile=1, kapitel="Kraft")
+        self.aufgabe = Aufgabe.objects.create(
+            lfd_nr="M010", thema=self.thema, kapitel=self.kapitel, typ="1o2o3", loesung="Newton", frage="Einheit?"
+        )
+        for pos, text in enumerate(["N", "kg*m/s²"], start=2):
+            AufgabeOption.objects.create(aufgabe=self.aufgabe, position=pos, text=text)
+
+        self.client.defaults["HTTP_AUTHORIZATION"] = "Basic " + base64.b64encode(b"einstein:physik").decode()
+        self.client.force_login(self.user)
+        self.setze_stand(SerienStand([self.aufgabe.id]))
+
+    def test_get_abfragen(self):
+        # User, Aufgabe (+Kapitel/Thema), Optionen, Medien - die Session liegt im Cache
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("physik:aufgaben"))
+        self.assertContains(response, "Einheit?")
+
+    def test_post_abfragen(self):
+        verwerfe_schluessel()
+        self.setze_stand(SerienStand([self.aufgabe.id, self.aufgabe.id]))
+        # wie GET, der Serien-Stand geht als Cookie zurück (kein Session-Update),
+        # der Lernfortschritt wird bis zum Serienende nur im Puffer vorgemerkt
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse("physik:aufgaben"), {"antwort": "Newton"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.lies_stand().index, 1)
+
+    def test_session_nicht_pro_klick(self):
+        # cached_db: die Session steht seit dem Login in der Datenbank, Klicks lesen nur den Cache
+        self.assertEqual(settings.SESSION_ENGINE, "django.contrib.sessions.backends.cached_db")
+        self.assertTrue(Session.objects.exists())
+        with CaptureQueriesContext(connection) as abfragen:
+            self.client.post(reverse("physik:aufgaben"), {"antwort": "Watt"})
+            self.client.post(reverse("physik:aufgaben"), {"antwort": ""})
+        self.assertFalse([q["sql"] for q in abfragen if "django_session" in q["sql"]])
+
+    def test_verdraengte_session_bleibt_angemeldet(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        response = self.client.get(reverse("physik:aufgaben"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_falsche_antwort_wartet(self):
+        self.client.post(reverse("physik:aufgaben"), {"antwort": "Watt"})
+        stand = self.lies_stand()
+        self.assertEqual((stand.index, stand.warte_auf_weiter, stand.letzte_antwort), (0, True, "Watt"))
+
+        # Leere Eingabe = Weiter
+        self.client.post(reverse("physik:aufgaben"), {"antwort": ""})
+        self.assertTrue(self.lies_stand().beendet)
+        response = self.client.get(reverse("physik:aufgaben"))
+        self.assertRedirects(response, reverse("physik:index"), fetch_redirect_response=False)
+
+    def test_stand_packen(self):
+        stand = SerienStand([3, 2**40, 7], index=1, warte_auf_weiter=True, aktiver_index=4, letzte_antwort="Kraft ä")
+        neu = SerienStand.entpacke(stand.packe())
+        self.assertEqual(
+            (neu.aufgaben_ids, neu.index, neu.warte_auf_weiter, neu.aktiver_index, neu.letzte_antwort),
+            ([3, 2**40, 7], 1, True, 4, "Kraft ä"),
+        )
+        self.assertIsNone(SerienStand.entpacke("kaputt!"))
+
+
+class SerienApiTest(SerienCookie, TestCase):
+    """JSON-Schnittstelle: Bewertung und nächste Aufgabe in einem Request"""
+
+    def setUp(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        eigener_puffer(self)
+        self.user = User.objects.create_user("schueler", password="x")
+        self.thema = ThemenBereich.objects.create(ordnung=1, thema="Mechanik", farbe="blue", kurz="M")
+        self.kapitel = Kapitel.objects.create(thema=self.thema, zeile=1, kapitel="Kraft")
+        self.aufgabe = Aufgabe.objects.create(
+            lfd_nr="M010", thema=self.thema, kapitel=self.kapitel, typ="1o2o3", loesung="Newton", frage="Einheit?"
+        )
+        self.zweite = Aufgabe.objects.create(
+            lfd_nr="M011", thema=self.thema, kapitel=self.kapitel, typ="1", loesung="Kilogramm",
+            frage="Einheit der Masse?", einheit="kg",
+        )
+        self.client.defaults["HTTP_AUTHORIZATION"] = "Basic " + base64.b64encode(b"einstein:physik").decode()
+        self.client.force_login(self.user)
+        self.setze_stand(SerienStand([self.aufgabe.id, self.zweite.id]))
+
+    def test_aufgabe_holen(self):
+        daten = self.client.get(reverse("physik:api_serie_aufgabe")).json()
+        self.assertEqual(daten["aufgabe"]["frage"], "Einheit?")
+        self.assertEqual((daten["serie"]["fragenummer"], daten["serie"]["anzahl"]), (1, 2))
+        self.assertFalse(daten["aufgabe"]["nur_seite"])
+
+    def test_richtig_liefert_naechste(self):
+        verwerfe_schluessel()
+        # User + beide Aufgaben gemeinsam (Aufgabe, Optionen, Medien) - wie ein einzelner GET
+        with self.assertNumQueries(4):
+            daten = self.client.post(reverse("physik:api_serie_antwort"), {"antwort": "Newton"}).json()
+        self.assertTrue(daten["ergebnis"]["richtig"])
+        self.assertEqual(daten["aufgabe"]["lfd_nr"], "M011")
+        self.assertFalse(daten["seite"])
+        self.assertEqual(self.lies_stand().index, 1)
+
+    def test_falsch_wartet(self):
+        daten = self.client.post(
+            reverse("physik:api_serie_antwort"), {"antwort": "<b>Watt</b>"}, content_type="application/json"
+        ).json()
+        self.assertEqual(daten["ergebnis"]["art"], "falsch")
+        self.assertIn("&lt;b&gt;Watt&lt;/b&gt;", daten["ergebnis"]["hinweis"])
+        self.assertIsNone(daten["aufgabe"])
+        self.assertTrue(daten["serie"]["warte_auf_weiter"])
+
+        # Weiter (leer) -> zweite Aufgabe, dann Ende: Cookie weg, Seite lädt neu
+        daten = self.client.post(reverse("physik:api_serie_antwort"), {"antwort": ""}).json()
+        self.assertEqual(daten["aufgabe"]["lfd_nr"], "M011")
+        daten = self.client.post(reverse("physik:api_serie_antwort"), {"antwort": "Kilogramm"}).json()
+        self.assertTrue(daten["serie"]["beendet"] and daten["seite"])
+        self.assertEqual(self.client.cookies[SERIEN_COOKIE].value, "")
+
+    def test_serie_start_konstante_abfragen(self):
+        verwerfe_schluessel()
+        for i in range(6):
+            aufgabe = Aufgabe.objects.create(
+                lfd_nr=f"M1{i:02d}", thema=self.thema, kapitel=self.kapitel, typ="r", loesung="2; 4", frage="{0}*2?"
+            )
+            AufgabeOption.objects.create(aufgabe=aufgabe, position=2, text="1; 2")
+        # User, Thema, Auswahl der IDs, Aufgaben (+Kapitel/Thema), Optionen, Medien - unabhängig von der Länge
+        with self.assertNumQueries(6):
+            daten = self.client.get(reverse("physik:api_serie_start"), {"tb": self.thema.id}).json()
+        self.assertEqual(len(daten["aufgaben"]), 8)
+        self.assertEqual(daten["serie"]["anzahl"], 8)
+        self.assertEqual(self.lies_stand().aufgaben_ids, [a["id"] for a in daten["aufgaben"]])
+
+        # Antworten "vorab": Bewertung aus dem vorgewärmten Schlüssel, nur noch der User
+        # (die letzte Antwort schreibt zusätzlich den Fortschritt der Serie)
+        for nr, a in enumerate(daten["aufgaben"], start=1):
+            antwort = {"M010": "Newton", "M011": "Kilogramm"}.get(a["lfd_nr"]) or ("2", "4")[a["variante"]]
+            with CaptureQueriesContext(connection) as abfragen:
+                ergebnis = self.client.post(
+                    reverse("physik:api_serie_antwort"),
+                    {"antwort": antwort, "vorab": True, "variante": a["variante"]},
+                    content_type="application/json",
+                ).json()
+            self.assertTrue(ergebnis["ergebnis"]["richtig"], a)
+            self.assertIsNone(ergebnis["aufgabe"])
+            if nr < len(daten["aufgaben"]):
+                self.assertEqual(len(abfragen), 1)
+        self.assertTrue(ergebnis["serie"]["beendet"])
+        self.assertEqual(Protokoll.objects.filter(user=self.user, fach=2).count(), 8)
+
+    def test_serie_start_unbekannt(self):
+        response = self.client.get(reverse("physik:api_serie_start"), {"tb": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_vorab_variante_begrenzt(self):
+        # Falsche Antwort: die Serie bleibt stehen, die Variante landet im Cookie
+        response = self.client.post(
+            reverse("physik:api_serie_antwort"),
+            {"antwort": "Joule", "vorab": True, "variante": 99999},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.lies_stand().aktiver_index, 0)
+
+    def test_vorab_geloeschte_aufgabe(self):
+        verwerfe_schluessel()
+        self.aufgabe.delete()
+        response = self.client.post(
+            reverse("physik:api_serie_antwort"), {"antwort": "Newton", "vorab": True}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_ohne_serie(self):
+        self.client.cookies.pop(SERIEN_COOKIE)
+        response = self.client.post(reverse("physik:api_serie_antwort"), {"antwort": "Newton"})
+        self.assertEqual(response.status_code, 409)
+
+
+class AehnlichkeitTest(SimpleTestCase):
+    """Golden-Korpus: ist_aehnlich entscheidet wie SequenceMatcher bei 0.8 und 0.65"""
+
+    BEGRIFFE = [
+        "wärmestrahlung", "konvektion", "wärmeleitung", "reihenschaltung", "parallelschaltung",
+        "newton", "joule", "beschleunigung", "geschwindigkeit", "gravitation", "strahlung",
+        "mitführung", "widerstand", "spannung", "stromstärke", "ohm", "kg", "m/s²", "a", "",
+    ]
+
+    def korpus(self):
+        zufall = random.Random(20240601)
+        paare = [(a, b) for a in self.BEGRIFFE for b in self.BEGRIFFE]
+        for _ in range(3000):
+            soll = zufall.choice(self.BEGRIFFE)
+            ist = list(soll)
+            for _ in range(zufall.randint(0, 4)):
+                i = zufall.randint(0, len(ist))
+                art = zufall.random()
+                if art < 0.3:
+                    ist.insert(i, zufall.choice("aehnrstäü "))
+                elif ist and art < 0.6:
+                    ist.pop(min(i, len(ist) - 1))
+                elif ist and art < 0.8:
+                    ist[min(i, len(ist) - 1)] = zufall.choice("aehnrstäü")
+                elif len(ist) > 1:
+                    j = min(i, len(ist) - 2)
+                    ist[j], ist[j + 1] = ist[j + 1], ist[j]
+            paare.append((soll, "".join(ist)))
+        return paare
+
+    def test_gleiche_entscheidung_wie_difflib(self):
+        for a, b in self.korpus():
+            for schwelle in (0.8, 0.65):
+                erwartet = SequenceMatcher(None, a, b).ratio() >= schwelle
+                self.assertEqual(ist_aehnlich(a, b, schwelle), erwartet, (a, b, schwelle))
+                self.assertEqual(ist_aehnlich(b, a, schwelle), SequenceMatcher(None, b, a).ratio() >= schwelle)
+
+    def test_findet_aehnliches(self):
+        satz = "die energie wird durch wärmestrahlng übertragen".split()
+        self.assertEqual(findet_aehnliches("wärmestrahlung", satz, 0.8), "wärmestrahlng")
+        self.assertIsNone(findet_aehnliches("konvektion", satz, 0.8))
+
+
+class TrigrammIndexTest(SimpleTestCase):
+    """fuzzy_treffer liefert für jede Alternative dasselbe wie vergleich_fuzzy"""
+
+    def test_gleich_wie_einzelvergleich(self):
+        zufall = random.Random(7)
+        woerter = AehnlichkeitTest.BEGRIFFE[:-1] + ["die", "der", "und", "ab"]
+
+        def tippfehler(wort):
+            wort = list(wort)
+            for _ in range(zufall.randint(0, 3)):
+                i = min(zufall.randint(0, len(wort)), max(len(wort) - 1, 0))
+                if zufall.random() < 0.5 or not wort:
+                    wort.insert(i, zufall.choice("aenrstä"))
+                else:
+                    wort[i] = zufall.choice("aenrst")
+            return "".join(wort)
+
+        for _ in range(300):
+            optionen = [tippfehler(zufall.choice(woerter)) for _ in range(zufall.randint(0, 15))] + ["", "Zwei Wörter"]
+            schluessel = Antwortschluessel(1, "1o2o3", tippfehler(zufall.choice(woerter)), "", optionen)
+            satz = " ".join(tippfehler(zufall.choice(woerter)) for _ in range(zufall.randint(0, 8)))
+            for ratio in (0.8, 0.65):
+                treffer = schluessel.fuzzy_treffer(satz, ratio)
+                for idx in range(1, len(schluessel.texte) + 1):
+                    self.assertEqual(
+                        treffer.get(idx, (False, None)),
+                        vergleich_fuzzy(idx, schluessel, "", satz, ratio),
+                        (optionen, satz, idx, ratio),
+                    )
+
+
+class BewertungsKernTest(TestCase):
+    """bewerte() arbeitet ohne Request/Session, nur mit Snapshot, Eingabe und Variante"""
+
+    def setUp(self):
+        self.thema = ThemenBereich.objects.create(ordnung=1, thema="Elektrik", farbe="yellow", kurz="E")
+        self.kapitel = Kapitel.objects.create(thema=self.thema, zeile=1, kapitel="Stromkreis")
+
+    def test_rechnen_mit_variante(self):
+        aufgabe = Aufgabe.objects.create(
+            lfd_nr="E001", thema=self.thema, kapitel=self.kapitel, typ="r", loesung="12 Ohm; 14 Ohm"
+        )
+        daten = lade_aufgabe(aufgabe.id)
+        self.assertTrue(bewerte(daten, "14", variante=1).richtig)
+        self.assertFalse(bewerte(daten, "14", variante=0).richtig)
+        self.assertEqual(bewerte(daten, "12,0").als_dict()["richtig"], False)
+
+    def test_ergebnis_und_threads(self):
+        aufgabe = Aufgabe.objects.create(
+            lfd_nr="E002", thema=self.thema, kapitel=self.kapitel, typ="w", loesung="wahr"
+        )
+        daten = lade_aufgabe(aufgabe.id)
+        self.assertEqual(bewerte(daten, "vielleicht").ungueltig, True)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            ergebnisse = list(pool.map(lambda a: bewerte(daten, a).richtig, ["ja", "nein"] * 50))
+        self.assertEqual(ergebnisse, [True, False] * 50)
+
+    def test_e_typ_unveraendert(self):
+        # "e"-Typen laufen wie bisher durch den Parser (kein eigener Zweig), die f-Prüfung greift
+        aufgabe = Aufgabe.objects.create(lfd_nr="E003", thema=self.thema, kapitel=self.kapitel, typ="1e2f3", loesung="Kraft")
+        AufgabeOption.objects.create(aufgabe=aufgabe, position=2, text="Gegenkraft")
+        AufgabeOption.objects.create(aufgabe=aufgabe, position=3, text="Reibung")
+        daten = lade_aufgabe(aufgabe.id)
+        self.assertTrue(bewerte(daten, "Kraft").richtig)
+        self.assertFalse(bewerte(daten, "Kraft ... Gegenkraft").richtig)
+        ergebnis = bewerte(daten, "Kraft; Reibung")
+        self.assertFalse(ergebnis.richtig)
+        self.assertIn("Reibung", ergebnis.hinweis)
+
+
+class BenchBewertungTest(TestCase):
+
+    def test_json_ergebnis(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pfad = os.path.join(tmp, "bewertung.json")
+            call_command("bench_bewertung", "--aufgaben", "1", "--antworten", "30", "--json", pfad, stdout=StringIO())
+            with open(pfad, encoding="utf-8") as f:
+                ergebnis = json.load(f)
+        self.assertIn("luecke", ergebnis["familien"])
+        self.assertEqual(len(ergebnis["familien"]), 13)
+        for werte in ergebnis["familien"].values():
+            self.assertEqual(werte["abfragen_warm"], 0)
+        # Nichts bleibt in der Datenbank zurück
+        self.assertFalse(Aufgabe.objects.exists())
+
+
+class NachbewertungTest(TestCase):
+
+    def setUp(self):
+        self.thema = ThemenBereich.objects.create(ordnung=1, thema="Wärmelehre", farbe="red", kurz="W")
+        self.kapitel = Kapitel.objects.create(thema=self.thema, zeile=1, kapitel="Wärmeausbreitung")
+        self.aufgabe = Aufgabe.objects.create(
+            lfd_nr="W100", thema=self.thema, kapitel=self.kapitel, typ="1o2", loesung="Strahlung"
+        )
+        AufgabeOption.objects.create(aufgabe=self.aufgabe, position=2, text="Konvektion")
+        self.rechnen = Aufgabe.objects.create(
+            lfd_nr="W101", thema=self.thema, kapitel=self.kapitel, typ="r", loesung="12; 14"
+        )
+        for antwort in ("durch Wärmeleitung", "Leitung", "Mitführung", "Konvektion?"):
+            FehlerLog.objects.create(aufgabe=self.aufgabe, eingegebene_antwort=antwort)
+        FehlerLog.objects.create(aufgabe=self.rechnen, eingegebene_antwort="14")
+
+    def test_aenderung_macht_eingaben_richtig(self):
+        vorher = nachbewerten(prozesse=1)
+        self.assertEqual([u.antwort for u in vorher["umschlaege"]], ["Konvektion?"])
+        self.assertEqual([a.lfd_nr for a in vorher["uebersprungen"]], ["W101"])
+
+        AufgabeOption.objects.create(aufgabe=self.aufgabe, position=3, text="Leitung")
+        self.aufgabe.typ = "1o2o3"
+        self.aufgabe.save()
+        nachher = nachbewerten([self.aufgabe.id], prozesse=1)
+        self.assertEqual(nachher["geprueft"], 4)
+        self.assertEqual(
+            sorted(u.antwort for u in nachher["umschlaege"]),
+            ["Konvektion?", "Leitung", "durch Wärmeleitung"],
+        )
+
+    def test_kommando(self):
+        out = StringIO()
+        call_command("nachbewerten", "--aufgabe", "W100", "--prozesse", "1", stdout=out)
+        self.assertIn("W100: 1 Eingabe(n) jetzt richtig", out.getvalue())
+        self.assertIn("4 Eingaben geprüft", out.getvalue())
+
+
+class SqliteProfilTest(TestCase):
+
+    def test_pragmas_bei_neuer_verbindung(self):
+        from django.db import connection
+        from physik.datenbank import lies_pragmas, setze_pragmas
+        # Der Hook lief schon beim Öffnen der Test-Verbindung
+        erwartet = settings.PHYSIK_SQLITE_PRAGMAS.get("busy_timeout", 5000)
+        self.assertEqual(lies_pragmas(connection, ("busy_timeout",))["busy_timeout"], erwartet)
+        setze_pragmas(connection, {"busy_timeout": 1234})
+        self.assertEqual(lies_pragmas(connection, ("busy_timeout",)), {"busy_timeout": 1234})
+        setze_pragmas(connection, {"busy_timeout": erwartet})
+
+
+class BenachrichtigungTest(TestCase):
+
+    def setUp(self):
+        self.thema = ThemenBereich.objects.create(ordnung=1, thema="Druck", farbe="green", kurz="D")
+        self.kapitel = Kapitel.objects.create(thema=self.thema, zeile=1, kapitel="Luftdruck")
+
+    def test_speichern_schickt_keine_mail_sondern_sammelt(self):
+        a1 = Aufgabe.objects.create(lfd_nr="D001", thema=self.thema, kapitel=self.kapitel, typ="1", loesung="Pa")
+        a2 = Aufgabe.objects.create(lfd_nr="D002", thema=self.thema, kapitel=self.kapitel, typ="1", loesung="hPa")
+        a1.frage = "Einheit?"
+        a1.save()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Benachrichtigung.objects.filter(versendet__isnull=True).count(), 3)
+
+        # Innerhalb des Sammel-Fensters wird noch nichts verschickt
+        self.assertEqual(versende_digest(), 0)
+
+        self.assertEqual(versende_digest(warte_fenster=False), 3)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("D001: NEU ERSTELLT (2x)", mail.outbox[0].body)
+        self.assertIn("D002", mail.outbox[0].body)
+        self.assertFalse(Benachrichtigung.objects.filter(versendet__isnull=True).exists())
+
+    def test_versand_nach_ablauf_des_fensters(self):
+        Aufgabe.objects.create(lfd_nr="D003", thema=self.thema, kapitel=self.kapitel, typ="1", loesung="Pa")
+        spaeter = timezone.now() + timedelta(hours=1)
+        self.assertEqual(versende_digest(jetzt=spaeter), 1)
+        self.assertEqual(mail.outbox[0].subject, "PT-Info: Aufgabe Nr. D003 NEU ERSTELLT")
+
+
+class ImportTest(TestCase):
+
+    KOPF = "lfd_nr;thema_id;erklaerung;anmerkung;hilfe;zeile;kapitel;schwierigkeit;typ;frage;antwort;2;3\n"
+
+    def setUp(self):
+        self.thema = ThemenBereich.objects.create(ordnung=3, thema="Elektrizitätslehre", farbe="orange", kurz="E")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pfad = os.path.join(self.tmp.name, "aufgaben.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def importiere(self, zeilen, *args):
+        with open(self.pfad, "w", encoding="utf-8") as f:
+            f.write(self.KOPF + "".join(zeilen))
+        out = StringIO()
+        call_command("import_aufgaben", self.pfad, "--commit", *args, stdout=out)
+        return out.getvalue()
+
+    def test_bulk_import_und_options_abgleich(self):
+        out = self.importiere([
+            "E001;3;;;;1;Stromkreis;1;1o2;Was leuchtet?;Lampe;Glühbirne;0\n",
+            "E002;3;;;;1;Stromkreis;1;1;Einheit Strom?;Ampere;0;0\n",
+            "E003;9;;;;1;Stromkreis;1;1;Kaputt;x;0;0\n",
+        ], "--batch-size", "2")
+        self.assertIn("Aufgaben neu/update: 2/0", out)
+        self.assertIn("FEHLER gefunden: 1", out)
+        self.assertEqual(Aufgabe.objects.get(lfd_nr="E001").loesung, "Lampe")
+        self.assertEqual(list(Aufgabe.objects.get(lfd_nr="E001").optionen.values_list("text", flat=True)), ["Glühbirne"])
+
+        out = self.importiere([
+            "E001;3;;;;1;Stromkreis;1;1o2o3;Was leuchtet?;Lampe;Birne;LED\n",
+            "E002;3;;;;1;Stromkreis;1;1;Einheit Strom?;A;0;0\n",
+        ])
+        self.assertIn("Aufgaben neu/update: 0/2", out)
+        self.assertIn("Optionen neu/update/gelöscht: 1/1/0", out)
+        self.assertEqual(
+            list(Aufgabe.objects.get(lfd_nr="E001").optionen.values_list("position", "text")),
+            [(2, "Birne"), (3, "LED")]
+        )
+        self.assertEqual(Aufgabe.objects.get(lfd_nr="E002").loesung, "A")
+
+    def test_inkrementell_ueberspringt_unveraenderte_zeilen(self):
+        zeilen = [
+            "E001;3;;;;1;Stromkreis;1;1o2;Was leuchtet?;Lampe;Glühbirne;0\n",
+            "E002;3;;;;1;Stromkreis;1;1;Einheit Strom?;Ampere;0;0\n",
+            "E003;3;;;;1;Stromkreis;1;1;Einheit Spannung?;Volt;0;0\n",
+        ]
+        self.importiere(zeilen)
+        Benachrichtigung.objects.all().delete()
+
+        out = self.importiere(zeilen[:2], "--incremental")
+        self.assertIn("Aufgaben neu/geändert/nicht mehr in CSV: 0/0/1 (übersprungen: 2)", out)
+        self.assertFalse(Benachrichtigung.objects.exists())
+
+        # Option geändert -> nur diese Zeile wird geschrieben; E003 wird gelöscht
+        zeilen[0] = "E001;3;;;;1;Stromkreis;1;1o2;Was leuchtet?;Lampe;LED;0\n"
+        out = self.importiere(zeilen[:2], "--incremental", "--entfernen")
+        self.assertIn("Aufgaben neu/geändert/gelöscht: 0/1/1 (übersprungen: 1)", out)
+        self.assertFalse(Aufgabe.objects.filter(lfd_nr="E003").exists())
+
+        # Bearbeitung außerhalb des Imports leert die Prüfsumme
+        a = Aufgabe.objects.get(lfd_nr="E002")
+        self.assertTrue(a.inhalt_hash)
+        a.frage = "Einheit der Stromstärke?"
+        a.save(update_fields=["frage"])  # auch mit update_fields (Admin, speichere_aufgabe)
+        a.refresh_from_db()
+        self.assertEqual(a.inhalt_hash, "")
+        out = self.importiere(zeilen[:2], "--incremental")
+        self.assertIn("(übersprungen: 1)", out)
+
+    def test_umsortieren_baut_zaehler_neu_auf(self):
+        zeilen = ["E001;3;;;;1;Stromkreis;1;1;Einheit Strom?;Ampere;0;0\n"]
+        self.importiere(zeilen)
+        user = User.objects.create_user("schueler", password="x")
+        Protokoll.objects.create(user=user, aufgabe=Aufgabe.objects.get(lfd_nr="E001"), fach=2)
+        generation = caches[settings.SESSION_CACHE_ALIAS].get(antwortschluessel.GENERATION_KEY)
+
+        # Anderes Kapitel, schwerer
+        out = self.importiere(["E001;3;;;;2;Widerstand;3;1;Einheit Strom?;Ampere;0;0\n"], "--incremental")
+        self.assertIn("Umsortiert (Lernstand-Zähler neu aufgebaut): 1", out)
+        kapitel = Kapitel.objects.get(thema=self.thema, zeile=2)
+        self.assertEqual(
+            list(LernstandZaehler.objects.filter(user=user, anzahl__gt=0).values_list("kapitel_id", "schwierigkeit", "fach", "anzahl")),
+            [(kapitel.id, 3, 2, 1)],
+        )
+        # Die Web-Worker erfahren über eine neue Generation davon
+        self.assertNotEqual(caches[settings.SESSION_CACHE_ALIAS].get(antwortschluessel.GENERATION_KEY), generation)
+
+
+class LernfortschrittTest(SerienCookie, TestCase):
+    """Leitner-Fächer: pro Serie vorgemerkt, am Ende in einer Transaktion geschrieben"""
+
+    def setUp(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        eigener_puffer(self)
+        self.user = User.objects.create_user("schueler", password="x")
+        self.thema = ThemenBereich.objects.create(ordnung=1, thema="Mechanik", farbe="blue", kurz="M")
+        self.kapitel = Kapitel.objects.create(thema=self.thema, zeile=1, kapitel="Kraft")
+        self.a = [
+            Aufgabe.objects.create(lfd_nr=f"M02{i}", thema=self.thema, kapitel=self.kapitel, typ="1", loesung="Newton")
+            for i in range(3)
+        ]
+        self.client.defaults["HTTP_AUTHORIZATION"] = "Basic " + base64.b64encode(b"einstein:physik").decode()
+        self.client.force_login(self.user)
+
+    def zaehler(self):
+        return dict(
+            LernstandZaehler.objects.filter(user=self.user, anzahl__gt=0).values_list("fach", "anzahl")
+        )
+
+    def spiele(self, *antworten):
+        self.setze_stand(SerienStand([a.id for a in self.a]))
+        for antwort in antworten:
+            self.client.post(reverse("physik:aufgaben"), {"antwort": antwort})
+
+    def test_neues_fach(self):
+        self.assertEqual(
+            [lernfortschritt.neues_fach(alt, True) for alt in (None, 1, 2, 3, 4)], [2, 2, 3, 4, 4]
+        )
+        self.assertEqual(lernfortschritt.neues_fach(3, False), 1)
+
+    def test_serie_schreibt_am_ende(self):
+        # richtig, falsch (+ Weiter), richtig
+        self.setze_stand(SerienStand([a.id for a in self.a]))
+        for antwort in ("Newton", "Watt", ""):
+            self.client.post(reverse("physik:aufgaben"), {"antwort": antwort})
+        self.assertFalse(Protokoll.objects.exists())
+
+        self.client.post(reverse("physik:aufgaben"), {"antwort": "Newton"})
+        faecher = dict(Protokoll.objects.filter(user=self.user).values_list("aufgabe__lfd_nr", "fach"))
+        self.assertEqual(faecher, {"M020": 2, "M021": 1, "M022": 2})
+        self.assertEqual(list(FehlerLog.objects.values_list("eingegebene_antwort", flat=True)), ["Watt"])
+        self.assertEqual(self.zaehler(), {1: 1, 2: 2})
+
+        # Zweite Serie: Fach 2 -> 3, Fach 1 -> 2, Zähler folgen ohne Signale
+        self.spiele("Newton", "Newton", "Newton")
+        faecher = dict(Protokoll.objects.filter(user=self.user).values_list("aufgabe__lfd_nr", "fach"))
+        self.assertEqual(faecher, {"M020": 3, "M021": 2, "M022": 3})
+        self.assertEqual(self.zaehler(), {2: 1, 3: 2})
+        LernstandZaehler.neu_aufbauen(self.user)
+        self.assertEqual(self.zaehler(), {2: 1, 3: 2})
+
+    def test_erster_versuch_zaehlt(self):
+        self.setze_stand(SerienStand([self.a[0].id]))
+        self.client.post(reverse("physik:aufgaben"), {"antwort": "Watt"})
+        self.client.post(reverse("physik:aufgaben"), {"antwort": "Newton"})
+        self.assertEqual(Protokoll.objects.get(user=self.user).fach, 1)
+
+    def test_abgebrochene_serie(self):
+        self.setze_stand(SerienStand([a.id for a in self.a]))
+        self.client.post(reverse("physik:aufgaben"), {"antwort": "Newton"})
+        self.assertFalse(Protokoll.objects.exists())
+        # Die Startseite schreibt den Rest, bevor sie zählt
+        self.client.get(reverse("physik:index"))
+        self.assertEqual(Protokoll.objects.get(user=self.user).fach, 2)
+
+    def test_zeitgrenze(self):
+        with mock.patch.object(lernfortschritt, "PUFFER_SEKUNDEN", 0):
+            self.assertTrue(lernfortschritt.merke(self.user.id, self.a[0].id, False, "Watt"))
+        self.assertEqual(Protokoll.objects.get(user=self.user).fach, 1)
+        self.assertEqual(lernfortschritt.schreibe(self.user.id), 0)
+
+    def test_nichts_verdraengt_und_nichts_doppelt(self):
+        for aufgabe in self.a:
+            lernfortschritt.merke(self.user.id, aufgabe.id, False, "Watt")
+        # Der Session-Cache darf verdrängen, der Puffer liegt woanders
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+
+        # Während geschrieben wird: ein zweiter Aufruf (Startseite) und eine neue Antwort
+        original, parallel = lernfortschritt.neue_leichtigkeit, []
+
+        def dazwischen(*args):
+            if not parallel:
+                parallel.append(lernfortschritt.schreibe(self.user.id))
+                lernfortschritt.merke(self.user.id, self.a[0].id, True)
+            return original(*args)
+
+        with mock.patch.object(lernfortschritt, "neue_leichtigkeit", side_effect=dazwischen):
+            self.assertEqual(lernfortschritt.schreibe(self.user.id), 3)
+        self.assertEqual(parallel, [0])  # nichts doppelt
+        self.assertEqual(FehlerLog.objects.count(), 3)
+        self.assertEqual(self.zaehler(), {1: 3})
+
+        # Die neue Antwort liegt für den nächsten Anlauf bereit
+        self.assertEqual(lernfortschritt.schreibe(self.user.id), 1)
+        self.assertEqual(self.zaehler(), {1: 2, 2: 1})
+
+    def test_fehlschlag_legt_zurueck(self):
+        lernfortschritt.merke(self.user.id, self.a[0].id, True)
+        with mock.patch.object(Protokoll.objects, "bulk_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                lernfortschritt.schreibe(self.user.id)
+        self.assertEqual(lernfortschritt.schreibe(self.user.id), 1)
+
+    def test_liegengebliebene_serie(self):
+        lernfortschritt.merke(self.user.id, self.a[0].id, True)
+        ausgabe = StringIO()
+        call_command("lernfortschritt_schreiben", stdout=ausgabe)
+        self.assertFalse(Protokoll.objects.exists())  # noch jung
+
+        call_command("lernfortschritt_schreiben", "--alter", "0", stdout=ausgabe)
+        self.assertEqual(Protokoll.objects.get(user=self.user).fach, 2)
+        self.assertIn("von 1 Usern", ausgabe.getvalue())
+
+    def test_termin_gesetzt(self):
+        self.spiele("Newton", "Watt", "", "Newton")
+        p = {p.aufgabe.lfd_nr: p for p in Protokoll.objects.filter(user=self.user).select_related("aufgabe")}
+        self.assertLessEqual(p["M021"].faellig, timezone.now())
+        self.assertGreater(p["M020"].faellig, timezone.now() + timedelta(hours=23))
+        self.assertEqual((p["M020"].leichtigkeit, p["M021"].leichtigkeit), (2.6, 2.18))
+
+
+class PlanerTest(TestCase):
+    """Fälligkeit aus Fach und Leichtigkeit, Auswahl über den Index (user, faellig)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user("schueler", password="x")
+        self.thema = ThemenBereich.objects.create(ordnung=1, thema="Mechanik", farbe="blue", kurz="M")
+        k1 = Kapitel.objects.create(thema=self.thema, zeile=1, kapitel="Kraft")
+        k2 = Kapitel.objects.create(thema=self.thema, zeile=2, kapitel="Energie")
+        self.jetzt = timezone.now()
+        self.a = []
+        for i, (kapitel, tage) in enumerate([(k1, -3), (k1, -1), (k2, -2), (k1, 2)]):
+            a = Aufgabe.objects.create(lfd_nr=f"M03{i}", thema=self.thema, kapitel=kapitel, typ="1", loesung="x")
+            Protokoll.objects.create(user=self.user, aufgabe=a, fach=2, faellig=self.jetzt + timedelta(days=tage))
+            self.a.append(a)
+
+    def test_faellige_zuerst(self):
+        ids = faellige_serie(self.user, self.thema, jetzt=self.jetzt)
+        self.assertEqual(ids, [self.a[0].id, self.a[2].id, self.a[1].id])
+        # Kapitel-Bereich wird beachtet
+        self.assertEqual(faellige_serie(self.user, self.thema, end_kap=1, jetzt=self.jetzt), [self.a[0].id, self.a[1].id])
+
+    def test_intervalle(self):
+        self.assertEqual(faellig_am(1, 2.5, self.jetzt), self.jetzt)
+        self.assertEqual(faellig_am(3, 2.5, self.jetzt), self.jetzt + timedelta(days=3))
+        self.assertEqual(faellig_am(3, 1.25, self.jetzt), self.jetzt + timedelta(days=1.5))
+        with self.settings(PHYSIK_PLANER_SM2=False):
+            self.assertEqual(faellig_am(3, 1.25, self.jetzt), self.jetzt + timedelta(days=3))
+        self.assertEqual([neue_leichtigkeit(1.3, False), neue_leichtigkeit(3.0, True)], [1.3, 3.0])
+
+    def test_serie_starten(self):
+        self.client.defaults["HTTP_AUTHORIZATION"] = "Basic " + base64.b64encode(b"einstein:physik").decode()
+        self.client.force_login(self.user)
+        self.client.get(reverse("physik:aufgaben"), {"tb": self.thema.id, "faellig": 1})
+        signer = signing.get_cookie_signer(salt=SERIEN_COOKIE + COOKIE_SALT)
+        stand = SerienStand.entpacke(signer.unsign(self.client.cookies[SERIEN_COOKIE].value))
+        self.assertEqual(stand.aufgaben_ids, [self.a[0].id, self.a[2].id, self.a[1].id])
+
+
+
+class AbfrageplanTest(TestCase):
+    """EXPLAIN QUERY PLAN: keine der heißen Abfragen liest eine ganze Tabelle"""
+
+    def test_keine_tabellen_scans(self):
+        ausgabe = StringIO()
+        call_command("abfrageplan", stdout=ausgabe)
+        self.assertNotIn("SCAN", ausgabe.getvalue())
+
+    def test_scan_erkannt(self):
+        self.assertEqual(
+            tabellen_scans([
+                "SCAN physik_aufgabe", "SCAN TABLE physik_protokoll", "SCAN physik_kapitel",
+                "SCAN physik_fehlerlog USING INDEX fehlerlog_zeit_idx", "SEARCH physik_aufgabe USING INDEX x (thema_id=?)",
+            ]),
+            ["physik_aufgabe", "physik_protokoll"],
+        )
+
+
+class InventarTest(TestCase):
+    """Bestandsliste: Keyset-Blättern über Themen hinweg, konstante Abfragen pro Seite"""
+
+    def setUp(self):
+        self.user = User.objects.create_user("lehrer", password="x", is_staff=True)
+        self.themen = [
+            ThemenBereich.objects.create(ordnung=2, thema="Optik", farbe="green", kurz="O"),
+            ThemenBereich.objects.create(ordnung=1, thema="Mechanik", farbe="blue", kurz="M"),
+        ]
+        for thema in self.themen:
+            kapitel = Kapitel.objects.create(thema=thema, zeile=1, kapitel="Grundlagen")
+            for nr in range(3):
+                Aufgabe.objects.create(lfd_nr=f"{thema.kurz}{nr:03d}", thema=thema, kapitel=kapitel, typ="1", loesung="x")
+
+        self.client.defaults["HTTP_AUTHORIZATION"] = "Basic " + base64.b64encode(b"einstein:physik").decode()
+        self.client.force_login(self.user)
+
+    def nummern(self, antwort):
+        return [a.lfd_nr for a in antwort.context["aufgaben"]]
+
+    def test_vor_und_zurueck(self):
+        url = reverse("physik:aufgaben_liste")
+        seite1 = self.client.get(url, {"n": 4})
+        self.assertEqual(self.nummern(seite1), ["M000", "M001", "M002", "O000"])
+        self.assertIsNone(seite1.context["cursor_zurueck"])
+
+        seite2 = self.client.get(url, {"n": 4, "nach": seite1.context["cursor_weiter"]})
+        self.assertEqual(self.nummern(seite2), ["O001", "O002"])
+        self.assertIsNone(seite2.context["cursor_weiter"])
+
+        zurueck = self.client.get(url, {"n": 4, "vor": seite2.context["cursor_zurueck"]})
+        self.assertEqual(self.nummern(zurueck), ["M000", "M001", "M002", "O000"])
+
+    def test_thema_filter(self):
+        antwort = self.client.get(reverse("physik:aufgaben_liste"), {"thema": self.themen[0].id, "n": 2})
+        self.assertEqual(self.nummern(antwort), ["O000", "O001"])
+        self.assertEqual(antwort.context["cursor_weiter"], "2~O001")
+        self.assertEqual(list(antwort.context["kapitel_liste"]), list(self.themen[0].kapitel.all()))
+
+    def test_ohne_thema_alle_kapitel(self):
+        url = reverse("physik:aufgaben_liste")
+        antwort = self.client.get(url)
+        self.assertEqual([k.thema.thema for k in antwort.context["kapitel_liste"]], ["Mechanik", "Optik"])
+        self.assertContains(antwort, '<optgroup label="Optik">')
+
+        # Kapitel-Filter auch ohne gewähltes Thema
+        kapitel = self.themen[0].kapitel.get()
+        self.assertEqual(self.nummern(self.client.get(url, {"kapitel": kapitel.id})), ["O000", "O001", "O002"])
+
+    def test_abfragen_unabhaengig_von_seitengroesse(self):
+        url = reverse("physik:aufgaben_liste")
+        with CaptureQueriesContext(connection) as klein:
+            self.client.get(url, {"thema": self.themen[1].id, "n": 1})
+        with CaptureQueriesContext(connection) as gross:
+            self.client.get(url, {"thema": self.themen[1].id, "n": 3})
+        self.assertEqual(len(klein), len(gross))
+
+
+class SucheTest(TestCase):
+    """Volltext-Index: per Trigger aktuell (auch bei bulk_create), Treffer nach Relevanz"""
+
+    def setUp(self):
+        self.user = User.objects.create_user("lehrer", password="x", is_staff=True)
+        self.thema = ThemenBereich.objects.create(ordnung=1, thema="Mechanik", farbe="blue", kurz="M")
+        self.kapitel = Kapitel.objects.create(thema=self.thema, zeile=1, kapitel="Kraft")
+        self.newton = Aufgabe.objects.create(
+            lfd_nr="M_Newton", thema=self.thema, kapitel=self.kapitel, typ="1", frage="Einheit der Kraft?", loesung="N"
+        )
+        self.impuls = Aufgabe.objects.create(
+            lfd_nr="M002", thema=self.thema, kapitel=self.kapitel, typ="1", frage="Impuls?", loesung="p",
+            erklaerung="Nach Newton gilt F = dp/dt.",
+        )
+        self.client.defaults["HTTP_AUTHORIZATION"] = "Basic " + base64.b64encode(b"einstein:physik").decode()
+        self.client.force_login(self.user)
+
+    def test_rangfolge(self):
+        self.assertEqual(aufgaben_treffer("newton"), [self.newton.id, self.impuls.id])
+
+    def test_trigger_halten_index_aktuell(self):
+        AufgabeOption.objects.create(aufgabe=self.impuls, position=2, text="Kilogrammmeter")
+        self.assertEqual(aufgaben_treffer("grammmeter"), [self.impuls.id])
+
+        self.impuls.erklaerung = ""
+        self.impuls.save()
+        self.assertEqual(aufgaben_treffer("newton"), [self.newton.id])
+
+        AufgabeOption.objects.filter(aufgabe=self.impuls).delete()
+        self.assertEqual(aufgaben_treffer("grammmeter"), [])
+
+        self.newton.delete()
+        self.assertEqual(aufgaben_treffer("newton"), [])
+
+    def test_fehler_suche(self):
+        # bulk_create wie in lernfortschritt.schreibe: keine Signale, aber Trigger
+        FehlerLog.objects.bulk_create([
+            FehlerLog(aufgabe=self.impuls, eingegebene_antwort="Impulserhaltung"),
+            FehlerLog(aufgabe=self.impuls, eingegebene_antwort="keine Ahnung"),
+        ])
+        antwort = self.client.get(reverse("physik:fehler_liste"), {"q": "erhaltung"})
+        self.assertEqual([l.eingegebene_antwort for l in antwort.context["logs"]], ["Impulserhaltung"])
+        antwort = self.client.get(reverse("physik:fehler_liste"), {"q": "IMPULS?"})
+        self.assertEqual(len(antwort.context["logs"]), 2)
+
+    def test_inventar_suche(self):
+        antwort = self.client.get(reverse("physik:aufgaben_liste"), {"q": "Newton"})
+        self.assertEqual([a.lfd_nr for a in antwort.context["aufgaben"]], ["M_Newton", "M002"])
+        self.assertIsNone(antwort.context["cursor_weiter"])
+
+    def test_inventar_suche_blaettern(self):
+        for nr in range(3):
+            Aufgabe.objects.create(
+                lfd_nr=f"M1{nr}", thema=self.thema, kapitel=self.kapitel, typ="1", frage=f"Newton {'und Newton ' * nr}?", loesung="x"
+            )
+        alle = aufgaben_treffer("newton")
+        self.assertEqual(len(alle), 5)
+
+        url = reverse("physik:aufgaben_liste")
+        seiten, antwort = [], self.client.get(url, {"q": "newton", "n": 2})
+        while True:
+            seiten.append([a.id for a in antwort.context["aufgaben"]])
+            if not antwort.context["cursor_weiter"]:
+                break
+            antwort = self.client.get(url, {"q": "newton", "n": 2, "nach": antwort.context["cursor_weiter"]})
+        self.assertEqual(seiten, [alle[0:2], alle[2:4], alle[4:]])
+
+        zurueck = self.client.get(url, {"q": "newton", "n": 2, "vor": antwort.context["cursor_zurueck"]})
+        self.assertEqual([a.id for a in zurueck.context["aufgaben"]], alle[2:4])
+
+    def test_fehlender_trigger_erkannt_und_repariert(self):
+        self.assertEqual(fehlende_trigger(), [])
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER physik_aufgabe_fts_ai")
+        self.assertEqual(fehlende_trigger(), ["physik_aufgabe_fts_ai"])
+        with self.assertRaisesMessage(CommandError, "physik_aufgabe_fts_ai"):
+            call_command("abfrageplan", stdout=StringIO())
+
+        # Ohne Trigger fehlt die neue Aufgabe im Index - bis zum Neuaufbau
+        neu = Aufgabe.objects.create(lfd_nr="M003", thema=self.thema, kapitel=self.kapitel, typ="1", frage="Hebelgesetz?", loesung="x")
+        self.assertEqual(aufgaben_treffer("hebelgesetz"), [])
+        call_command("suchindex", "--neu", stdout=StringIO())
+        self.assertEqual(fehlende_trigger(), [])
+        self.assertEqual(aufgaben_treffer("hebelgesetz"), [neu.id])
+        self.assertEqual(aufgaben_treffer("newton"), [self.newton.id, self.impuls.id])
+
+    def test_kurzer_begriff(self):
+        self.assertIsNone(aufgaben_treffer("02"))
+        antwort = self.client.get(reverse("physik:aufgaben_liste"), {"q": "02"})
+        self.assertEqual([a.lfd_nr for a in antwort.context["aufgaben"]], ["M002"])
+
+
+class FehlerAnalyseTest(TestCase):
+    """Gruppierte Fehler-Analyse: gleiche Antworten zusammengefasst, Keyset über Aufgaben"""
+
+    def setUp(self):
+        self.user = User.objects.create_user("lehrer", password="x", is_staff=True)
+        thema = ThemenBereich.objects.create(ordnung=1, thema="Mechanik", farbe="blue", kurz="M")
+        kapitel = Kapitel.objects.create(thema=thema, zeile=1, kapitel="Kraft")
+        self.a = [
+            Aufgabe.objects.create(lfd_nr=f"M{nr:03d}", thema=thema, kapitel=kapitel, typ="1", loesung="x")
+            for nr in range(3)
+        ]
+        FehlerLog.objects.bulk_create(
+            [FehlerLog(aufgabe=self.a[0], eingegebene_antwort=t) for t in ["Newton", " newton ", "NEWTON", "Joule"]]
+            + [FehlerLog(aufgabe=self.a[1], eingegebene_antwort="42")]
+            + [FehlerLog(aufgabe=self.a[2], eingegebene_antwort="7")]
+        )
+        self.client.defaults["HTTP_AUTHORIZATION"] = "Basic " + base64.b64encode(b"einstein:physik").decode()
+        self.client.force_login(self.user)
+
+    def test_gruppen(self):
+        seite, zurueck, weiter = gruppiere(FehlerLog.objects.all())
+        self.assertEqual([a.lfd_nr for a in seite], ["M000", "M001", "M002"])
+        self.assertEqual([(g["antwort_norm"], g["anzahl"]) for g in seite[0].antworten], [("newton", 3), ("joule", 1)])
+        self.assertEqual(seite[0].fehler_gesamt, 4)
+        self.assertIsNone(zurueck)
+        self.assertIsNone(weiter)
+
+    def test_umlaute_eine_gruppe(self):
+        # SQLites LOWER faltet nur ASCII, die Normalisierung läuft deshalb in Python
+        FehlerLog.objects.bulk_create([FehlerLog(aufgabe=self.a[1], eingegebene_antwort="WÄRME")])
+        FehlerLog.objects.create(aufgabe=self.a[1], eingegebene_antwort="Wärme ")
+        seite, _, _ = gruppiere(FehlerLog.objects.all())
+        self.assertEqual([(g["antwort_norm"], g["anzahl"]) for g in seite[1].antworten], [("wärme", 2), ("42", 1)])
+
+    def test_blaettern(self):
+        seite, _, weiter = gruppiere(FehlerLog.objects.all(), anzahl=2)
+        self.assertEqual([a.lfd_nr for a in seite], ["M000", "M001"])
+        seite, zurueck, weiter = gruppiere(FehlerLog.objects.all(), nach=weiter, anzahl=2)
+        self.assertEqual([a.lfd_nr for a in seite], ["M002"])
+        self.assertIsNone(weiter)
+        seite, zurueck, _ = gruppiere(FehlerLog.objects.all(), vor=zurueck, anzahl=2)
+        self.assertEqual([a.lfd_nr for a in seite], ["M000", "M001"])
+        self.assertIsNone(zurueck)
+
+    def test_ansicht(self):
+        antwort = self.client.get(reverse("physik:fehler_liste"), {"ansicht": "gruppiert", "q": "newton"})
+        self.assertEqual([a.lfd_nr for a in antwort.context["gruppen"]], ["M000"])
+        self.assertContains(antwort, "newton")
+
+
+class FehlerVerdichtenTest(TestCase):
+    """Alte FehlerLog-Einträge wandern als Zähler in FehlerSumme, die Analyse zählt sie weiter mit"""
+
+    def setUp(self):
+        thema = ThemenBereich.objects.create(ordnung=1, thema="Mechanik", farbe="blue", kurz="M")
+        kapitel = Kapitel.objects.create(thema=thema, zeile=1, kapitel="Kraft")
+        self.aufgabe = Aufgabe.objects.create(lfd_nr="M001", thema=thema, kapitel=kapitel, typ="1", loesung="x")
+        self.alt = timezone.now() - timedelta(days=200)
+
+    def logs(self, *antworten, zeitpunkt=None):
+        neue = FehlerLog.objects.bulk_create([FehlerLog(aufgabe=self.aufgabe, eingegebene_antwort=a) for a in antworten])
+        if zeitpunkt:
+            FehlerLog.objects.filter(id__in=[l.id for l in neue]).update(zeitpunkt=zeitpunkt)
+
+    def test_verdichten(self):
+        self.logs("Newton", "newton ", "Joule", zeitpunkt=self.alt)
+        self.logs("Newton")
+        call_command("fehler_verdichten", "--tage", "90", "--block", "2", stdout=StringIO())
+
+        self.assertEqual(FehlerLog.objects.count(), 1)
+        self.assertEqual(
+            sorted(FehlerSumme.objects.values_list("antwort", "anzahl")), [("joule", 1), ("newton", 2)]
+        )
+
+        # Zweiter Lauf addiert in der Datenbank auf die bestehende Zeile (ohne sie vorher zu lesen)
+        self.logs("NEWTON", zeitpunkt=self.alt - timedelta(days=1))
+        with CaptureQueriesContext(connection) as abfragen:
+            call_command("fehler_verdichten", "--tage", "90", stdout=StringIO())
+        self.assertFalse([q for q in abfragen if q["sql"].startswith("SELECT") and "physik_fehlersumme" in q["sql"]])
+        summe = FehlerSumme.objects.get(antwort="newton")
+        self.assertEqual(summe.anzahl, 3)
+        self.assertEqual(summe.erster, self.alt - timedelta(days=1))
+        self.assertEqual(summe.letzter, self.alt)
+
+    def test_analyse_mit_summen(self):
+        self.logs("Newton", "Joule", zeitpunkt=self.alt)
+        verdichte(timezone.now() - timedelta(days=90))
+        self.logs("Newton")
+        seite, _, _ = gruppiere(FehlerLog.objects.all(), FehlerSumme.objects.all())
+        self.assertEqual(
+            [(g["antwort_norm"], g["anzahl"], bool(g["beispiel_id"])) for g in seite[0].antworten],
+            [("newton", 2, True), ("joule", 1, False)],
+        )
+
+
+class BearbeitungTest(TestCase):
+    """fehler_edit: Options-Diff gebündelt in einer Transaktion, eine Benachrichtigung"""
+
+    def setUp(self):
+        self.user = User.objects.create_user("lehrer", password="x", is_staff=True)
+        thema = ThemenBereich.objects.create(ordnung=1, thema="Mechanik", farbe="blue", kurz="M")
+        kapitel = Kapitel.objects.create(thema=thema, zeile=1, kapitel="Kraft")
+        self.aufgabe = Aufgabe.objects.create(
+            lfd_nr="M001", thema=thema, kapitel=kapitel, typ="1o2o3", frage="Einheit?", loesung="Newton",
+            inhalt_hash="abc",
+        )
+        self.opt = [
+            AufgabeOption.objects.create(aufgabe=self.aufgabe, position=pos, text=text)
+            for pos, text in [(2, "Joule"), (3, "Watt")]
+        ]
+        self.log = FehlerLog.objects.create(aufgabe=self.aufgabe, eingegebene_antwort="Watt")
+        Benachrichtigung.objects.all().delete()
+        Aufgabe.objects.filter(pk=self.aufgabe.pk).update(inhalt_hash="abc")
+        self.client.defaults["HTTP_AUTHORIZATION"] = "Basic " + base64.b64encode(b"einstein:physik").decode()
+        self.client.force_login(self.user)
+
+    def post(self, **daten):
+        felder = {"typ": "1o2o3", "frage": "Einheit?", "antwort": "Newton", "anmerkung": "", "erklaerung": "", "hilfe": ""}
+        felder.update(daten)
+        return self.client.post(reverse("physik:fehler_edit", args=[self.log.id]), felder)
+
+    def test_options_diff(self):
+        with CaptureQueriesContext(connection) as abfragen:
+            self.post(**{
+                "frage": "Welche Einheit?",
+                f"opt_{self.opt[0].id}": "Pascal",
+                f"opt_{self.opt[1].id}": "",
+                "new_opt_1": "Volt", "new_opt_2": " ", "new_opt_3": "Ampere",
+            })
+        self.assertEqual(
+            list(self.aufgabe.optionen.order_by("position").values_list("position", "text")),
+            [(2, "Pascal"), (4, "Volt"), (5, "Ampere")],
+        )
+        self.aufgabe.refresh_from_db()
+        self.assertEqual(self.aufgabe.frage, "Welche Einheit?")
+        self.assertEqual(self.aufgabe.inhalt_hash, "")
+        self.assertEqual(Benachrichtigung.objects.count(), 1)
+        self.assertFalse(FehlerLog.objects.filter(id=self.log.id).exists())
+        # Keine Abfrage pro Option
+        self.assertEqual(sum('"physik_aufgabeoption"' in q["sql"] and q["sql"].startswith("SELECT") for q in abfragen), 2)
+
+    def test_feld_leert_pruefsumme(self):
+        self.post(frage="Welche Einheit?")
+        self.aufgabe.refresh_from_db()
+        self.assertEqual(self.aufgabe.frage, "Welche Einheit?")
+        self.assertEqual(self.aufgabe.inhalt_hash, "")
+
+    def test_nur_optionen(self):
+        self.post(**{f"opt_{self.opt[0].id}": "Pascal"})
+        self.assertEqual(Benachrichtigung.objects.count(), 1)
+        self.assertEqual(AufgabeOption.objects.get(id=self.opt[0].id).text, "Pascal")
+
+    def test_fremde_option_bleibt(self):
+        fremd = Aufgabe.objects.create(
+            lfd_nr="M002", thema=self.aufgabe.thema, kapitel=self.aufgabe.kapitel, typ="1", loesung="x"
+        )
+        option = AufgabeOption.objects.create(aufgabe=fremd, position=2, text="bleibt")
+        Benachrichtigung.objects.all().delete()
+        self.post(**{f"opt_{option.id}": ""})
+        self.assertTrue(AufgabeOption.objects.filter(id=option.id).exists())
+        self.assertEqual(Benachrichtigung.objects.count(), 0)
+
+
+class AdminOptionenTest(TestCase):
+    """Admin-Inline: neue Optionen (Position schreibgeschützt) werden hinten angehängt"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", password="x")
+        thema = ThemenBereich.objects.create(ordnung=1, thema="Mechanik", farbe="blue", kurz="M")
+        kapitel = Kapitel.objects.create(thema=thema, zeile=1, kapitel="Kraft")
+        self.aufgabe = Aufgabe.objects.create(
+            lfd_nr="M001", thema=thema, kapitel=kapitel, typ="1o2", frage="Träge Größe?", loesung="Trägheit",
+        )
+        AufgabeOption.objects.create(aufgabe=self.aufgabe, position=2, text="Masse")
+        self.client.defaults["HTTP_AUTHORIZATION"] = "Basic " + base64.b64encode(b"einstein:physik").decode()
+        self.client.force_login(self.admin)
+
+    def formulardaten(self, url):
+        # Alle Felder so, wie die Änderungsseite sie anzeigt (inkl. Inline-Management-Forms)
+        kontext = self.client.get(url).context
+        daten = {}
+        formulare = [kontext["adminform"].form]
+        for inline in kontext["inline_admin_formsets"]:
+            formulare += [inline.formset.management_form, *inline.formset.forms]
+        for form in formulare:
+            for feld in form:
+                wert = feld.value()
+                if wert is None or wert is False:
+                    continue
+                daten[feld.html_name] = wert.pk if hasattr(wert, "pk") else wert
+        return daten
+
+    def test_neue_option_bekommt_position(self):
+        url = reverse("admin:physik_aufgabe_change", args=[self.aufgabe.id])
+        daten = self.formulardaten(url)
+        daten["optionen-1-text"] = "Energie"  # die leere Extra-Zeile
+        antwort = self.client.post(url, daten)
+        self.assertEqual(antwort.status_code, 302)
+
+        self.assertEqual(
+            list(self.aufgabe.optionen.values_list("text", "position")), [("Masse", 2), ("Energie", 3)]
+        )
+        self.assertTrue(bewerte(Aufgabe.objects.get(pk=self.aufgabe.pk), "Masse").richtig)
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from . import views
+from . import views, api
 
 app_name = "physik"
 
@@ -11,6 +11,9 @@ urlpatterns = [
     path('view-einstellung/<str:slug>/', views.update_view_settings, name='update_view_settings'),
     path('row-einstellung/<str:slug>/', views.update_row_settings, name='update_row_settings'),
     path("aufgaben/", views.aufgaben, name="aufgaben"),
+    path("api/serie/start/", api.serie_start, name="api_serie_start"),
+    path("api/serie/aufgabe/", api.serie_aufgabe, name="api_serie_aufgabe"),
+    path("api/serie/antwort/", api.serie_antwort, name="api_serie_antwort"),
     path('inventar/', views.aufgaben_liste, name='aufgaben_liste'),
     path('aufgabe/<int:pk>/', views.aufgabe_einstellungen, name='aufgabe_einstellungen'),
     path('analyse/', views.fehler_liste, name='fehler_liste'),
@@ -1,20 +1,23 @@
-import random
 
 from django.contrib import messages
 from django.contrib.messages import get_messages
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
-from django.db.models import Count
+from django.http import HttpResponse, JsonResponse
+from django.db import transaction
+from django.db.models import Q
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import user_passes_test, login_required
 
-from .bewertung import bewerte_aufgabe
-from .models import ThemenBereich, Kapitel, Aufgabe, FehlerLog, AufgabeOption, Profil
+from . import lernfortschritt
+from .inventar import blaettere, seitengroesse
+from .suche import blaettere_treffer, aufgaben_filter, fehler_filter
+from .fehleranalyse import gruppiere
+from .bearbeitung import speichere_aufgabe
+from .quiz import serie_aus_parametern, bereite_anzeige, verarbeite_antwort, verbuche, melde
+from .aufgabendaten import lade_aufgabe
+from .seriestand import SerienStand, COOKIE_NAME as SERIEN_COOKIE
+from .models import ThemenBereich, Kapitel, Aufgabe, FehlerLog, FehlerSumme, Profil, LernstandZaehler
 
-from django.db.models import Count, Q
-from .models import ThemenBereich, Aufgabe, Protokoll
-
-from django.http import JsonResponse
 
 def ist_mitarbeiter(user):
     return user.is_staff
@@ -42,10 +45,6 @@ def berechne_sperre(total, f1_bestand, f2_bestand, ziel_fach, f3_bestand=0):
         return bestand, ready, hint
 
 def index(request):
-    # Reset Session
-    for k in ("aufgaben_ids", "index", "p_richtig", "letzte_antwort", "warte_auf_weiter"):
-        request.session.pop(k, None)
-
     themenbereiche = ThemenBereich.objects.filter(eingeblendet=True).prefetch_related("kapitel").order_by("ordnung")
 
     # 1. Die kapitel_map für das JavaScript-Modal
@@ -54,38 +53,33 @@ def index(request):
             for tb in themenbereiche
         }
 
-    # 2. Alle Aufgaben zählen (Gesamtbestand)
-    qs_gesamt = (
-        Aufgabe.objects.filter(thema__in=themenbereiche)
-        .values("thema_id", "kapitel_id", "schwierigkeit")
-        .annotate(cnt=Count("id"))
-    )
+    # 2. Alle Aufgaben zählen (Gesamtbestand, gecacht - siehe Aufgabe.bestand)
+    bestand = Aufgabe.bestand()
+    sichtbar = {tb.id for tb in themenbereiche}
 
     # 3. Lernstand des Users abrufen (nur wenn eingeloggt)
     user_protokoll = {}
     profil = None
     if request.user.is_authenticated:
         profil, created = Profil.objects.get_or_create(user=request.user)
+        # Vorgemerkten Fortschritt (abgebrochene Serie) schreiben, bevor gezählt wird
+        lernfortschritt.schreibe(request.user.pk)
+        # Vorberechnete Zähler (LernstandZaehler) statt Count über das ganze Protokoll
         qp = (
-            Protokoll.objects.filter(user=request.user, aufgabe__thema__in=themenbereiche)
-            .values("aufgabe__thema_id", "aufgabe__kapitel_id", "aufgabe__schwierigkeit", "fach")
-            .annotate(cnt=Count("id"))
+            LernstandZaehler.objects.filter(user=request.user, thema__in=themenbereiche, anzahl__gt=0)
+            .values_list("thema_id", "kapitel_id", "schwierigkeit", "fach", "anzahl")
         )
-        for r in qp:
-            t_id = r["aufgabe__thema_id"]
-            k_id = r["aufgabe__kapitel_id"]
-            s = str(r["aufgabe__schwierigkeit"])
-            f = r["fach"]
+        for t_id, k_id, schw, f, cnt in qp:
+            s = str(schw)
             user_protokoll.setdefault(t_id, {}).setdefault(k_id, {}).setdefault(s, {})
-            user_protokoll[t_id][k_id][s][f] = r["cnt"]
+            user_protokoll[t_id][k_id][s][f] = cnt
 
     # 4. Counts-Dict aufbauen
     counts = {}
-    for r in qs_gesamt:
-        t_id = r["thema_id"]
-        k_id = r["kapitel_id"]
-        s = str(r["schwierigkeit"])
-        gesamt = r["cnt"]
+    for (t_id, k_id, schw), gesamt in bestand.items():
+        if t_id not in sichtbar:
+            continue
+        s = str(schw)
 
         p_data = user_protokoll.get(t_id, {}).get(k_id, {}).get(s, {})
         f2 = p_data.get(2, 0) # Fach 1 (in deiner Logik '2')
@@ -155,13 +149,17 @@ def index(request):
         t_stats["sum_all"] = t_stats["sum_em"] + t_stats["s3"]["total"]
         tb_totals[tb.id] = t_stats
 
-    return render(request, "physik/index.html", {
+    response = render(request, "physik/index.html", {
             "themenbereiche": themenbereiche,
             "counts": counts,
             "tb_totals": tb_totals, # <--- WICHTIG: Muss in den Context!
             "kapitel_map": kapitel_map,
             'profil': profil,
         })
+    # Reset: laufende Serie beenden
+    if SERIEN_COOKIE in request.COOKIES:
+        SerienStand.loesche(response)
+    return response
 
 def force_logout(request):
     logout(request)
@@ -213,276 +211,63 @@ def update_row_settings(request, slug):
     
 @login_required
 def aufgaben(request):
-    anmerkung_fuer_template = ""
-    
     # NEU: Wenn 'tb' in der URL steht, wollen wir IMMER eine neue Serie starten,
-    # auch wenn 'aufgaben_ids' schon in der Session existieren.
+    # auch wenn schon eine Serie läuft.
     if request.GET.get("tb"):
-        # 0. Vorbereitung: Alte Session & Messages aufräumen
-        for k in ("aufgaben_ids", "index", "p_richtig", "letzte_antwort", "warte_auf_weiter"):
-            request.session.pop(k, None)
-        
+        # 0. Vorbereitung: Alte Messages aufräumen (der Serien-Stand wird unten ersetzt)
         storage = get_messages(request)
         for message in storage: pass
 
-        # 1. Parameter aus GET holen
-        tb_id = request.GET.get("tb")
-        level_param = request.GET.get("level", "3") # Standard 3
-        bis_kap_zeile = request.GET.get("bis_kap")
-        
-        # Diese bleiben für das Overlay wichtig:
-        start_kap = int(request.GET.get("start", 0))
-        end_kap = int(request.GET.get("end", 999))
-        fach_int = int(request.GET.get("fach", 1))
-
-        # 2. Grundfilterung
-        thema = ThemenBereich.objects.get(id=tb_id)
-        aufgaben_qs = Aufgabe.objects.filter(thema=thema)
-
-        # --- NEU: Kapitel-Logik unterscheiden ---
-        
-        # Fall A: Das Thema ist als "kapitel_unabhaengig" markiert (z.B. Sonstige)
-        if thema.kapitel_unabhaengig:
-            if bis_kap_zeile:
-                # Nur EXAKT dieses Kapitel (keine kumulative Summe)
-                aufgaben_qs = aufgaben_qs.filter(kapitel__zeile=int(bis_kap_zeile))
-            else:
-                # Bereich bleibt wie gewählt (meist nur ein Kapitel im Overlay)
-                aufgaben_qs = aufgaben_qs.filter(
-                    kapitel__zeile__gte=start_kap,
-                    kapitel__zeile__lte=end_kap
-                )
-        
-        # Fall B: Normales Verhalten (Physik-Themen: Aufbauend/Kumulativ)
-        else:
-            if bis_kap_zeile:
-                # Weg über die Index-Tabelle (kumulativ: alle bis hierhin)
-                aufgaben_qs = aufgaben_qs.filter(kapitel__zeile__lte=int(bis_kap_zeile))
-            else:
-                # Klassischer Weg über das Overlay (Bereich)
-                aufgaben_qs = aufgaben_qs.filter(
-                    kapitel__zeile__gte=start_kap,
-                    kapitel__zeile__lte=end_kap
-                )
-
-        # --- NEU: Level-Logik (kumuliert für 1,2 etc.) ---
-        if isinstance(level_param, str) and "," in level_param:
-            levels = [int(l) for l in level_param.split(",")]
-            aufgaben_qs = aufgaben_qs.filter(schwierigkeit__in=levels)
-        else:
-            aufgaben_qs = aufgaben_qs.filter(schwierigkeit__lte=int(level_param))
-
-        # 3. Spezifische Fach-Filterung (DEIN BESTEHENDER CODE)
-        if fach_int == 1: 
-            aufgaben_qs = aufgaben_qs.filter(
-                Q(protokoll__user=request.user, protokoll__fach=1) | 
-                ~Q(protokoll__user=request.user)
-            ).distinct()
-        else:
-            aufgaben_qs = aufgaben_qs.filter(
-                protokoll__user=request.user, 
-                protokoll__fach=fach_int
-            )
+        # Reste einer abgebrochenen Serie schreiben, damit die Auswahl sie sieht
+        lernfortschritt.schreibe(request.user.pk)
 
-        # 3. Spezifische Fach-Filterung
-        # fach_int kommt oben aus request.GET.get("fach")
-        if fach_int == 1: 
-            # Zeigt nur Aufgaben, die noch "neu" sind oder explizit in Fach 1 liegen
-            aufgaben_qs = aufgaben_qs.filter(
-                Q(protokoll__user=request.user, protokoll__fach=1) | 
-                ~Q(protokoll__user=request.user)
-            ).distinct()
-        else:
-            # Filtert exakt auf Fach 2, 3 oder 4
-            aufgaben_qs = aufgaben_qs.filter(
-                protokoll__user=request.user, 
-                protokoll__fach=fach_int
-            )
-            
-        # 4. IDs extrahieren & initialisieren
-        all_ids = list(aufgaben_qs.values_list("id", flat=True))
+        # 1. Serie aus den GET-Parametern in einer Abfrage auswählen (Filter + Zufall in der DB)
+        all_ids = serie_aus_parametern(request.user, request.GET)
         
         if not all_ids:
             messages.info(request, f"Keine Aufgaben in diesem Bereich gefunden.")
             return redirect('physik:index')
 
-        random.shuffle(all_ids)
-        request.session["aufgaben_ids"] = all_ids[:10]
-        request.session["index"] = 0
-        request.session["warte_auf_weiter"] = False
-        
         # WICHTIG: Redirect auf die URL ohne Parameter, damit ein Refresh 
         # nicht die Serie neu startet
-        return redirect("physik:aufgaben")
+        return SerienStand(all_ids).speichere(request, redirect("physik:aufgaben"))
     
-    # 7. Aktuellen Stand aus der Session holen
-    ids_in_session = request.session.get("aufgaben_ids", [])
-    index = request.session.get("index", 0)
+    # 7. Aktuellen Stand aus dem Serien-Cookie holen
+    stand = SerienStand.aus_request(request)
 
     # 8. Check: Serie beendet?
-    if index >= len(ids_in_session):
-        for k in ("aufgaben_ids", "index", "p_richtig", "letzte_antwort", "warte_auf_weiter"):
-            request.session.pop(k, None)
-        return redirect("physik:index")
+    if stand.beendet:
+        return SerienStand.loesche(redirect("physik:index"))
 
-    # 9. Aktuelle Aufgabe laden
-    aufgabe = Aufgabe.objects.get(id=ids_in_session[index])
-    
-# -------- Medien (Bilder & Videos) --------
-    bilder_anzeige = None
-    
-    # Wir holen die Bilder/Videos immer, wenn welche da sind
-    bilder = list(aufgabe.bilder.order_by("position"))
-    
-    if bilder:
-        # ---- Fall 1: Echte Bildfrage (Typ enthält 'p') ----
-        if "p" in aufgabe.typ:
-            # Nur bei Typ genau 'p' setzen wir die richtige Bild-Antwort
-            if aufgabe.typ == "p":
-                p_richtig = bilder[0].id
-                request.session["p_richtig"] = p_richtig
-            
-            # Bilder mischen, damit das richtige nicht immer an Platz 1 steht
-            random.shuffle(bilder)
-        
-        # ---- Fall 2: Illustration / Video (z.B. Typ 'a' oder 'va') ----
-        else:
-            request.session.pop("p_richtig", None)
-            # Bei Videos oder normalen Illustrationen NICHT mischen? 
-            # Meistens will man Videos an Position 1 behalten.
-            pass 
-
-        bilder_anzeige = bilder
-
-    optionen_liste = []
-    anzeigen = []
-    if "r" in aufgabe.typ:
-        # 1. Optionen nach Position sortiert holen
-        optionen = aufgabe.optionen.all().order_by('position')
-        
-        if optionen.exists():
-            # 2. Anzahl der Werte aus der ersten Option ermitteln
-            # Wir splitten den Text und zählen die Elemente
-            erstes_opt_text = optionen[0].text
-            anzahl_werte = len(erstes_opt_text.split(';'))
-
-            # 3. Zufallsindex bestimmen
-            # Wir versuchen den Index aus der Session zu holen, damit er stabil bleibt
-            idx = request.session.get('aktiver_index')
-            
-            # Falls kein Index da ist oder er nicht mehr zu den Daten passt, neu würfeln
-            if idx is None or idx >= anzahl_werte:
-                idx = random.randrange(anzahl_werte)
-                request.session['aktiver_index'] = idx
-
-            # 4. Die Werte-Liste für .format() zusammenstellen
-            # Wir nehmen von jeder Option den Wert an der Stelle 'idx'
-            auswahl_liste = []
-            for opt in optionen:
-                werte = [v.strip() for v in opt.text.split(';')]
-                if idx < len(werte):
-                    auswahl_liste.append(werte[idx])
-                else:
-                    # Fallback, falls eine Liste mal kürzer ist
-                    auswahl_liste.append("???")
-
-            # 5. Fragetext formatieren
-            # Hier werden {0}, {1}, {2} etc. durch die Liste ersetzt
-            try:
-                # Wichtig: Der Stern * entpackt die Liste für die Positions-Platzhalter
-                aufgabe.frage = aufgabe.frage.format(*auswahl_liste)
-            except (IndexError, TypeError):
-                # Falls die Anzahl der {} im Text nicht zur Anzahl der Optionen passt
-                pass
-
-    if "a" in aufgabe.typ:
-        # Wir bauen eine Liste aus (Index, Text) Paaren
-        optionen_liste = [(0, aufgabe.loesung)] # Index 0 ist immer die richtige Antwort
-        for i, o in enumerate(aufgabe.optionen.order_by("position"), start=1):
-            optionen_liste.append((i, o.text))
-        random.shuffle(optionen_liste)
-
-    # Spezialfall: Überschreibe für Typ 'e'
-    elif "e" in (aufgabe.typ or "").lower():
-        anmerkung_fuer_template = "Bitte beide Begriffe mit ';' oder '...' trennen."
+    # 9. Aktuelle Aufgabe laden (mit Optionen & Medien, feste Anzahl Abfragen)
+    aufgabe = lade_aufgabe(stand.aktuelle_id)
+    anzeige = bereite_anzeige(aufgabe, stand.aktiver_index)
+    stand.aktiver_index = anzeige.variante
 
     # -------- POST --------
     if request.method == "POST":
-        # Hier definierst du 'antwort'
         antwort = request.POST.get("user_antwort") or request.POST.get("antwort", "")
         bild_antwort = request.POST.get("bild_antwort")
 
-        # ---- Skip ----
-        if not antwort and not bild_antwort:# and not request.session.get("warte_auf_weiter"):
-            if not request.session.get("warte_auf_weiter"):
-                messages.info(request, "Letzte Aufgabe übersprungen.")
-            request.session["index"] += 1
-            request.session.pop('aktiver_index', None)
-            request.session["warte_auf_weiter"] = False
-            request.session.pop("letzte_antwort", None)
-            return redirect("physik:aufgaben")
-        
-        ergebnis = bewerte_aufgabe(
-            request,
-            aufgabe,
-            antwort,
-            text_antwort=antwort,
-            bild_antwort=bild_antwort,
-            session=request.session,
-        )
-
-        # ---- richtig ----
-        if ergebnis.get("richtig"):
-            messages.success(request, ergebnis.get("hinweis", "Richtig!"))
-            request.session["index"] += 1
-            request.session.pop('aktiver_index', None)
-            request.session["warte_auf_weiter"] = False
-            request.session.pop("letzte_antwort", None)
-
-        # ---- ungültig ----
-        elif ergebnis.get("ungueltig"):
-            messages.warning(request, ergebnis["hinweis"])
-            request.session["warte_auf_weiter"] = False
-            request.session.pop("letzte_antwort", None)
-
-        # ---- falsch ----
-        else:
-            hinweis_text = ergebnis.get("hinweis", "Leider falsch.")
-            
-            # Wir hängen den Standard-Text NICHT an bei:
-            # 'p' (Bilder) und 'a' (Listen/Auswahl), weil diese eigene Formate haben.
-            if aufgabe.typ not in ["p", "a", "r"]:
-                hinweis_text = (
-                    f"{hinweis_text} "
-                    f"Deine Eingabe: »{antwort}« | "
-                    f"Richtige Lösung: »{aufgabe.loesung}«"
-                )
-            
-            # Die Begründung/Erklärung anhängen
-            if aufgabe.erklaerung and aufgabe.erklaerung not in hinweis_text:
-                # Nutze <br> für HTML-Umbrüche, falls dein Template das rendert
-                hinweis_text += f"<br><br><strong>Begründung:</strong> {aufgabe.erklaerung}"
-            
-            messages.warning(request, hinweis_text)
-            
-            request.session["warte_auf_weiter"] = True
-            request.session["letzte_antwort"] = antwort
-
-        return redirect("physik:aufgaben")
+        ergebnis = verarbeite_antwort(stand, anzeige.aufgabe, antwort, bild_antwort)
+        verbuche(request.user, aufgabe.id, ergebnis, antwort or bild_antwort, stand)
+        melde(request, ergebnis)
+        return stand.speichere(request, redirect("physik:aufgaben"))
 
     # -------- GET anzeigen --------
-    return render(request, "physik/aufgabe.html", {
-        "aufgabe": aufgabe,
-        "anmerkung": anmerkung_fuer_template,
-        "anzeigen": anzeigen,
-        "bilder": bilder_anzeige,
-        "auswahl_optionen": optionen_liste,
-        "fragenummer": index + 1,
-        "anzahl": len(ids_in_session),
-        "warte_auf_weiter": request.session.get("warte_auf_weiter", False),
-        "letzte_antwort": request.session.get("letzte_antwort", "") 
-            if request.session.get("warte_auf_weiter") else "",
+    response = render(request, "physik/aufgabe.html", {
+        "aufgabe": anzeige.aufgabe,
+        "anmerkung": anzeige.anmerkung,
+        "anzeigen": [],
+        "bilder": anzeige.bilder or None,
+        "auswahl_optionen": anzeige.auswahl_optionen,
+        "fragenummer": stand.index + 1,
+        "anzahl": len(stand.aufgaben_ids),
+        "warte_auf_weiter": stand.warte_auf_weiter,
+        "letzte_antwort": stand.letzte_antwort if stand.warte_auf_weiter else "",
     })
+    # Nur der beim GET gewürfelte Rechen-Index muss zurückgeschrieben werden
+    return stand.speichere(request, response)
 
 @user_passes_test(ist_mitarbeiter)
 def aufgaben_liste(request):
@@ -491,29 +276,54 @@ def aufgaben_liste(request):
     kapitel_id = request.GET.get('kapitel')
     suche = request.GET.get('q') # Das neue Suchfeld abgreifen
 
-    # Kapitel für den Filter laden
+    # Kapitel für den Filter laden (ohne Thema alle, im Template nach Thema gruppiert)
     if thema_id:
-        kapitel_liste = Kapitel.objects.filter(thema_id=thema_id).order_by('zeile')
+        kapitel_liste = Kapitel.objects.filter(thema_id=thema_id).select_related('thema').order_by('zeile')
     else:
-        kapitel_liste = Kapitel.objects.all().order_by('thema', 'zeile')
+        kapitel_liste = Kapitel.objects.select_related('thema').order_by('thema__ordnung', 'thema', 'zeile')
 
-    # Basis-Abfrage
-    aufgaben = Aufgabe.objects.select_related('kapitel__thema').all().order_by('kapitel__thema', 'lfd_nr')
+    # Basis-Abfrage (Reihenfolge Thema-Ordnung, lfd_nr macht blaettere())
+    aufgaben = Aufgabe.objects.select_related('thema', 'kapitel')
     
     # Filterung nach Thema/Kapitel
     if thema_id:
-        aufgaben = aufgaben.filter(kapitel__thema_id=thema_id)
+        aufgaben = aufgaben.filter(thema_id=thema_id)
     if kapitel_id:
         aufgaben = aufgaben.filter(kapitel_id=kapitel_id)
         
-    # NEU: Die Suche nach dem Namenskürzel oder Text
-    if suche:
-        aufgaben = aufgaben.filter(lfd_nr__icontains=suche)
+    groesse = seitengroesse(request.GET.get('n'))
+
+    # Suche über Nummer und Aufgabentexte: die besten Treffer zuerst (Volltext-Index)
+    treffer = blaettere_treffer(
+        suche, thema_id, kapitel_id, nach=request.GET.get('nach'), vor=request.GET.get('vor'), groesse=groesse,
+    ) if suche else None
+    if treffer is not None:
+        ids, zurueck, weiter = treffer
+        gefunden = aufgaben.in_bulk(ids)
+        seite = [gefunden[i] for i in ids if i in gefunden]
+    else:
+        if suche:
+            aufgaben = aufgaben.filter(aufgaben_filter(suche))
+        # Seitenweise per Keyset (konstante Kosten pro Seite)
+        seite, zurueck, weiter = blaettere(
+            aufgaben, nach=request.GET.get('nach'), vor=request.GET.get('vor'), groesse=groesse,
+            themen=[thema_id] if thema_id else None,
+        )
+
+    # Filter in den Blätter-Links beibehalten
+    filter_params = request.GET.copy()
+    for key in ('nach', 'vor'):
+        filter_params.pop(key, None)
+
     return render(request, 'physik/aufgaben_liste.html', {
-        'aufgaben': aufgaben,
+        'aufgaben': seite,
         'themenbereiche': themenbereiche,
         'kapitel_liste': kapitel_liste,
         'suche': suche, # Damit das Suchwort im Feld stehen bleibt
+        'groesse': groesse,
+        'cursor_zurueck': zurueck,
+        'cursor_weiter': weiter,
+        'filter_query': filter_params.urlencode(),
     })
 
 @user_passes_test(ist_mitarbeiter)
@@ -531,14 +341,7 @@ def call(request, lfd_nr):
             aufgabe = Aufgabe.objects.get(lfd_nr__iexact=lfd_nr)
         except Aufgabe.DoesNotExist:
             return HttpResponse(f"Aufgabe mit der Bezeichnung '{lfd_nr}' wurde nicht gefunden.")
-    request.session.pop('aktiver_index', None)
-
-    request.session["aufgaben_ids"] = [aufgabe.id]
-    request.session["index"] = 0
-    request.session["warte_auf_weiter"] = False
-    request.session.pop("letzte_antwort", None)
-
-    return redirect("physik:aufgaben")
+    return SerienStand([aufgabe.id]).speichere(request, redirect("physik:aufgaben"))
 
 @user_passes_test(ist_mitarbeiter)
 def fehler_liste(request):
@@ -546,6 +349,7 @@ def fehler_liste(request):
     logs = FehlerLog.objects.all().select_related('aufgabe__thema', 'aufgabe__kapitel')
     # --- NEU: Sortierung ---
     sort = request.GET.get('sort', '-id')  # Standard: Neueste Fehlermeldungen oben
+    ansicht = request.GET.get('ansicht', 'einzeln')  # 'gruppiert': häufigste Antworten pro Aufgabe
     if sort == 'fachlich':
         # Sortiert nach Thema-Reihenfolge -> Kapitel-Reihenfolge -> Aufgabennummer
         #logs = logs.order_by('aufgabe__thema__ordnung', 'aufgabe__kapitel__ordnung', 'aufgabe__lfd_nr')
@@ -553,14 +357,10 @@ def fehler_liste(request):
 
     else:
         logs = logs.order_by('-id')
-    # 1. Suche (lfd_nr oder Frage)
+    # 1. Suche (lfd_nr, Aufgabentexte oder Antwort; Volltext-Index)
     q = request.GET.get('q')
     if q:
-        logs = logs.filter(
-            Q(aufgabe__lfd_nr__icontains=q) | 
-            Q(aufgabe__frage__icontains=q) |
-            Q(eingegebene_antwort__icontains=q)
-        )
+        logs = logs.filter(fehler_filter(q))
 
     # 2. Filter nach Thema
     thema_id = request.GET.get('thema')
@@ -585,7 +385,31 @@ def fehler_liste(request):
         's_kapitel': int(kapitel_id) if kapitel_id else None,
         'query': q or '',
         'sort': sort,
+        'ansicht': ansicht,
     }
+
+    # 4. Gruppierte Ansicht: gleiche Antworten pro Aufgabe zusammengefasst, seitenweise
+    if ansicht == 'gruppiert':
+        # Verdichtete ältere Fehler (FehlerSumme) mit denselben Filtern dazunehmen
+        summen = FehlerSumme.objects.all()
+        if q:
+            summen = summen.filter(aufgaben_filter(q, prefix='aufgabe__') | Q(antwort__icontains=q))
+        if thema_id:
+            summen = summen.filter(aufgabe__thema_id=thema_id)
+        if kapitel_id:
+            summen = summen.filter(aufgabe__kapitel_id=kapitel_id)
+        gruppen, zurueck, weiter = gruppiere(
+            logs, summen, nach=request.GET.get('nach'), vor=request.GET.get('vor')
+        )
+        filter_params = request.GET.copy()
+        for key in ('nach', 'vor'):
+            filter_params.pop(key, None)
+        context.update({
+            'gruppen': gruppen,
+            'cursor_zurueck': zurueck,
+            'cursor_weiter': weiter,
+            'filter_query': filter_params.urlencode(),
+        })
     return render(request, 'physik/fehler_liste.html', context)
 
 @user_passes_test(ist_mitarbeiter)
@@ -600,48 +424,29 @@ def fehler_edit(request, log_id):
             FehlerLog.objects.filter(id=log_id).delete()
             # Danach ein Redirect, da das Objekt 'log' nicht mehr sicher nutzbar ist
             return redirect("physik:fehler_liste") 
-        else:
-            # 1. Hauptfelder der Aufgabe speichern
-            aufgabe.typ = request.POST.get("typ")
-            aufgabe.frage = request.POST.get("frage")
-            aufgabe.loesung = request.POST.get("antwort")
-            aufgabe.anmerkung = request.POST.get("anmerkung")
-            aufgabe.erklaerung = request.POST.get("erklaerung")
-            aufgabe.hilfe = request.POST.get("hilfe")
-            aufgabe.save()
-
-            # 2. Bestehende Optionen aktualisieren oder löschen
-            for key, value in request.POST.items():
-                if key.startswith("opt_"):
-                    opt_id = key.split("_")[1]
-                    option = AufgabeOption.objects.get(id=opt_id)
-                    
-                    if value.strip(): 
-                        option.text = value.strip()
-                        option.save()
-                    else: # Falls Text leer: Weg damit
-                        option.delete()
-
-            # 3. Neue Optionen anlegen (die 3 leeren Felder)
-            for i in range(1, 4):
-                new_text = request.POST.get(f"new_opt_{i}")
-                
-                if new_text and new_text.strip():
-                    # Wir ignorieren new_pos aus dem POST und berechnen es selbst:
-                    # Suche die höchste vorhandene Position für diese Aufgabe
-                    last_opt = AufgabeOption.objects.filter(aufgabe=aufgabe).order_by('-position').first()
-                    
-                    # Start bei 2, wenn noch nichts da ist (wegen offizieller Antwort = 1)
-                    next_pos = (last_opt.position + 1) if last_opt else 2
-                    
-                    AufgabeOption.objects.create(
-                        aufgabe=aufgabe,
-                        text=new_text.strip(),
-                        position=next_pos
-                    )
-
-        # Erst wenn alles gespeichert ist, löschen wir den Fehler-Log
-        log.delete()
+
+        # Aufgabe und Optionen in einer Transaktion (bearbeitung.py); erst danach den Fehler-Log löschen
+        with transaction.atomic():
+            speichere_aufgabe(
+                aufgabe,
+                felder={
+                    "typ": request.POST.get("typ"),
+                    "frage": request.POST.get("frage"),
+                    "loesung": request.POST.get("antwort"),
+                    "anmerkung": request.POST.get("anmerkung"),
+                    "erklaerung": request.POST.get("erklaerung"),
+                    "hilfe": request.POST.get("hilfe"),
+                },
+                # opt_<id>: bestehende Option (leer = löschen)
+                optionen={
+                    int(key.split("_")[1]): value
+                    for key, value in request.POST.items()
+                    if key.startswith("opt_") and key.split("_")[1].isdigit()
+                },
+                # Die 3 leeren Felder; die Position wird hinten angehängt (new_pos aus dem POST ignoriert)
+                neue_optionen=[request.POST.get(f"new_opt_{i}") for i in range(1, 4)],
+            )
+            log.delete()
 
         return redirect('physik:fehler_liste')
 